@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from config import Config
+from app.database import normalize_database_url, engine_options, configure_sqlite_pragmas
 
 db = SQLAlchemy()
 login_manager = LoginManager()
@@ -12,13 +13,40 @@ def create_app(config_class=Config):
     app = Flask(__name__, instance_relative_config=True)
     app.config.from_object(config_class)
     app.config.from_pyfile('config.py', silent=True)
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
 
     db.init_app(app)
+    with app.app_context():
+        configure_sqlite_pragmas(db.engine, app.config['SQLITE_BUSY_TIMEOUT_MS'])
     login_manager.init_app(app)
     migrate.init_app(app, db)
 
     login_manager.login_view = 'main.login'
 
+    from app.logger import audit_writer, archive_logs_command
+    audit_writer.init_app(app)
+    app.cli.add_command(archive_logs_command)
+
+    from app.storage import cleanup_uploads_command
+    app.cli.add_command(cleanup_uploads_command)
+
+    from app.reference_lists import import_reference_list_command
+    app.cli.add_command(import_reference_list_command)
+
+    from app.payments import import_m2p_command
+    app.cli.add_command(import_m2p_command)
+
+    from app.rebates import import_ib_rebates_command
+    app.cli.add_command(import_ib_rebates_command)
+
+    from app.crm import import_crm_deposits_command, import_crm_withdrawals_command
+    app.cli.add_command(import_crm_deposits_command)
+    app.cli.add_command(import_crm_withdrawals_command)
+
+    from app.treasury_report import treasury_report_command
+    app.cli.add_command(treasury_report_command)
+
     from app.routes import bp as main_bp
     app.register_blueprint(main_bp)
 
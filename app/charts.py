@@ -51,16 +51,13 @@ def create_charts(results: dict):
     try:
         final_calcs = results.get("Final Calculations", pd.DataFrame())
         if not final_calcs.empty:
-            calcs = final_calcs.set_index('Source')['Value']
+            # Segment and retail lot lines; A/B Book lots are shown elsewhere.
+            lots = final_calcs[(final_calcs['Description'] == 'Volume (Lot)')
+                               & ~final_calcs['Source'].isin(['A Book', 'B Book'])]
             # Volume in lots * 200,000 = Volume in USD
-            chinese_vol = float(calcs.get("Chinese Clients", 0)) * 200000
-            vip_vol = float(calcs.get("VIP Clients", 0)) * 200000
-            retail_vol = float(calcs.get("Retail Clients", 0)) * 200000
-
             client_volumes = {
-                "Chinese": chinese_vol,
-                "VIP": vip_vol,
-                "Retail": retail_vol
+                source.removesuffix(" Clients"): float(value) * 200000
+                for source, value in zip(lots['Source'], lots['Value'])
             }
 
             if any(v > 0 for v in client_volumes.values()):
@@ -0,0 +1,144 @@
+import click
+import pandas as pd
+from sqlalchemy import func
+
+from app import db
+from app.database import insert_new_rows
+from app.ledger_totals import CRM_DEPOSIT_LEDGER, CRM_TOPCHANGE_LEDGER, CRM_WITHDRAWAL_LEDGER, add_to_daily_totals
+from app.models import CRMDeposit, CRMWithdrawal
+from app.payments import read_export
+
+CRM_DEPOSIT_REQUIRED_COLUMNS = ['Request ID', 'Client ID', 'Trading Amount', 'Request Time']
+
+# CRM deposit export column -> CRMDeposit attribute
+CRM_DEPOSIT_COLUMNS = {
+    'Request ID': 'request_id',
+    'Client ID': 'client_id',
+    'Name': 'name',
+    'Client Type': 'client_type',
+    'Email': 'email',
+    'Referrer': 'referrer',
+    'Trading Account': 'trading_account',
+    'Payment Method': 'payment_method',
+    'Trading Amount': 'amount',
+    'Payment Amount': 'payment_amount',
+    'Request Time': 'request_time',
+    'Status': 'status',
+}
+
+CRM_WITHDRAWAL_REQUIRED_COLUMNS = ['Request ID', 'Client ID', 'Withdrawal Amount', 'Review Time']
+
+# CRM withdrawal export column -> CRMWithdrawal attribute
+CRM_WITHDRAWAL_COLUMNS = {
+    'Request ID': 'request_id',
+    'Client ID': 'client_id',
+    'Name': 'name',
+    'Client Type': 'client_type',
+    'Email': 'email',
+    'Referrer': 'referrer',
+    'Trading Account': 'trading_account',
+    'Withdrawal Method': 'withdrawal_method',
+    'Withdrawal Amount': 'amount',
+    'Net Withdrawal Amount': 'net_amount',
+    'Review Time': 'review_time',
+    'Status': 'status',
+}
+
+# Cent units converted to dollars when reading CRM amounts
+CENT_UNITS = {'USC': 100}
+
+
+def split_amount(sr: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """
+    Split CRM amounts such as "USD 1,000" or "USC 1500" into (unit, amount
+    in dollars); cent units are divided down. Unparseable amounts are 0.
+    """
+    parts = sr.str.strip().str.split(r'\s+', expand=True).reindex(columns=[0, 1]).fillna('')
+    unit = parts[0].str.upper()
+    number = parts[1].str.replace(r'[^\d.-]', '', regex=True)
+    amount = pd.to_numeric(number, errors='coerce').fillna(0.0).astype('float64')
+    return unit, amount / unit.map(CENT_UNITS).fillna(1)
+
+
+def split_net_amount(sr: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """
+    Split payout amounts such as "USDT TRC20 15" into (currency, amount):
+    the number is the last word. Stablecoins count one to one with USD;
+    cent units are divided down. Unparseable amounts are NaN.
+    """
+    parts = sr.str.strip().str.rsplit(n=1, expand=True).reindex(columns=[0, 1]).fillna('')
+    currency = parts[0].str.upper()
+    number = parts[1].str.replace(r'[^\d.-]', '', regex=True)
+    amount = pd.to_numeric(number, errors='coerce').astype('float64')
+    return currency, amount / currency.str.split().str[0].map(CENT_UNITS).fillna(1)
+
+
+def trading_login(sr: pd.Series) -> pd.Series:
+    """Login number ending a trading account such as "mt5 - RocoBroker-Promotion - 30148"; NA for wallets."""
+    return pd.to_numeric(sr.str.extract(r'(\d+)\D*$', expand=False), errors='coerce').astype('Int64')
+
+
+def _crm_rows(df: pd.DataFrame, columns: dict, required: list, label: str, time_column: str) -> pd.DataFrame:
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s) {', '.join(missing)} in the {label} export.")
+
+    rows = df.reindex(columns=list(columns)).fillna('').rename(columns=columns)
+    rows = rows.apply(lambda col: col.str.strip())
+    rows['currency'], rows['amount'] = split_amount(rows['amount'])
+    # The CRM exports its local time without an offset; it is stored as given
+    rows[time_column] = pd.to_datetime(rows[time_column], errors='coerce', format='mixed')
+    return rows.loc[rows['request_id'] != ''].replace({'': None})
+
+
+def parse_crm_deposits(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn a CRM deposit export into CRMDeposit rows; rows without a Request ID are dropped."""
+    return _crm_rows(df, CRM_DEPOSIT_COLUMNS, CRM_DEPOSIT_REQUIRED_COLUMNS, 'CRM deposit', 'request_time')
+
+
+def parse_crm_withdrawals(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn a CRM withdrawal export into CRMWithdrawal rows; rows without a Request ID are dropped."""
+    rows = _crm_rows(df, CRM_WITHDRAWAL_COLUMNS, CRM_WITHDRAWAL_REQUIRED_COLUMNS, 'CRM withdrawal', 'review_time')
+    rows['net_currency'], rows['net_amount'] = split_net_amount(rows['net_amount'].fillna(''))
+    rows['login'] = trading_login(rows['trading_account'].fillna(''))
+    return rows.replace({'': None})
+
+
+def import_crm_deposits(df: pd.DataFrame) -> int:
+    """Store the new requests of a CRM deposit export; returns the number added."""
+    added = insert_new_rows(db.session, CRMDeposit, 'request_id', parse_crm_deposits(df))
+    if len(added):
+        topchange = added['payment_method'].fillna('').str.upper() == 'TOPCHANGE'
+        ledger = topchange.map({True: CRM_TOPCHANGE_LEDGER, False: CRM_DEPOSIT_LEDGER})
+        add_to_daily_totals(added[['amount']].assign(ledger=ledger, time=added['request_time']))
+    db.session.commit()
+    return len(added)
+
+
+def import_crm_withdrawals(df: pd.DataFrame) -> int:
+    """Store the new requests of a CRM withdrawal export; returns the number added."""
+    added = insert_new_rows(db.session, CRMWithdrawal, 'request_id', parse_crm_withdrawals(df))
+    if len(added):
+        add_to_daily_totals(added[['amount']].assign(ledger=CRM_WITHDRAWAL_LEDGER, time=added['review_time']))
+    db.session.commit()
+    return len(added)
+
+
+def crm_counts() -> dict:
+    """CRM ledger name -> number of stored requests."""
+    return {label: db.session.scalar(db.select(func.count()).select_from(model))
+            for label, model in [('CRM Deposit', CRMDeposit), ('CRM Withdrawal', CRMWithdrawal)]}
+
+
+@click.command('import-crm-deposits')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_crm_deposits_command(path):
+    """Import a CRM deposit CSV export."""
+    click.echo(f"CRM Deposit: {import_crm_deposits(read_export(path))} added")
+
+
+@click.command('import-crm-withdrawals')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_crm_withdrawals_command(path):
+    """Import a CRM withdrawal CSV export."""
+    click.echo(f"CRM Withdrawal: {import_crm_withdrawals(read_export(path))} added")
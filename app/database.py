@@ -0,0 +1,104 @@
+import pandas as pd
+from sqlalchemy import case, event, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+
+
+def normalize_database_url(uri):
+    """Accept the legacy `postgres://` scheme some hosts still hand out."""
+    if uri and uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options(config):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for the configured database.
+
+    SQLite gets a busy timeout so writers wait for the lock instead of failing.
+    Server databases get a fixed-size pool with pre-ping, sized per worker
+    process by DB_POOL_SIZE / DB_MAX_OVERFLOW.
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+
+    if url.get_backend_name() == 'sqlite':
+        connect_args = dict(options.get('connect_args', {}))
+        connect_args.setdefault('timeout', config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+        options['connect_args'] = connect_args
+    else:
+        options.setdefault('pool_size', config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+        options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', True)
+    return options
+
+
+def configure_sqlite_pragmas(engine, busy_timeout_ms):
+    """Switch file-backed SQLite databases to WAL with relaxed fsyncs."""
+    if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+
+def dialect_insert(session, table):
+    """An INSERT for `table` that supports ON CONFLICT on the session's database."""
+    if session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def insert_new_rows(session, model, key, frame, batch_size=5000):
+    """
+    Insert the rows of `frame` (columns named after `model` attributes) whose
+    `key` value is not already stored, in batches. The key column must be
+    unique; rows whose key is already stored, including by a concurrent
+    import, are skipped by ON CONFLICT DO NOTHING. Returns the rows that were
+    inserted.
+    """
+    column = getattr(model, key)
+    statement = (dialect_insert(session, model.__table__)
+                 .on_conflict_do_nothing(index_elements=[key]).returning(column))
+    frame = frame.drop_duplicates(key)
+    inserted = []
+    for start in range(0, len(frame), batch_size):
+        chunk = frame.iloc[start:start + batch_size]
+        values = [chunk[c].astype(object).where(chunk[c].notna(), None).tolist() for c in chunk.columns]
+        records = [dict(zip(chunk.columns, row)) for row in zip(*values)]
+        added = set(session.scalars(statement, records))
+        if added:
+            inserted.append(chunk[chunk[key].isin(added)])
+    return pd.concat(inserted) if inserted else frame.iloc[:0]
+
+
+def upsert_daily_totals(session, table, keys, delta, sums, mins=(), maxes=()):
+    """
+    Fold `delta`, one row of totals per `keys` group (keys include `day`),
+    into the daily totals `table` with one INSERT ... ON CONFLICT DO UPDATE:
+    stored groups get the `sums` columns added and the `mins` / `maxes`
+    columns widened, new groups are inserted. `keys` must be the table's
+    primary key or a unique constraint.
+    """
+    statement = dialect_insert(session, table)
+    excluded = statement.excluded
+
+    def widened(column, wider):
+        return case((or_(table.c[column].is_(None), wider(excluded[column], table.c[column])), excluded[column]),
+                    else_=table.c[column])
+
+    values = {c: table.c[c] + excluded[c] for c in sums}
+    values.update({c: widened(c, lambda new, old: new < old) for c in mins})
+    values.update({c: widened(c, lambda new, old: new > old) for c in maxes})
+    records = [{c: value.to_pydatetime() if isinstance(value, pd.Timestamp) else value
+                for c, value in row.items()}
+               for row in delta[[*keys, *sums, *mins, *maxes]].to_dict('records')]
+    if records:
+        session.execute(statement.on_conflict_do_update(index_elements=keys, set_=values), records)
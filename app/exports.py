@@ -0,0 +1,146 @@
+import io
+import os
+import re
+import tempfile
+
+import xlsxwriter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for Parquet downloads
+    pa = pq = None
+
+EXPORT_CHUNK_ROWS = 50000
+EXCEL_MAX_ROWS = 1048576  # rows per worksheet, including the header
+EXCEL_MAX_SHEET_NAME = 31
+# Characters Excel does not allow in worksheet names
+EXCEL_SHEET_NAME_FORBIDDEN = re.compile(r'[\[\]:*?/\\]')
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def table_slug(name):
+    """URL name of a result table, e.g. 'A Book Raw' -> 'a-book-raw'."""
+    return name.lower().replace(' ', '-')
+
+
+def _chunks(df, rows=None):
+    rows = rows or EXPORT_CHUNK_ROWS
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+def iter_csv(df):
+    """Yield a DataFrame as CSV text, one chunk of rows at a time."""
+    yield df.head(0).to_csv(index=False)
+    for chunk in _chunks(df):
+        yield chunk.to_csv(index=False, header=False)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+def _arrow_ready(chunk):
+    # Object columns (mixed text and numbers in the raw books) become strings
+    return chunk.astype({c: 'string' for c in chunk.columns if chunk[c].dtype == object})
+
+
+def iter_parquet(df):
+    """Yield a DataFrame as a Parquet file, one row group per chunk of rows."""
+    sink = _ChunkSink()
+    schema = pa.Schema.from_pandas(_arrow_ready(df.head(0)), preserve_index=False)
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in _chunks(df):
+            writer.write_table(pa.Table.from_pandas(_arrow_ready(chunk), schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def excel_sheet_parts(name, df):
+    """Yield (sheet name, rows) pairs, splitting frames larger than one worksheet."""
+    name = EXCEL_SHEET_NAME_FORBIDDEN.sub('_', name)
+    per_sheet = EXCEL_MAX_ROWS - 1
+    parts = max(1, -(-len(df) // per_sheet))
+    for part in range(parts):
+        suffix = '' if parts == 1 else f' ({part + 1})'
+        yield f'{name[:EXCEL_MAX_SHEET_NAME - len(suffix)]}{suffix}', df.iloc[part * per_sheet:(part + 1) * per_sheet]
+
+
+def write_excel(sheets, output):
+    """
+    Write the frames in `sheets` (sheet name -> DataFrame) to an .xlsx
+    workbook at `output` (a path or binary file object).
+
+    xlsxwriter's constant_memory mode flushes every row to a temp file as
+    soon as it is written, and rows are converted in chunks, so memory use
+    does not grow with the size of the export. Frames longer than one
+    worksheet continue on extra sheets; datetimes are written as Excel dates
+    (timezone-aware ones at their wall-clock time, with the zone dropped).
+    """
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'remove_timezone': True,
+                                            'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+    bold = workbook.add_format({'bold': True})
+    for name, df in sheets.items():
+        for sheet_name, part in excel_sheet_parts(name, df):
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, [str(c) for c in part.columns], bold)
+            row = 1
+            for chunk in _chunks(part):
+                values = chunk.astype(object)
+                values = values.where(values.notna(), None)
+                for record in values.itertuples(index=False, name=None):
+                    worksheet.write_row(row, 0, record)
+                    row += 1
+    workbook.close()
+
+
+def iter_excel(df, sheet_name, chunk_size=1024 * 1024):
+    """
+    Yield a DataFrame as an .xlsx workbook.
+
+    An xlsx file is a zip archive that can only be finalised once every row
+    is known, so the workbook is written to a temp file with `write_excel`
+    and then streamed from disk; neither step holds the whole file in memory.
+    """
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        write_excel({sheet_name: df}, path)
+        with open(path, 'rb') as fh:
+            for data in iter(lambda: fh.read(chunk_size), b''):
+                yield data
+    finally:
+        os.remove(path)
+
+
+def iter_export(df, fmt, sheet_name='Sheet1'):
+    """Return a generator producing `df` in `fmt` (a key of EXPORT_FORMATS)."""
+    if fmt == 'csv':
+        return iter_csv(df)
+    if fmt == 'parquet':
+        if pq is None:
+            raise RuntimeError('Parquet export needs the pyarrow package installed.')
+        return iter_parquet(df)
+    if fmt == 'xlsx':
+        return iter_excel(df, sheet_name)
+    raise ValueError(f"Unknown export format '{fmt}'.")
@@ -0,0 +1,33 @@
+import pandas as pd
+
+from app import db
+from app.database import upsert_daily_totals
+from app.models import TreasuryDaily
+
+# CRM ledgers kept next to the payment ledgers (app.payments.PAYMENT_LEDGERS).
+# TopChange deposits are a ledger of their own; "CRM Deposit" is the rest.
+CRM_DEPOSIT_LEDGER = 'CRM Deposit'
+CRM_TOPCHANGE_LEDGER = 'CRM TopChange'
+CRM_WITHDRAWAL_LEDGER = 'CRM Withdrawal'
+
+DAILY_KEYS = ['day', 'ledger']
+
+
+def add_to_daily_totals(rows: pd.DataFrame):
+    """
+    Fold newly imported records (columns ledger, time, amount and optionally
+    tier_fee) into the daily ledger totals: existing days are updated with
+    one executemany UPDATE, new ones inserted. Records without a time are
+    not on any day and are left out.
+    """
+    rows = rows.loc[rows['time'].notna()]
+    if not len(rows):
+        return
+    delta = (rows.assign(day=rows['time'].dt.date, tier_fee=rows.get('tier_fee', 0.0))
+             .groupby(DAILY_KEYS)
+             .agg(amount=('amount', 'sum'), tier_fee=('tier_fee', 'sum'), record_count=('time', 'size'),
+                  first_time=('time', 'min'), last_time=('time', 'max'))
+             .reset_index())
+
+    upsert_daily_totals(db.session, TreasuryDaily.__table__, DAILY_KEYS, delta,
+                        sums=['amount', 'tier_fee', 'record_count'], mins=['first_time'], maxes=['last_time'])
@@ -1,21 +1,279 @@
-from app import db
-from app.models import Log
+import atexit
+import gzip
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
 from flask_login import current_user
+from sqlalchemy import and_, delete, insert, or_
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Log, User
+
+
+class AuditLogWriter:
+    """
+    Buffered writer for audit log entries.
+
+    Entries are queued in memory by `record_log` and written to the database
+    in batches by a background thread, so request latency never includes the
+    audit write. If the database is busy (e.g. SQLite's write lock is held),
+    the batch is appended to a local JSON-lines file instead of being lost.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_LOG_ASYNC', True)
+        app.config.setdefault('AUDIT_LOG_BATCH_SIZE', 100)
+        app.config.setdefault('AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+        app.config.setdefault('AUDIT_LOG_FALLBACK_PATH',
+                              os.path.join(app.instance_path, 'audit_fallback.log'))
+        self.app = app
+        app.extensions['audit_log_writer'] = self
+
+        if app.config['AUDIT_LOG_ASYNC']:
+            self._start()
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        interval = self.app.config['AUDIT_LOG_FLUSH_INTERVAL']
+        while not self._stopping.is_set():
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def enqueue(self, user_id, action, details=None, timestamp=None):
+        """Queue a log entry; never touches the database."""
+        entry = {
+            'user_id': user_id,
+            'action': action,
+            'details': details,
+            'timestamp': timestamp or datetime.utcnow(),
+        }
+        with self._lock:
+            self._queue.append(entry)
+            pending = len(self._queue)
+
+        if not self.app.config['AUDIT_LOG_ASYNC']:
+            self.flush()
+        elif pending >= self.app.config['AUDIT_LOG_BATCH_SIZE']:
+            self._wakeup.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._queue)
+
+    def _drain(self):
+        with self._lock:
+            batch = list(self._queue)
+            self._queue.clear()
+        return batch
+
+    def flush(self):
+        """Write all queued entries in one transaction. Returns the number written."""
+        if self.app is None:
+            return 0
+        batch = self._drain()
+        if not batch:
+            return 0
+
+        with self.app.app_context():
+            try:
+                db.session.execute(insert(Log), batch)
+                db.session.commit()
+                return len(batch)
+            except OperationalError as e:
+                db.session.rollback()
+                print(f"Audit log database busy, writing {len(batch)} entries to fallback file: {e}")
+                self._write_fallback(batch)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error recording log: {e}")
+                self._write_fallback(batch)
+            finally:
+                db.session.remove()
+        return 0
+
+    def _write_fallback(self, batch):
+        path = self.app.config['AUDIT_LOG_FALLBACK_PATH']
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as fh:
+                for entry in batch:
+                    fh.write(json.dumps({**entry, 'timestamp': entry['timestamp'].isoformat()}) + '\n')
+        except OSError as e:
+            print(f"Error writing audit fallback file: {e}")
+
+    def shutdown(self):
+        """Stop the background thread and flush whatever is still queued."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+
+audit_writer = AuditLogWriter()
+
 
 def record_log(action, details=None):
     """
     Helper function to create a log entry.
+
+    The entry is queued and persisted asynchronously by `audit_writer`.
     """
     try:
         if current_user.is_authenticated:
-            log_entry = Log(
-                user_id=current_user.id,
-                action=action,
-                details=details
-            )
-            db.session.add(log_entry)
-            db.session.commit()
+            audit_writer.enqueue(current_user.id, action, details)
     except Exception as e:
-        # In a production app, you'd want more robust error handling here,
-        # e.g., logging to a file so that log failures don't crash the app.
         print(f"Error recording log: {e}")
+
+
+# ─── Log viewer ──────────────────────────────────────────────────────────────
+
+def encode_cursor(log):
+    return f"{log.timestamp.isoformat()}_{log.id}"
+
+
+def decode_cursor(cursor):
+    """Parse a `<iso timestamp>_<id>` cursor; returns None if it is malformed."""
+    try:
+        ts, log_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(ts), int(log_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def query_log_page(username=None, action=None, start=None, end=None,
+                   before=None, after=None, per_page=50):
+    """
+    Return one page of logs, newest first, using keyset pagination on
+    (timestamp, id). `before`/`after` are cursors from a previous page.
+
+    Returns (logs, next_cursor, prev_cursor); a cursor is None when there is
+    no further page in that direction.
+    """
+    query = Log.query.options(joinedload(Log.user))
+
+    if username:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            return [], None, None
+        query = query.filter(Log.user_id == user.id)
+    if action:
+        query = query.filter(Log.action == action)
+    if start:
+        query = query.filter(Log.timestamp >= start)
+    if end:
+        query = query.filter(Log.timestamp < end)
+
+    before_key = decode_cursor(before) if before else None
+    after_key = decode_cursor(after) if after else None
+
+    if after_key:
+        ts, log_id = after_key
+        query = query.filter(or_(Log.timestamp > ts, and_(Log.timestamp == ts, Log.id > log_id)))
+        query = query.order_by(Log.timestamp.asc(), Log.id.asc())
+    else:
+        if before_key:
+            ts, log_id = before_key
+            query = query.filter(or_(Log.timestamp < ts, and_(Log.timestamp == ts, Log.id < log_id)))
+        query = query.order_by(Log.timestamp.desc(), Log.id.desc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if after_key:
+        rows.reverse()
+        next_cursor = encode_cursor(rows[-1]) if rows else after
+        prev_cursor = encode_cursor(rows[0]) if rows and has_more else None
+    else:
+        next_cursor = encode_cursor(rows[-1]) if rows and has_more else None
+        prev_cursor = encode_cursor(rows[0]) if rows and before_key else None
+
+    return rows, next_cursor, prev_cursor
+
+
+# ─── Retention ───────────────────────────────────────────────────────────────
+
+def archive_logs(older_than_days, archive_dir, batch_size=5000):
+    """
+    Move logs older than `older_than_days` into a gzip-compressed JSON-lines
+    file under `archive_dir` and delete them from the database.
+
+    Rows are copied and deleted in (timestamp, id) order, one batch per
+    transaction, so the job never holds the write lock for long.
+    Returns (archived_count, archive_path).
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"logs_before_{cutoff.strftime('%Y%m%d_%H%M%S')}.jsonl.gz")
+
+    archived = 0
+    with gzip.open(path, 'at', encoding='utf-8') as fh:
+        while True:
+            batch = (Log.query
+                     .filter(Log.timestamp < cutoff)
+                     .order_by(Log.timestamp.asc(), Log.id.asc())
+                     .limit(batch_size)
+                     .all())
+            if not batch:
+                break
+            for log in batch:
+                fh.write(json.dumps({
+                    'id': log.id,
+                    'user_id': log.user_id,
+                    'action': log.action,
+                    'details': log.details,
+                    'timestamp': log.timestamp.isoformat(),
+                }) + '\n')
+            fh.flush()
+            db.session.execute(delete(Log).where(Log.id.in_([log.id for log in batch])))
+            db.session.commit()
+            archived += len(batch)
+
+    if archived == 0:
+        os.remove(path)
+        return 0, None
+    return archived, path
+
+
+@click.command('archive-logs')
+@click.option('--days', default=None, type=int, help='Archive logs older than this many days.')
+@click.option('--archive-dir', default=None, help='Directory for the compressed archives.')
+def archive_logs_command(days, archive_dir):
+    """Move old audit logs out of the database into compressed files."""
+    days = days if days is not None else current_app.config['LOG_RETENTION_DAYS']
+    archive_dir = archive_dir or current_app.config['LOG_ARCHIVE_FOLDER']
+    count, path = archive_logs(days, archive_dir)
+    if count:
+        click.echo(f"Archived {count} log entries to {path}")
+    else:
+        click.echo("No log entries to archive.")
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+
+def to_login_array(values) -> np.ndarray:
+    """
+    Convert logins (ints, floats, or strings such as " 1005") to an int64 array.
+    Values that are not whole numbers become -1, which never matches a login.
+    """
+    if isinstance(values, (set, frozenset)):
+        values = list(values)
+    sr = values if isinstance(values, pd.Series) else pd.Series(values)
+    if not pd.api.types.is_numeric_dtype(sr):
+        sr = sr.astype(str).str.strip()
+    nums = pd.to_numeric(sr, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    valid = np.isfinite(nums) & (nums == np.floor(nums))
+    return np.where(valid, nums, -1).astype("int64")
+
+
+class LoginSet:
+    """
+    An immutable set of account logins stored as a sorted int64 array.
+
+    Membership of a whole column is tested with one `searchsorted`, so checking
+    millions of deals against millions of listed accounts needs no per-row
+    string conversion.
+    """
+
+    __slots__ = ("_logins",)
+
+    def __init__(self, logins=()):
+        arr = to_login_array(logins)
+        self._logins = np.unique(arr[arr >= 0])
+
+    @classmethod
+    def coerce(cls, value) -> "LoginSet":
+        """Return `value` if it is already a LoginSet, else build one from it."""
+        return value if isinstance(value, cls) else cls(value)
+
+    @property
+    def array(self) -> np.ndarray:
+        return self._logins
+
+    def isin(self, logins) -> np.ndarray:
+        """Vectorized membership test; returns a boolean array aligned with `logins`."""
+        arr = logins if isinstance(logins, np.ndarray) and logins.dtype == np.int64 else to_login_array(logins)
+        if len(self._logins) == 0:
+            return np.zeros(len(arr), dtype=bool)
+        idx = np.searchsorted(self._logins, arr)
+        idx[idx == len(self._logins)] = 0
+        return (self._logins[idx] == arr) & (arr >= 0)
+
+    def __contains__(self, login) -> bool:
+        return bool(self.isin([login])[0])
+
+    def __len__(self) -> int:
+        return len(self._logins)
+
+    def __iter__(self):
+        return (str(login) for login in self._logins)
+
+    def __repr__(self) -> str:
+        return f"<LoginSet {len(self)} logins>"
@@ -1,13 +1,19 @@
 from app import db, login_manager
+from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import threading
+import time
 
 class Role(db.Model):
     __tablename__ = 'roles'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), unique=True)
-    users = db.relationship('User', backref='role', lazy='dynamic')
+    users = db.relationship('User', backref=db.backref('role', lazy='joined'), lazy='dynamic')
 
     def __repr__(self):
         return f'<Role {self.name}>'
@@ -35,6 +41,13 @@ class User(UserMixin, db.Model):
 
 class Log(db.Model):
     __tablename__ = 'logs'
+    __table_args__ = (
+        # Keyset pagination in the admin panel walks (timestamp, id) backwards;
+        # the filtered variants lead with the filter column.
+        db.Index('ix_logs_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_logs_user_id_timestamp', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_logs_action_timestamp', 'action', 'timestamp', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     action = db.Column(db.String(128))
@@ -45,6 +58,286 @@ class Log(db.Model):
         return f'<Log {self.user.username} - {self.action}>'
 
 
+class ReferenceList(db.Model):
+    """A managed list of logins (excluded accounts, VIP clients, welcome bonus accounts)."""
+    __tablename__ = 'reference_lists'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), unique=True, nullable=False)
+    current_version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    versions = db.relationship('ReferenceListVersion', backref='reference_list', lazy='dynamic',
+                               order_by='ReferenceListVersion.version.desc()')
+
+    def __repr__(self):
+        return f'<ReferenceList {self.name} v{self.current_version}>'
+
+
+class ReferenceListVersion(db.Model):
+    """An immutable snapshot of a reference list; reports record which one they used."""
+    __tablename__ = 'reference_list_versions'
+    __table_args__ = (db.UniqueConstraint('list_id', 'version', name='uq_reference_list_version'),)
+    id = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, db.ForeignKey('reference_lists.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    source_digest = db.Column(db.String(64), index=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReferenceListVersion {self.list_id} v{self.version}>'
+
+
+class ReferenceListEntry(db.Model):
+    __tablename__ = 'reference_list_entries'
+    version_id = db.Column(db.Integer, db.ForeignKey('reference_list_versions.id'), primary_key=True)
+    login = db.Column(db.BigInteger, primary_key=True)
+
+
+class ReportRun(db.Model):
+    """One saved set of report results, keyed by a digest of the inputs it was computed from."""
+    __tablename__ = 'report_runs'
+    id = db.Column(db.Integer, primary_key=True)
+    run_key = db.Column(db.String(64), unique=True, nullable=False)
+    deals_digest = db.Column(db.String(64), index=True)
+    date_range = db.Column(db.String(128))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReportRun {self.id} {self.run_key[:12]}>'
+
+
+class ReportClientResult(db.Model):
+    """Per-login row of a saved result table (book results, segments, client summary)."""
+    __tablename__ = 'report_client_results'
+    run_id = db.Column(db.Integer, db.ForeignKey('report_runs.id'), primary_key=True)
+    table_name = db.Column(db.String(64), primary_key=True)
+    login = db.Column(db.String(32), primary_key=True)
+    total_volume = db.Column(db.Float)
+    trader_profit = db.Column(db.Float)
+    swaps = db.Column(db.Float)
+    commission = db.Column(db.Float)
+    tp_profit = db.Column(db.Float)
+    broker_profit = db.Column(db.Float)
+    net = db.Column(db.Float)
+
+
+class ReportCalculation(db.Model):
+    """A line of a saved Final Calculations table, in display order."""
+    __tablename__ = 'report_calculations'
+    run_id = db.Column(db.Integer, db.ForeignKey('report_runs.id'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(128))
+    description = db.Column(db.String(256))
+    value = db.Column(db.Float)
+    value_text = db.Column(db.String(128))
+
+
+class Payment(db.Model):
+    """A completed payment-gateway (M2P) transaction; see app.payments."""
+    __tablename__ = 'payments'
+    __table_args__ = (
+        # Ledger totals and reconciliation filter by type/channel and a time range
+        db.Index('ix_payments_type_channel_confirmed', 'type', 'channel', 'confirmed'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    transaction_id = db.Column(db.String(128), unique=True, nullable=False)
+    payment_id = db.Column(db.String(64))
+    type = db.Column(db.String(16), nullable=False)       # DEPOSIT / WITHDRAW
+    channel = db.Column(db.String(16), nullable=False)    # M2p / Settlement
+    payment_gateway = db.Column(db.String(64))
+    status = db.Column(db.String(16))
+    booked = db.Column(db.DateTime)
+    confirmed = db.Column(db.DateTime)
+    trading_account = db.Column(db.String(64), index=True)
+    wallet_address = db.Column(db.String(128))
+    amount = db.Column(db.Float)
+    currency = db.Column(db.String(16))
+    settlement_amount = db.Column(db.Float)
+    settlement_currency = db.Column(db.String(16))
+    processing_fee = db.Column(db.Float)
+    tier_fee = db.Column(db.Float)
+    balance_after = db.Column(db.Float)
+    comment = db.Column(db.String(256))
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set when an analyst confirms the record's discrepancy; see app.reconciliation
+    resolved_at = db.Column(db.DateTime)
+    resolved_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+
+    def __repr__(self):
+        return f'<Payment {self.type} {self.transaction_id}>'
+
+
+class IBRebate(db.Model):
+    """One IB rebate payout from the rebate export; see app.rebates."""
+    __tablename__ = 'ib_rebates'
+    id = db.Column(db.Integer, primary_key=True)
+    # Transaction ID, or order + rebate account for rebates that have none
+    rebate_key = db.Column(db.String(128), unique=True, nullable=False)
+    transaction_id = db.Column(db.String(64))
+    order_id = db.Column(db.String(32), index=True)
+    platform = db.Column(db.String(64))
+    account_id = db.Column(db.String(32))
+    volume = db.Column(db.Float)
+    symbol = db.Column(db.String(32))
+    swaps = db.Column(db.Float)
+    commission = db.Column(db.Float)
+    profit = db.Column(db.Float)
+    trader = db.Column(db.String(128))
+    receiver = db.Column(db.String(128))
+    rebate_platform = db.Column(db.String(64))
+    rebate_account = db.Column(db.String(64))
+    rebate_rules = db.Column(db.String(128))
+    commission_parameter = db.Column(db.String(32))
+    formula = db.Column(db.String(128))
+    currency = db.Column(db.String(16))
+    rebate = db.Column(db.Float)
+    open_time = db.Column(db.DateTime)
+    close_time = db.Column(db.DateTime)
+    rebate_time = db.Column(db.DateTime, index=True)
+    status = db.Column(db.String(32))
+    failure_reason = db.Column(db.String(256))
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<IBRebate {self.rebate_key}>'
+
+
+class IBRebateDaily(db.Model):
+    """Rebate totals per day, receiver, rebate account and symbol, maintained on import."""
+    __tablename__ = 'ib_rebate_daily'
+    day = db.Column(db.Date, primary_key=True)
+    receiver = db.Column(db.String(128), primary_key=True)
+    rebate_account = db.Column(db.String(64), primary_key=True)
+    symbol = db.Column(db.String(32), primary_key=True)
+    rebate = db.Column(db.Float, nullable=False, default=0.0)
+    volume = db.Column(db.Float, nullable=False, default=0.0)
+    rebate_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TreasuryDaily(db.Model):
+    """Payment and CRM ledger totals per day, maintained on import; see app.ledger_totals."""
+    __tablename__ = 'treasury_daily'
+    day = db.Column(db.Date, primary_key=True)
+    ledger = db.Column(db.String(32), primary_key=True)
+    amount = db.Column(db.Float, nullable=False, default=0.0)
+    tier_fee = db.Column(db.Float, nullable=False, default=0.0)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    first_time = db.Column(db.DateTime)
+    last_time = db.Column(db.DateTime)
+
+
+class CRMDeposit(db.Model):
+    """A deposit request exported from the CRM; see app.crm."""
+    __tablename__ = 'crm_deposits'
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.String(32), unique=True, nullable=False)
+    client_id = db.Column(db.String(32), index=True)
+    name = db.Column(db.String(128))
+    client_type = db.Column(db.String(32))
+    email = db.Column(db.String(120))
+    referrer = db.Column(db.String(128))
+    trading_account = db.Column(db.String(128))
+    payment_method = db.Column(db.String(64))
+    amount = db.Column(db.Float)               # Trading Amount in USD (USC / 100)
+    currency = db.Column(db.String(16))        # unit the Trading Amount was given in
+    payment_amount = db.Column(db.String(64))
+    request_time = db.Column(db.DateTime, index=True)
+    status = db.Column(db.String(32))
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set when an analyst confirms the record's discrepancy; see app.reconciliation
+    resolved_at = db.Column(db.DateTime)
+    resolved_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+
+    def __repr__(self):
+        return f'<CRMDeposit {self.request_id}>'
+
+
+class CRMWithdrawal(db.Model):
+    """A withdrawal request exported from the CRM; see app.crm."""
+    __tablename__ = 'crm_withdrawals'
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.String(32), unique=True, nullable=False)
+    client_id = db.Column(db.String(32), index=True)
+    name = db.Column(db.String(128))
+    client_type = db.Column(db.String(32))
+    email = db.Column(db.String(120))
+    referrer = db.Column(db.String(128))
+    trading_account = db.Column(db.String(128))
+    login = db.Column(db.BigInteger, index=True)  # trading login at the end of trading_account, if any
+    withdrawal_method = db.Column(db.String(64))
+    amount = db.Column(db.Float)               # Withdrawal Amount in USD (USC / 100)
+    currency = db.Column(db.String(16))        # unit the Withdrawal Amount was given in
+    net_amount = db.Column(db.Float)           # Net Withdrawal Amount paid out, e.g. USDT
+    net_currency = db.Column(db.String(32))    # e.g. "USDT TRC20"
+    review_time = db.Column(db.DateTime, index=True)
+    status = db.Column(db.String(32))
+    imported_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set when an analyst confirms the record's discrepancy; see app.reconciliation
+    resolved_at = db.Column(db.DateTime)
+    resolved_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+
+    def __repr__(self):
+        return f'<CRMWithdrawal {self.request_id}>'
+
+
+# ─── User cache ──────────────────────────────────────────────────────────────
+#
+# Flask-Login already memoizes the loaded user for the rest of the request;
+# this cache additionally keeps a detached snapshot of each user (with its
+# role) for USER_CACHE_TTL seconds so authenticated page views skip the
+# user/role query entirely.
+
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+
+
+def _snapshot(user):
+    """Build a detached copy of `user` and its role that any session can merge."""
+    role = None
+    if user.role is not None:
+        role = Role(id=user.role.id, name=user.role.name)
+        make_transient_to_detached(role)
+    copy = User(id=user.id, username=user.username, email=user.email,
+                password_hash=user.password_hash, role_id=user.role_id)
+    set_committed_value(copy, 'role', role)
+    make_transient_to_detached(copy)
+    return copy
+
+
+def invalidate_user_cache(user_id=None):
+    """Drop one cached user, or every cached user when `user_id` is None."""
+    with _user_cache_lock:
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(user_id, None)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _evict_user(mapper, connection, target):
+    invalidate_user_cache(target.id)
+
+
+@event.listens_for(Role, 'after_update')
+@event.listens_for(Role, 'after_delete')
+def _evict_all_users(mapper, connection, target):
+    invalidate_user_cache()
+
+
 @login_manager.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    user_id = int(id)
+    ttl = current_app.config.get('USER_CACHE_TTL', 30)
+
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+    if entry is not None and time.monotonic() - entry[1] < ttl:
+        return db.session.merge(entry[0], load=False)
+
+    user = db.session.get(User, user_id, options=[joinedload(User.role)])
+    if user is not None and ttl > 0:
+        with _user_cache_lock:
+            _user_cache[user_id] = (_snapshot(user), time.monotonic())
+    return user
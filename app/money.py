@@ -0,0 +1,44 @@
+from decimal import Decimal, ROUND_HALF_EVEN
+from fractions import Fraction
+
+import numpy as np
+import pandas as pd
+
+# Fixed-point money: amounts are held as int64 counts of 1e-4 units, so sums
+# are exact and independent of summation order.
+MONEY_SCALE = 10000
+MONEY_QUANTUM = Decimal("0.0001")
+
+
+def to_units(values) -> np.ndarray:
+    """Convert float amounts (already cleaned) to int64 1e-4 units."""
+    if isinstance(values, pd.Series):
+        arr = values.to_numpy(dtype="float64", na_value=0.0)
+    else:
+        arr = np.asarray(values, dtype="float64")
+    return np.rint(np.nan_to_num(arr) * MONEY_SCALE).astype("int64")
+
+
+def from_units(units):
+    """Convert 1e-4 units back to float amounts for display."""
+    if isinstance(units, (int, np.integer)):
+        return int(units) / MONEY_SCALE
+    return np.asarray(units, dtype="int64") / MONEY_SCALE
+
+
+def unit_of(value) -> int:
+    """Convert a single amount to 1e-4 units."""
+    try:
+        return int(Decimal(str(value)).quantize(MONEY_QUANTUM, ROUND_HALF_EVEN) * MONEY_SCALE)
+    except ArithmeticError:
+        return 0
+
+
+def divide_units(units: int, divisor: int) -> int:
+    """Divide an amount in units by an integer, rounding half to even."""
+    return round(Fraction(units, divisor))
+
+
+def quantize(text: str, divisor: int = 1) -> str:
+    """Divide a decimal string exactly and format it with four decimals."""
+    return str((Decimal(text) / divisor).quantize(MONEY_QUANTUM, ROUND_HALF_EVEN))
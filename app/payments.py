@@ -0,0 +1,116 @@
+import click
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+
+from app import db
+from app.database import insert_new_rows
+from app.ledger_totals import add_to_daily_totals
+from app.models import Payment
+
+# (type, channel) -> ledger name, as the payment sheets were called
+PAYMENT_LEDGERS = {
+    ('DEPOSIT', 'M2p'): 'M2p Deposit',
+    ('DEPOSIT', 'Settlement'): 'Settlement Deposit',
+    ('WITHDRAW', 'M2p'): 'M2p Withdraw',
+    ('WITHDRAW', 'Settlement'): 'Settlement Withdraw',
+}
+
+M2P_REQUIRED_COLUMNS = ['Transaction ID', 'Status', 'Type', 'Payment gateway']
+
+# M2P export column -> Payment attribute
+M2P_COLUMNS = {
+    'Transaction ID': 'transaction_id',
+    'Payment ID': 'payment_id',
+    'Payment gateway': 'payment_gateway',
+    'Status': 'status',
+    'Booked': 'booked',
+    'Confirmed': 'confirmed',
+    'Trading account': 'trading_account',
+    'Wallet address': 'wallet_address',
+    'Transaction amount': 'amount',
+    'Transaction currency': 'currency',
+    'Settlement amount': 'settlement_amount',
+    'Settlement currency': 'settlement_currency',
+    'Processing fee': 'processing_fee',
+    'Tier fee': 'tier_fee',
+    'Balance after': 'balance_after',
+    'Comment': 'comment',
+}
+M2P_DATE_COLUMNS = ['booked', 'confirmed']
+M2P_AMOUNT_COLUMNS = ['amount', 'settlement_amount', 'processing_fee', 'tier_fee', 'balance_after']
+
+
+def read_export(source) -> pd.DataFrame:
+    """Read a CSV export (path or binary stream) as text, with trimmed headers."""
+    df = pd.read_csv(source, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def to_utc_naive(sr: pd.Series) -> pd.Series:
+    """Parse timestamps (any offset) to naive UTC, as the app stores them; bad values become NaT."""
+    return pd.to_datetime(sr, utc=True, errors='coerce', format='mixed').dt.tz_localize(None)
+
+
+def to_amount(sr: pd.Series) -> pd.Series:
+    return pd.to_numeric(sr.str.replace(',', '', regex=False).str.strip(), errors='coerce').astype('float64')
+
+
+def parse_m2p(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turn an M2P export into Payment rows. Only DONE transactions with an ID
+    are kept and the internal BALANCE gateway is skipped; each row is routed
+    to a ledger by Type (DEPOSIT, anything else is a withdrawal) and by
+    whether its gateway is a Settlement gateway.
+    """
+    missing = [c for c in M2P_REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s) {', '.join(missing)} in the M2P export.")
+
+    tx_id = df['Transaction ID'].str.strip()
+    gateway = df['Payment gateway'].str.strip().str.upper()
+    keep = (tx_id != '') & (gateway != 'BALANCE') & (df['Status'].str.strip().str.upper() == 'DONE')
+
+    rows = df.loc[keep].reindex(columns=list(M2P_COLUMNS)).fillna('').rename(columns=M2P_COLUMNS)
+    rows = rows.apply(lambda col: col.str.strip())
+    rows['type'] = np.where(df.loc[keep, 'Type'].str.strip().str.upper() == 'DEPOSIT', 'DEPOSIT', 'WITHDRAW')
+    rows['channel'] = np.where(gateway[keep].str.contains('SETTLEMENT', regex=False), 'Settlement', 'M2p')
+    for col in M2P_DATE_COLUMNS:
+        rows[col] = to_utc_naive(rows[col])
+    for col in M2P_AMOUNT_COLUMNS:
+        rows[col] = to_amount(rows[col])
+    return rows.replace({'': None})
+
+
+def import_payments(df: pd.DataFrame) -> dict:
+    """
+    Store the new transactions of an M2P export; IDs already stored (or
+    repeated in the file) are skipped. Returns ledger name -> rows added.
+    """
+    rows = parse_m2p(df)
+    added = insert_new_rows(db.session, Payment, 'transaction_id', rows)
+    if len(added):
+        ledgers = [PAYMENT_LEDGERS[key] for key in zip(added['type'], added['channel'])]
+        add_to_daily_totals(added[['amount', 'tier_fee']].assign(ledger=ledgers, time=added['confirmed']))
+    db.session.commit()
+    counts = added.groupby(['type', 'channel']).size()
+    return {ledger: int(counts.get(key, 0)) for key, ledger in PAYMENT_LEDGERS.items()}
+
+
+def ledger_counts() -> dict:
+    """Ledger name -> number of stored transactions, in one grouped query."""
+    counts = dict.fromkeys(PAYMENT_LEDGERS.values(), 0)
+    query = db.session.query(Payment.type, Payment.channel, func.count()).group_by(Payment.type, Payment.channel)
+    for type_, channel, count in query:
+        counts[PAYMENT_LEDGERS[(type_, channel)]] = count
+    return counts
+
+
+@click.command('import-m2p')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_m2p_command(path):
+    """Import an M2P payments CSV export."""
+    added = import_payments(read_export(path))
+    for ledger, count in added.items():
+        click.echo(f"{ledger}: {count} added")
@@ -0,0 +1,113 @@
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
+
+# Report modes: "summary" keeps only each table's Summary row, "full" every row
+PDF_MODES = {
+    'summary': 'Summary only',
+    'full': 'Full detail',
+}
+
+# Rows per LongTable. Long tables are laid out as consecutive chunks, each of
+# which reportlab splits across pages with the header row repeated, so layout
+# time grows linearly with the number of rows.
+PDF_CHUNK_ROWS = 500
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 8),
+    ('FONTSIZE', (0, 1), (-1, -1), 7),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.beige, colors.white]),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+])
+
+
+def format_cells(df: pd.DataFrame) -> pd.DataFrame:
+    """Cell text of `df`, formatted a column at a time (floats to 4 decimals, blanks for NaN)."""
+    columns = {}
+    for col in df.columns:
+        sr = df[col]
+        if pd.api.types.is_float_dtype(sr):
+            sr = sr.round(4)
+        columns[col] = sr.astype(str).where(sr.notna(), '')
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _column_widths(header, cells: pd.DataFrame, available, char_width=4.2, padding=8):
+    # Width from the longest text in each column, scaled down to fit the page
+    longest = [max(len(h), int(cells[col].str.len().max()) if len(cells) else 0)
+               for h, col in zip(header, cells.columns)]
+    widths = [n * char_width + padding for n in longest]
+    scale = min(1.0, available / sum(widths))
+    return [w * scale for w in widths]
+
+
+def summary_view(df: pd.DataFrame) -> tuple[pd.DataFrame, str]:
+    """Return the Summary row of a per-login table and a caption counting its logins."""
+    if 'Login' not in df.columns:
+        return df, ''
+    is_summary = df['Login'].astype(str) == 'Summary'
+    return df.loc[is_summary], f"Totals over {int((~is_summary).sum()):,} logins"
+
+
+def table_flowables(df: pd.DataFrame, available_width: float, chunk_rows: int = None) -> list:
+    """LongTables for `df`, one per chunk of rows, each repeating the header on every page."""
+    chunk_rows = chunk_rows or PDF_CHUNK_ROWS
+    header = [str(c) for c in df.columns]
+    text = format_cells(df)
+    widths = _column_widths(header, text, available_width)
+    cells = text.to_numpy().tolist()
+    summary_rows = set()
+    if 'Login' in df.columns:
+        summary_rows = set((df['Login'].astype(str) == 'Summary').to_numpy().nonzero()[0])
+
+    tables = []
+    for start in range(0, max(len(cells), 1), chunk_rows):
+        table = LongTable([header, *cells[start:start + chunk_rows]], colWidths=widths, repeatRows=1)
+        table.setStyle(TABLE_STYLE)
+        bold = [('FONTNAME', (0, i - start + 1), (-1, i - start + 1), 'Helvetica-Bold')
+                for i in summary_rows if start <= i < start + chunk_rows]
+        if bold:
+            table.setStyle(TableStyle(bold))
+        tables.append(table)
+    return tables
+
+
+def write_pdf_report(tables: dict, output, date_range: str = "", mode: str = 'full') -> None:
+    """
+    Write `tables` (section title -> DataFrame, in order) as a PDF to
+    `output` (a path or binary file object). In "summary" mode per-login
+    tables are reduced to their Summary row.
+    """
+    if mode not in PDF_MODES:
+        raise ValueError(f"Unknown PDF mode '{mode}'.")
+
+    doc = SimpleDocTemplate(output, pagesize=A4, topMargin=0.5 * inch, bottomMargin=0.5 * inch)
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=16,
+                                 spaceAfter=30, alignment=1, textColor=colors.darkblue)
+    section_style = ParagraphStyle('SectionTitle', parent=styles['Heading2'], fontSize=12,
+                                   spaceAfter=10, textColor=colors.darkgreen)
+
+    title = f"Deals Reporting Dashboard{' - ' + date_range if date_range else ''}"
+    story = [Paragraph(title, title_style), Spacer(1, 20)]
+    for name, df in tables.items():
+        if df is None or df.empty:
+            continue
+        caption = ''
+        if mode == 'summary':
+            df, caption = summary_view(df)
+        story.append(Paragraph(name, section_style))
+        if caption:
+            story.append(Paragraph(caption, styles['Normal']))
+            story.append(Spacer(1, 6))
+        story.extend(table_flowables(df, doc.width))
+        story.append(Spacer(1, 20))
+    doc.build(story)
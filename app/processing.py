@@ -2,6 +2,16 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from app.logins import LoginSet, to_login_array
+from app.money import to_units, from_units, unit_of, divide_units, quantize
+from app.segments import REPORT_SEGMENTS, get_classifier
+
+# Columns the deals CSV must provide for `run_report_processing`.
+DEALS_REQUIRED_COLUMNS = [
+    "Processing rule", "Login", "Notional volume in USD", "Trader profit",
+    "Swaps", "Commission", "TP broker profit", "Total broker profit",
+]
+
 # ─── Helpers ────────────────────────────────────────────────────────────────
 
 def round4(x):
@@ -18,8 +28,8 @@ def parse_custom_datetime(s: str):
     except (ValueError, TypeError):
         return pd.NaT
 
-def sanitize_numeric_series(sr: pd.Series) -> pd.Series:
-    """Clean a pandas Series to ensure it contains only numeric values."""
+def _clean_numeric_strings(sr: pd.Series) -> pd.Series:
+    """Strip everything but digits, dots and minus signs; blanks become 0."""
     return (
         sr.astype(str)
           .str.replace(r"[^\d\.\-]", "", regex=True)
@@ -28,6 +38,41 @@ def sanitize_numeric_series(sr: pd.Series) -> pd.Series:
           .fillna(0.0)
     )
 
+def coerce_numeric(sr: pd.Series) -> tuple[pd.Series, int]:
+    """
+    Convert a column to float64 and return it with the number of values that
+    were not plain numbers (blanks, NaN, "$1,000", "105.00 USD", ...).
+
+    Float columns without NaN are returned as-is, other numeric columns are
+    only cast, and string columns go through `pd.to_numeric`; only the
+    values it cannot parse are cleaned with the regex fallback.
+    """
+    if pd.api.types.is_bool_dtype(sr):
+        return _clean_numeric_strings(sr), len(sr)
+    if pd.api.types.is_numeric_dtype(sr):
+        missing = int(sr.isna().sum())
+        if sr.dtype == np.float64 and not missing:
+            return sr, 0
+        return sr.astype(np.float64).fillna(0.0), missing
+
+    parsed = pd.to_numeric(sr, errors="coerce")
+    failed = parsed.isna().to_numpy() | np.isinf(parsed.to_numpy(dtype="float64", na_value=np.nan))
+    result = parsed.astype(np.float64)
+    if failed.any():
+        result[failed] = _clean_numeric_strings(sr[failed]).to_numpy()
+    return result, int(failed.sum())
+
+def sanitize_numeric_series(sr: pd.Series, coercions: dict = None) -> pd.Series:
+    """
+    Clean a pandas Series to ensure it contains only numeric values. If
+    `coercions` is given, the number of values that needed cleaning is added
+    to it under the series name.
+    """
+    result, coerced = coerce_numeric(sr)
+    if coercions is not None and coerced:
+        coercions[sr.name] = coercions.get(sr.name, 0) + coerced
+    return result
+
 def filter_by_date_range(df: pd.DataFrame, start_date, end_date, datetime_col="Date & Time (UTC)"):
     """Filter a DataFrame by a given date range."""
     if df.empty or datetime_col not in df.columns:
@@ -51,14 +96,21 @@ def filter_by_date_range(df: pd.DataFrame, start_date, end_date, datetime_col="D
 
 # ─── Core Processing ─────────────────────────────────────────────────────────
 
-def process_and_split(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
-    """Convert USC to USD and split the DataFrame by 'Processing rule' into A/B/Multi books."""
+def process_and_split(df: pd.DataFrame, fixed_point: bool = False) -> dict[str, pd.DataFrame]:
+    """
+    Convert USC to USD and split the DataFrame by 'Processing rule' into A/B/Multi books.
+    With `fixed_point`, USC amounts are divided in exact decimal arithmetic.
+    """
     d = df.copy()
+    if fixed_point:
+        usc_to_usd = lambda m: f"{quantize(m.group(1), 100)} USD"
+    else:
+        usc_to_usd = lambda m: f"{round4(float(m.group(1)) / 100):.4f} USD"
     # USC → USD conversion
     for col in d.select_dtypes(include="object"):
         d[col] = d[col].astype(str).str.replace(
             r"(?i)(\d[\d\.\-]*)\s*usc",
-            lambda m: f"{round4(float(m.group(1)) / 100):.4f} USD",
+            usc_to_usd,
             regex=True
         )
 
@@ -97,142 +149,236 @@ def enrich_and_dedupe(df: pd.DataFrame) -> pd.DataFrame:
     headers = list(df.columns) + ["Profit Value", "Profit Unit", "Date", "Time"]
     return pd.DataFrame(output, columns=headers)
 
-def aggregate_book(df: pd.DataFrame, excluded: set[str], book_type: str) -> pd.DataFrame:
-    """Aggregate book data, applying specific exclusion logic based on book type."""
+def aggregate_book(df: pd.DataFrame, excluded, book_type: str, fixed_point: bool = False,
+                   coercions: dict = None) -> pd.DataFrame:
+    """
+    Aggregate book data, applying specific exclusion logic based on book type.
+    With `fixed_point`, amounts are summed as int64 1e-4 units (see app.money)
+    so per-login values and the Summary row are exact. Counts of values that
+    needed cleaning are added to `coercions` (see sanitize_numeric_series).
+    """
     if df.empty:
         return pd.DataFrame()
 
-    required = ["Login", "Notional volume in USD", "Trader profit", "Swaps", "Commission", "TP broker profit", "Total broker profit"]
+    required = [c for c in DEALS_REQUIRED_COLUMNS if c != "Processing rule"]
     for col in required:
         if col not in df:
             raise ValueError(f"Missing required column '{col}' in the deals CSV.")
         if col != "Login":
-            df[col] = sanitize_numeric_series(df[col])
-
-    rows = []
-    for login, group in df.groupby("Login", dropna=False):
-        if pd.isna(login):
-            continue
-
-        login_str = str(int(login)).strip() if pd.notna(login) else ""
-        is_excluded = login_str in excluded
-
-        if book_type == "B Book" and is_excluded:
-            continue
+            df[col] = sanitize_numeric_series(df[col], coercions)
+
+    excluded = LoginSet.coerce(excluded)
+    logins = to_login_array(df["Login"])
+    valid = logins >= 0
+    d = df.loc[valid, required[1:]].copy()
+    if fixed_point:
+        d = d.apply(to_units)
+    d["_login"] = logins[valid]
+    is_excluded = excluded.isin(d["_login"].to_numpy())
+
+    # B Book skips excluded accounts entirely; A/Multi Book keep their volume
+    # and P&L but zero out what the broker earned from them.
+    if book_type == "B Book":
+        d = d[~is_excluded]
+    elif book_type in ["A Book", "Multi Book"]:
+        d.loc[is_excluded, ["Commission", "TP broker profit", "Total broker profit"]] = 0
+
+    if d.empty:
+        return pd.DataFrame()
 
-        comm, tp, bk = (0, 0, 0) if is_excluded and book_type in ["A Book", "Multi Book"] else (group["Commission"].sum(), group["TP broker profit"].sum(), group["Total broker profit"].sum())
-
-        rec = {
-            "Login": login_str,
-            "Total Volume": group["Notional volume in USD"].sum(),
-            "Trader Profit": group["Trader profit"].sum(),
-            "Swaps": group["Swaps"].sum(),
-            "Commission": comm,
-            "TP Profit": tp,
-            "Broker Profit": bk
-        }
-        rec["Net"] = rec["Trader Profit"] + rec["Swaps"] - rec["Commission"]
-        rows.append(rec)
-
-    df_out = pd.DataFrame(rows)
-    if not df_out.empty:
+    g = d.groupby("_login", sort=True).sum()
+    df_out = pd.DataFrame({
+        "Login": g.index.astype(str),
+        "Total Volume": g["Notional volume in USD"].to_numpy(),
+        "Trader Profit": g["Trader profit"].to_numpy(),
+        "Swaps": g["Swaps"].to_numpy(),
+        "Commission": g["Commission"].to_numpy(),
+        "TP Profit": g["TP broker profit"].to_numpy(),
+        "Broker Profit": g["Total broker profit"].to_numpy(),
+    })
+    df_out["Net"] = df_out["Trader Profit"] + df_out["Swaps"] - df_out["Commission"]
+
+    if fixed_point:
+        summary = {c: from_units(int(df_out[c].sum())) for c in df_out.columns if c != "Login"}
+        value_cols = [c for c in df_out.columns if c != "Login"]
+        df_out[value_cols] = df_out[value_cols].apply(from_units)
+    else:
         summary = {c: round4(df_out[c].sum()) for c in df_out.columns if c != "Login"}
-        summary["Login"] = "Summary"
-        return pd.concat([df_out, pd.DataFrame([summary])], ignore_index=True)
-    return df_out
+    summary["Login"] = "Summary"
+    return pd.concat([df_out, pd.DataFrame([summary])], ignore_index=True)
+
+# Source column -> output column for segment tables
+SEGMENT_VALUE_COLUMNS = {
+    "Notional volume in USD": "Total Volume", "Trader profit": "Trader Profit", "Swaps": "Swaps",
+    "Commission": "Commission", "TP broker profit": "TP Profit", "Total broker profit": "Broker Profit",
+}
+SEGMENT_TABLE_COLUMNS = ["Login", *SEGMENT_VALUE_COLUMNS.values(), "Net"]
+
+def compute_segments(enriched_books: dict, excluded, login_lists: dict = None,
+                     segments: dict = None, classifier=None, fixed_point: bool = False):
+    """
+    Evaluate every segment in `segments` (default REPORT_SEGMENTS) in one pass
+    over the deals of all books. Returns (tables, volumes): per-login tables
+    for segments with "table" set, and the notional volume of every segment.
+    """
+    segments = REPORT_SEGMENTS if segments is None else segments
+    login_lists = {name: LoginSet.coerce(v) for name, v in (login_lists or {}).items()}
+    excluded = LoginSet.coerce(excluded)
+    classifier = classifier or get_classifier()
 
-def generate_chinese_clients(enriched_books: dict, excluded: set) -> pd.DataFrame:
-    """Generate analysis for Chinese clients, excluding specified accounts."""
-    chinese_prefixes = ['real\\Chines', 'BBOOK\\Chines']
-    chinese_summary = {}
+    tables = {name: pd.DataFrame(columns=SEGMENT_TABLE_COLUMNS)
+              for name, spec in segments.items() if spec.get("table")}
+    volumes = {name: 0.0 for name in segments}
 
+    frames, books = [], []
     for book_name, df in enriched_books.items():
-        if df.empty:
+        if df.empty or "Login" not in df.columns:
             continue
+        frames.append(df.reindex(columns=["Login", "Group", *SEGMENT_VALUE_COLUMNS]))
+        books.append(np.full(len(df), book_name, dtype=object))
+    if not frames:
+        return tables, volumes
+
+    deals = pd.concat(frames, ignore_index=True)
+    book = np.concatenate(books)
+    logins = to_login_array(deals["Login"])
+    eligible = (logins >= 0) & ~excluded.isin(logins)
+
+    group_segments = sorted({spec["groups"] for spec in segments.values() if "groups" in spec})
+    group_masks = classifier.classify(deals["Group"].fillna(""), group_segments) if group_segments else {}
+
+    masks = {}
+    for name, spec in segments.items():
+        mask = eligible.copy()
+        if "groups" in spec:
+            mask &= group_masks[spec["groups"]]
+        if "logins" in spec:
+            mask &= login_lists.get(spec["logins"], LoginSet()).isin(logins)
+        if "books" in spec:
+            mask &= np.isin(book, list(spec["books"]))
+        masks[name] = mask
+
+    # Only rows that belong to some segment are cleaned and summed
+    rows = np.flatnonzero(np.logical_or.reduce(list(masks.values())))
+    values = (deals.iloc[rows][list(SEGMENT_VALUE_COLUMNS)]
+              .apply(sanitize_numeric_series).rename(columns=SEGMENT_VALUE_COLUMNS))
+    if fixed_point:
+        values = values.apply(to_units)
+    row_logins = logins[rows]
+
+    for name, spec in segments.items():
+        mask = masks[name][rows]
+        part = values[mask]
+        total = part["Total Volume"].sum()
+        volumes[name] = from_units(int(total)) if fixed_point else float(total)
+        if spec.get("table") and mask.any():
+            tables[name] = _segment_table(part, row_logins[mask], fixed_point)
+    return tables, volumes
+
+def _segment_table(values: pd.DataFrame, logins: np.ndarray, fixed_point: bool = False) -> pd.DataFrame:
+    part = values.copy()
+    part.insert(0, "Login", logins)
+    # sort=False keeps logins in order of first appearance across the books
+    g = part.groupby("Login", sort=False).sum()
+    g["Net"] = g["Trader Profit"] + g["Swaps"] - g["Commission"]
+    if fixed_point:
+        summary = {col: from_units(int(g[col].sum())) for col in g.columns}
+        g = g.apply(from_units)
+    else:
+        g = g.round(4)
+    table = g.reset_index()
+    table["Login"] = table["Login"].astype(str)
+    table = table[SEGMENT_TABLE_COLUMNS]
+
+    if not fixed_point:
+        summary = {col: round4(table[col].sum()) for col in table.columns if col != "Login"}
+    summary["Login"] = "Summary"
+    return pd.concat([table, pd.DataFrame([summary])], ignore_index=True)
+
+def generate_chinese_clients(enriched_books: dict, excluded, classifier=None) -> pd.DataFrame:
+    """Generate analysis for Chinese clients, excluding specified accounts."""
+    segments = {"Chinese Clients": REPORT_SEGMENTS["Chinese Clients"]}
+    tables, _ = compute_segments(enriched_books, excluded, segments=segments, classifier=classifier)
+    return tables["Chinese Clients"]
 
-        required_cols = ["Login", "Group", "Notional volume in USD", "Trader profit", "Swaps", "Commission", "TP broker profit", "Total broker profit"]
-        if not all(col in df.columns for col in required_cols):
-            continue
-
-        for _, row in df.iterrows():
-            login = str(int(row["Login"])).strip() if pd.notna(row["Login"]) else ""
-            group = str(row["Group"]).strip()
-
-            if not login or login in excluded or not any(group.startswith(prefix) for prefix in chinese_prefixes):
-                continue
-
-            if login not in chinese_summary:
-                chinese_summary[login] = {"Total Volume": 0, "Trader Profit": 0, "Swaps": 0, "Commission": 0, "TP Profit": 0, "Broker Profit": 0}
-
-            chinese_summary[login]["Total Volume"] += float(row["Notional volume in USD"] or 0)
-            chinese_summary[login]["Trader Profit"] += float(row["Trader profit"] or 0)
-            chinese_summary[login]["Swaps"] += float(row["Swaps"] or 0)
-            chinese_summary[login]["Commission"] += float(row["Commission"] or 0)
-            chinese_summary[login]["TP Profit"] += float(row["TP broker profit"] or 0)
-            chinese_summary[login]["Broker Profit"] += float(row["Total broker profit"] or 0)
-
-    if not chinese_summary:
-        return pd.DataFrame(columns=["Login", "Total Volume", "Trader Profit", "Swaps", "Commission", "TP Profit", "Broker Profit", "Net"])
-
-    rows = []
-    for login, data in chinese_summary.items():
-        net = data["Trader Profit"] + data["Swaps"] - data["Commission"]
-        rows.append({"Login": login, **{k: round4(v) for k, v in data.items()}, "Net": round4(net)})
-
-    df_chinese = pd.DataFrame(rows)
-
-    if not df_chinese.empty:
-        summary = {col: round4(df_chinese[col].sum()) for col in df_chinese.columns if col != "Login"}
-        summary["Login"] = "Summary"
-        df_chinese = pd.concat([df_chinese, pd.DataFrame([summary])], ignore_index=True)
+CLIENT_SUMMARY_COLUMNS = ["Total Volume", "Trader Profit", "Swaps", "Commission", "TP Profit", "Broker Profit", "Net"]
 
-    return df_chinese
+def generate_client_summary(results: dict, breakdown: list = None, top_n: int = None,
+                            rank_by: str = "Total Volume") -> pd.DataFrame:
+    """
+    Generate a consolidated client summary across all books.
 
-def generate_client_summary(results: dict) -> pd.DataFrame:
-    """Generate a consolidated client summary across all books."""
-    all_clients = {}
+    `breakdown` lists summary columns to also report per book (as
+    "<book> <column>"). With `top_n`, only the `top_n` clients with the
+    largest `rank_by` are kept and the Summary row totals those clients.
+    """
+    logins, values, book_codes, books = [], [], [], []
     for book_name, df in results.items():
         if df.empty:
             continue
-        client_data = df[df["Login"] != "Summary"].copy()
-        for _, row in client_data.iterrows():
-            login = row["Login"]
-            if login not in all_clients:
-                all_clients[login] = {"Total Volume": 0, "Trader Profit": 0, "Swaps": 0, "Commission": 0, "TP Profit": 0, "Broker Profit": 0, "Net": 0}
-            for col in all_clients[login]:
-                all_clients[login][col] += float(row.get(col, 0) or 0)
-
-    if not all_clients:
+        part = df.loc[df["Login"] != "Summary"].reindex(columns=["Login", *CLIENT_SUMMARY_COLUMNS])
+        logins.append(part["Login"].to_numpy())
+        values.append(part[CLIENT_SUMMARY_COLUMNS].to_numpy(dtype="float64", na_value=0.0))
+        book_codes.append(np.full(len(part), len(books)))
+        books.append(book_name)
+    if not logins:
         return pd.DataFrame()
 
-    df_summary = pd.DataFrame([{ "Login": login, **{k: round4(v) for k, v in data.items()} } for login, data in all_clients.items()])
-
-    if not df_summary.empty:
-        summary = {col: round4(df_summary[col].sum()) for col in df_summary.columns if col != "Login"}
-        summary["Login"] = "Summary"
-        df_summary = pd.concat([df_summary, pd.DataFrame([summary])], ignore_index=True)
-
-    return df_summary
-
-def calculate_vip_volume(enriched_books: dict, vip_clients: set, excluded: set) -> float:
+    # factorize keeps logins in order of first appearance across the books;
+    # every column is then summed with one bincount over the login codes.
+    codes, uniques = pd.factorize(np.concatenate(logins))
+    values = np.vstack(values)
+    values[np.isnan(values)] = 0.0
+    n = len(uniques)
+    totals = pd.DataFrame(
+        {col: np.bincount(codes, weights=values[:, i], minlength=n) for i, col in enumerate(CLIENT_SUMMARY_COLUMNS)},
+        index=pd.Index(uniques, name="Login"),
+    )
+    if breakdown:
+        book_of_row = np.concatenate(book_codes)
+        for b, book_name in enumerate(books):
+            in_book = book_of_row == b
+            for col in breakdown:
+                i = CLIENT_SUMMARY_COLUMNS.index(col)
+                totals[f"{book_name} {col}"] = np.bincount(codes[in_book], weights=values[in_book, i], minlength=n)
+    if top_n is not None:
+        totals = totals.nlargest(top_n, rank_by)
+
+    df_summary = totals.round(4).reset_index()
+
+    summary = {col: round4(df_summary[col].sum()) for col in df_summary.columns if col != "Login"}
+    summary["Login"] = "Summary"
+    return pd.concat([df_summary, pd.DataFrame([summary])], ignore_index=True)
+
+def calculate_vip_volume(enriched_books: dict, vip_clients, excluded) -> float:
     """Calculate the total volume for VIP clients, excluding specified accounts."""
-    total_vip_volume = 0
-    for book_name, df in enriched_books.items():
-        if df.empty or "Login" not in df.columns or "Notional volume in USD" not in df.columns:
-            continue
-        for _, row in df.iterrows():
-            login = str(int(row["Login"])).strip() if pd.notna(row["Login"]) else ""
-            if login and login in vip_clients and login not in excluded:
-                total_vip_volume += float(row["Notional volume in USD"] or 0)
-    return total_vip_volume
-
-def generate_final_calculations(results: dict, chinese_df: pd.DataFrame, vip_volume: float, date_range: str = "") -> pd.DataFrame:
-    """Generate the final summary calculations table."""
-    def get_sum(book_name, column):
+    segments = {"VIP Clients": REPORT_SEGMENTS["VIP Clients"]}
+    _, volumes = compute_segments(enriched_books, excluded, {"vip": vip_clients}, segments)
+    return volumes["VIP Clients"]
+
+def generate_final_calculations(results: dict, segment_volumes: dict, date_range: str = "",
+                                fixed_point: bool = False) -> pd.DataFrame:
+    """
+    Generate the final summary calculations table. `segment_volumes` maps
+    segment name -> notional volume; each segment gets a lot line and is
+    subtracted from the retail lots. With `fixed_point`, every figure is
+    computed in 1e-4 integer units, so the lines add up exactly.
+    """
+    def book_sum(book_name, column):
         if book_name not in results or results[book_name].empty: return 0
         summary_row = results[book_name][results[book_name]["Login"] == "Summary"]
         return float(summary_row[column].iloc[0] or 0) if not summary_row.empty else 0
 
+    if fixed_point:
+        get_sum = lambda book_name, column: unit_of(book_sum(book_name, column))
+        to_lot = lambda volume: divide_units(volume, 200000)
+        segment_volumes = {name: unit_of(volume) for name, volume in segment_volumes.items()}
+        show = from_units
+    else:
+        get_sum = book_sum
+        to_lot = lambda volume: volume / 200000
+        show = round4
+
     a_book_commission = get_sum("A Book", "Commission")
     a_book_tp = get_sum("A Book", "TP Profit")
     multi_commission = get_sum("Multi Book", "Commission")
@@ -251,13 +397,11 @@ def generate_final_calculations(results: dict, chinese_df: pd.DataFrame, vip_vol
 
     total_swaps = get_sum("A Book", "Swaps") + get_sum("Multi Book", "Swaps")
 
-    a_book_lot = (a_book_volume + multi_volume) / 200000
-    b_book_lot = b_book_volume / 200000
+    a_book_lot = to_lot(a_book_volume + multi_volume)
+    b_book_lot = to_lot(b_book_volume)
 
-    chinese_volume = get_sum("Chinese Clients", "Total Volume") if not chinese_df.empty else 0
-    chinese_lot = chinese_volume / 200000
-    vip_lot = vip_volume / 200000
-    retail_lot = a_book_lot + b_book_lot - chinese_lot - vip_lot
+    segment_lots = {name: to_lot(volume) for name, volume in segment_volumes.items()}
+    retail_lot = a_book_lot + b_book_lot - sum(segment_lots.values())
     total_lot = a_book_lot + b_book_lot
 
     calculations = []
@@ -266,39 +410,48 @@ def generate_final_calculations(results: dict, chinese_df: pd.DataFrame, vip_vol
 
     calculations.extend([
         ["A BOOK SUMMARY", "", ""], ["Source", "Description", "Value"],
-        ["A Book Result", "Sum of TP Broker Profit + Commission", round4(a_book_tp + a_book_commission)],
-        ["Multi Book Result", "Sum of TP Broker Profit + Commission", round4(multi_tp + multi_commission)],
-        ["Total A Book", "Sum of above two values", round4(a_book_total)],
+        ["A Book Result", "Sum of TP Broker Profit + Commission", show(a_book_tp + a_book_commission)],
+        ["Multi Book Result", "Sum of TP Broker Profit + Commission", show(multi_tp + multi_commission)],
+        ["Total A Book", "Sum of above two values", show(a_book_total)],
         ["", "", ""],
         ["B BOOK SUMMARY", "", ""], ["Source", "Description", "Value"],
-        ["B Book Result", "(-1) * Sum of (Trader + Swaps - Commission)", round4(b_book_tsm)],
-        ["Multi Book Result", "Total Broker Profit - TP Broker Profit", round4(b_book_extra)],
-        ["Total B Book", "Sum of above two values", round4(b_book_total)],
+        ["B Book Result", "(-1) * Sum of (Trader + Swaps - Commission)", show(b_book_tsm)],
+        ["Multi Book Result", "Total Broker Profit - TP Broker Profit", show(b_book_extra)],
+        ["Total B Book", "Sum of above two values", show(b_book_total)],
         ["", "", ""],
         ["EXTRA SUMMARY DATA", "", ""],
-        ["A Book", "Client's Spread (TP Broker Profit)", round4(a_book_tp + multi_tp)],
-        ["A Book", "Client's Commission", round4(a_book_commission + multi_commission)],
-        ["Total Swap", "Sum of all Swaps", round4(total_swaps)],
-        ["A Book", "Volume (Lot)", round4(a_book_lot)],
-        ["B Book", "Volume (Lot)", round4(b_book_lot)],
-        ["Chinese Clients", "Volume (Lot)", round4(chinese_lot)],
-        ["VIP Clients", "Volume (Lot)", round4(vip_lot)],
-        ["Retail Clients", "Volume (Lot)", round4(retail_lot)],
-        ["Total Volume", "A Book + B Book", round4(total_lot)]
+        ["A Book", "Client's Spread (TP Broker Profit)", show(a_book_tp + multi_tp)],
+        ["A Book", "Client's Commission", show(a_book_commission + multi_commission)],
+        ["Total Swap", "Sum of all Swaps", show(total_swaps)],
+        ["A Book", "Volume (Lot)", show(a_book_lot)],
+        ["B Book", "Volume (Lot)", show(b_book_lot)],
+        *[[name, "Volume (Lot)", show(lot)] for name, lot in segment_lots.items()],
+        ["Retail Clients", "Volume (Lot)", show(retail_lot)],
+        ["Total Volume", "A Book + B Book", show(total_lot)]
     ])
 
     return pd.DataFrame(calculations, columns=["Source", "Description", "Value"])
 
-def run_report_processing(deals_df: pd.DataFrame, excluded_df: pd.DataFrame, vip_df: pd.DataFrame, start_date: str = None, end_date: str = None):
+def _login_set_from(source) -> LoginSet:
+    if isinstance(source, pd.DataFrame):
+        return LoginSet(source.iloc[:, 0]) if not source.empty else LoginSet()
+    return LoginSet.coerce(source)
+
+def run_report_processing(deals_df: pd.DataFrame, excluded_df: pd.DataFrame, vip_df: pd.DataFrame, start_date: str = None, end_date: str = None, segments: dict = None, report_segments: dict = None, login_lists: dict = None, fixed_point: bool = False):
     """
     Main orchestrator function to run the entire report generation process.
+    `segments` overrides the Group rules used to classify clients and
+    `report_segments` the segments reported on (see app.segments);
+    `login_lists` provides extra login lists those segments refer to.
+    `fixed_point` switches money arithmetic to exact 1e-4 integer units.
     """
-    # 1. Load sets for excluded and vip clients
-    excluded_logins = set(excluded_df.iloc[:, 0].astype(str).str.strip()) if not excluded_df.empty else set()
-    vip_logins = set(vip_df.iloc[:, 0].astype(str).str.strip()) if not vip_df.empty else set()
+    # 1. Load sets for excluded and vip clients (a one-column DataFrame, or a
+    #    LoginSet taken from a managed reference list)
+    excluded_logins = _login_set_from(excluded_df)
+    vip_logins = _login_set_from(vip_df)
 
     # 2. Process and split the main deals dataframe
-    books = process_and_split(deals_df)
+    books = process_and_split(deals_df, fixed_point)
     enriched = {k: enrich_and_dedupe(v) for k, v in books.items()}
 
     # 3. Apply date filtering if enabled
@@ -309,15 +462,17 @@ def run_report_processing(deals_df: pd.DataFrame, excluded_df: pd.DataFrame, vip
             enriched[k] = filter_by_date_range(enriched[k], start_date, end_date)
 
     # 4. Generate all analyses
+    coercions = {}
     results = {
-        book_name: aggregate_book(book_data, excluded_logins, book_name)
+        book_name: aggregate_book(book_data, excluded_logins, book_name, fixed_point, coercions)
         for book_name, book_data in enriched.items()
     }
 
-    chinese_clients = generate_chinese_clients(enriched, excluded_logins)
+    segment_tables, segment_volumes = compute_segments(
+        enriched, excluded_logins, {**(login_lists or {}), "vip": vip_logins},
+        report_segments, get_classifier(segments), fixed_point)
     client_summary = generate_client_summary(results)
-    vip_volume = calculate_vip_volume(enriched, vip_logins, excluded_logins)
-    final_calculations = generate_final_calculations(results, chinese_clients, vip_volume, date_range_str)
+    final_calculations = generate_final_calculations(results, segment_volumes, date_range_str, fixed_point)
 
     return {
         "A Book Raw": enriched.get("A Book", pd.DataFrame()),
@@ -326,8 +481,9 @@ def run_report_processing(deals_df: pd.DataFrame, excluded_df: pd.DataFrame, vip
         "A Book Result": results.get("A Book", pd.DataFrame()),
         "B Book Result": results.get("B Book", pd.DataFrame()),
         "Multi Book Result": results.get("Multi Book", pd.DataFrame()),
-        "Chinese Clients": chinese_clients,
+        **segment_tables,
         "Client Summary": client_summary,
         "Final Calculations": final_calculations,
-        "VIP Volume": vip_volume
+        "VIP Volume": segment_volumes.get("VIP Clients", 0.0),
+        "Coerced Values": coercions
     }
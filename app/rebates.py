@@ -0,0 +1,126 @@
+import click
+import pandas as pd
+from sqlalchemy import func, select
+
+from app import db
+from app.database import insert_new_rows, upsert_daily_totals
+from app.models import IBRebate, IBRebateDaily
+from app.payments import read_export, to_amount
+
+REBATE_REQUIRED_COLUMNS = ['Transaction ID', 'Rebate Time', 'Rebate']
+
+# IB rebate export column -> IBRebate attribute
+REBATE_COLUMNS = {
+    'Transaction ID': 'transaction_id',
+    'Order ID': 'order_id',
+    'Platform': 'platform',
+    'Account ID': 'account_id',
+    'Volume': 'volume',
+    'Symbol': 'symbol',
+    'Swaps': 'swaps',
+    'Commission': 'commission',
+    'Profit': 'profit',
+    'Trader': 'trader',
+    'Receiver': 'receiver',
+    'Rebate Platform': 'rebate_platform',
+    'Rebate Account': 'rebate_account',
+    'Rebate Rules': 'rebate_rules',
+    'Commission Parameter': 'commission_parameter',
+    'Formula': 'formula',
+    'Currency': 'currency',
+    'Rebate': 'rebate',
+    'Open Time': 'open_time',
+    'Close Time': 'close_time',
+    'Rebate Time': 'rebate_time',
+    'Status': 'status',
+    'Failure Reason': 'failure_reason',
+}
+REBATE_DATE_COLUMNS = ['open_time', 'close_time', 'rebate_time']
+REBATE_AMOUNT_COLUMNS = ['volume', 'swaps', 'commission', 'profit', 'rebate']
+
+# Dimensions of the maintained daily totals (IBRebateDaily)
+DAILY_KEYS = ['day', 'receiver', 'rebate_account', 'symbol']
+
+
+def parse_rebates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Turn an IB rebate export into IBRebate rows. A rebate is identified by
+    its Transaction ID, or by Order ID and rebate account when it has none;
+    rows with neither, or without a valid Rebate Time, are dropped.
+    """
+    missing = [c for c in REBATE_REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s) {', '.join(missing)} in the IB rebate export.")
+
+    rows = df.reindex(columns=list(REBATE_COLUMNS)).fillna('').rename(columns=REBATE_COLUMNS)
+    rows = rows.apply(lambda col: col.str.strip())
+    for col in REBATE_DATE_COLUMNS:
+        rows[col] = pd.to_datetime(rows[col], errors='coerce', format='mixed')
+    for col in REBATE_AMOUNT_COLUMNS:
+        rows[col] = to_amount(rows[col])
+
+    by_order = 'order:' + rows['order_id'] + ':' + rows['rebate_account']
+    rows.insert(0, 'rebate_key', rows['transaction_id'].where(rows['transaction_id'] != '', by_order))
+    keep = rows['rebate_time'].notna() & ((rows['transaction_id'] != '') | (rows['order_id'] != ''))
+    return rows.loc[keep].replace({'': None})
+
+
+def _add_to_daily(rows: pd.DataFrame):
+    """Fold newly inserted rebates into the daily totals: update existing groups, insert new ones."""
+    delta = (rows.assign(day=rows['rebate_time'].dt.date)
+             .fillna({'receiver': '', 'rebate_account': '', 'symbol': ''})
+             .groupby(DAILY_KEYS)
+             .agg(rebate=('rebate', 'sum'), volume=('volume', 'sum'), rebate_count=('rebate_key', 'size'))
+             .reset_index())
+
+    upsert_daily_totals(db.session, IBRebateDaily.__table__, DAILY_KEYS, delta,
+                        sums=['rebate', 'volume', 'rebate_count'])
+
+
+def import_rebates(df: pd.DataFrame) -> int:
+    """Store the new rebates of an export and update the daily totals; returns the number added."""
+    added = insert_new_rows(db.session, IBRebate, 'rebate_key', parse_rebates(df))
+    if len(added):
+        _add_to_daily(added)
+    db.session.commit()
+    return len(added)
+
+
+def _day_filter(query, start=None, end=None):
+    if start is not None:
+        query = query.where(IBRebateDaily.day >= start)
+    if end is not None:
+        query = query.where(IBRebateDaily.day <= end)
+    return query
+
+
+def total_rebate(start=None, end=None) -> float:
+    """Sum of all rebates, optionally for the days from `start` to `end` (inclusive)."""
+    query = _day_filter(select(func.coalesce(func.sum(IBRebateDaily.rebate), 0.0)), start, end)
+    return float(db.session.scalar(query))
+
+
+def rebates_by_ib(start=None, end=None, limit=None) -> pd.DataFrame:
+    """Rebate, volume and payout count per receiver and rebate account, largest first."""
+    rebate = func.sum(IBRebateDaily.rebate).label('rebate')
+    query = _day_filter(
+        select(IBRebateDaily.receiver, IBRebateDaily.rebate_account, rebate,
+               func.sum(IBRebateDaily.volume), func.sum(IBRebateDaily.rebate_count))
+        .group_by(IBRebateDaily.receiver, IBRebateDaily.rebate_account)
+        .order_by(rebate.desc()), start, end)
+    if limit:
+        query = query.limit(limit)
+    return pd.DataFrame(db.session.execute(query).all(),
+                        columns=['Receiver', 'Rebate Account', 'Rebate', 'Volume', 'Rebates'])
+
+
+def rebate_period():
+    """(first, last) rebate time stored, read from the rebate_time index; (None, None) if empty."""
+    return db.session.execute(select(func.min(IBRebate.rebate_time), func.max(IBRebate.rebate_time))).one()
+
+
+@click.command('import-ib-rebates')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_ib_rebates_command(path):
+    """Import an IB rebate CSV export."""
+    click.echo(f"IB Rebate: {import_rebates(read_export(path))} added")
@@ -0,0 +1,280 @@
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+from sqlalchemy import select, update
+
+from app import db
+from app.models import CRMDeposit, CRMWithdrawal, Payment
+from app.payments import PAYMENT_LEDGERS
+
+# Columns of the discrepancy sheets. Rows are identified by the stored
+# record's own ID (CRM request ID or M2P transaction ID) rather than a row
+# number, so they stay valid when more data is imported.
+CONFIRMED_COLUMN = '✅ Confirmed (Y/N)'
+DISCREPANCY_COLUMNS = ['Source', 'Date', 'Client ID', 'Trading Account', 'Amount', 'Client Name',
+                       CONFIRMED_COLUMN, 'Record ID']
+
+# Discrepancy Source -> (model, record ID attribute) of the records listed under it
+RECORD_SOURCES = {
+    'CRM Deposit': (CRMDeposit, 'request_id'),
+    'CRM Withdrawal': (CRMWithdrawal, 'request_id'),
+    **{ledger: (Payment, 'transaction_id') for ledger in PAYMENT_LEDGERS.values()},
+}
+
+# Candidate pairs checked per step of the window join
+JOIN_CHUNK_PAIRS = 1_000_000
+# Record IDs per UPDATE when resolving discrepancies
+RESOLVE_BATCH_SIZE = 5000
+
+
+def _to_ms(times) -> tuple[np.ndarray, np.ndarray]:
+    times = np.asarray(times, dtype='datetime64[ms]')
+    return times.astype(np.int64), ~np.isnat(times)
+
+
+def window_join(left_key, left_time, left_amount, right_key, right_time, right_amount,
+                window: pd.Timedelta, tolerance: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Find which rows on each side have a partner on the other with the same
+    key, a time at most `window` away and an amount at most `tolerance` away.
+
+    Keys are non-negative integer codes (-1 never matches). The right side is
+    sorted once by (key, time); each left row then finds its candidate range
+    with two binary searches, and only those candidates have their amounts
+    compared, so the cost grows with the number of rows, not their product.
+    Returns (left_hit, right_hit) boolean arrays.
+    """
+    left_key, right_key = np.asarray(left_key, np.int64), np.asarray(right_key, np.int64)
+    left_amount = np.asarray(left_amount, np.float64)
+    right_amount = np.asarray(right_amount, np.float64)
+    left_ms, left_ok = _to_ms(left_time)
+    right_ms, right_ok = _to_ms(right_time)
+    left_hit, right_hit = np.zeros(len(left_key), bool), np.zeros(len(right_key), bool)
+
+    lv = np.flatnonzero(left_ok & (left_key >= 0) & ~np.isnan(left_amount))
+    rv = np.flatnonzero(right_ok & (right_key >= 0) & ~np.isnan(right_amount))
+    if not len(lv) or not len(rv):
+        return left_hit, right_hit
+
+    # One sortable int64 per row: key * stride + time, where the stride
+    # leaves room for a full window on both sides of every time.
+    w = int(window / pd.Timedelta(milliseconds=1))
+    base = min(left_ms[lv].min(), right_ms[rv].min())
+    stride = max(left_ms[lv].max(), right_ms[rv].max()) - base + 2 * w + 1
+    left_pos = left_key[lv] * stride + (left_ms[lv] - base) + w
+    right_pos = right_key[rv] * stride + (right_ms[rv] - base) + w
+
+    order = np.argsort(right_pos, kind='stable')
+    right_pos, rv = right_pos[order], rv[order]
+    lo = np.searchsorted(right_pos, left_pos - w, side='left')
+    counts = np.searchsorted(right_pos, left_pos + w, side='right') - lo
+
+    # Expand the candidate ranges a bounded number of pairs at a time
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(lv):
+        stop = max(int(np.searchsorted(ends, ends[start] - counts[start] + JOIN_CHUNK_PAIRS, side='right')),
+                   start + 1)
+        c = counts[start:stop]
+        total = int(c.sum())
+        if total:
+            li = np.repeat(np.arange(start, stop), c)
+            ri = lo[li] + np.arange(total) - np.repeat(np.cumsum(c) - c, c)
+            ok = np.abs(left_amount[lv[li]] - right_amount[rv[ri]]) <= tolerance
+            left_hit[lv[li[ok]]] = True
+            right_hit[rv[ri[ok]]] = True
+        start = stop
+    return left_hit, right_hit
+
+
+def contained_ids(accounts: pd.Series, ids: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pairs (row of `accounts`, position in `ids`) where the account text
+    contains the ID, found by looking up each substring of an ID's length
+    instead of scanning every ID per account.
+    """
+    positions = {value: i for i, value in enumerate(ids)}
+    lengths = sorted({len(value) for value in positions})
+    codes, distinct = pd.factorize(accounts)
+
+    found = []
+    for account in distinct:
+        hits = {positions[account[i:i + n]] for n in lengths for i in range(len(account) - n + 1)
+                if account[i:i + n] in positions}
+        found.append(sorted(hits))
+
+    counts = np.array([len(hits) for hits in found], dtype=np.int64)
+    rows = np.repeat(np.arange(len(accounts)), counts[codes])
+    return rows, np.array([i for code in codes for i in found[code]], dtype=np.int64)
+
+
+def match_requests(crm: pd.DataFrame, payments: pd.DataFrame, window: pd.Timedelta, tolerance: float,
+                   amount_columns=('amount',)) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Which CRM requests (client_id, time and `amount_columns`) and payments
+    (trading_account, time, amount) have a counterpart: a row on the other
+    side whose trading account contains the client ID, within `window` and
+    with any of the request's amounts within `tolerance`. A row may match
+    several; any one counts.
+    """
+    client = crm['client_id'].fillna('').str.strip().str.lower()
+    account = payments['trading_account'].fillna('').str.strip().str.lower()
+    client_code, ids = pd.factorize(client)
+    rows, id_pos = contained_ids(account, pd.Series(ids))
+
+    # A request with several amounts joins once per amount
+    k = len(amount_columns)
+    crm_hit, pair_hit = window_join(
+        np.tile(client_code, k), np.tile(crm['time'].to_numpy('datetime64[ns]'), k),
+        np.concatenate([crm[c].to_numpy(np.float64) for c in amount_columns]),
+        id_pos, payments['time'].to_numpy('datetime64[ns]')[rows], payments['amount'].to_numpy(np.float64)[rows],
+        window, tolerance)
+    payment_hit = np.zeros(len(payments), bool)
+    payment_hit[rows[pair_hit]] = True
+    return crm_hit.reshape(k, len(crm)).any(axis=0), payment_hit
+
+
+def _discrepancy_rows(source, dates, client_id, account, amount, name, record_id) -> pd.DataFrame:
+    return pd.DataFrame({
+        'Source': source,
+        'Date': dates.dt.strftime('%Y-%m-%d').fillna(''),
+        'Client ID': client_id,
+        'Trading Account': account,
+        'Amount': amount,
+        'Client Name': name,
+        CONFIRMED_COLUMN: '',
+        'Record ID': record_id,
+    }, columns=DISCREPANCY_COLUMNS)
+
+
+def _in_range(times: pd.Series, start=None, end=None) -> np.ndarray:
+    inside = np.ones(len(times), bool)
+    if start is not None:
+        inside &= (times >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        inside &= (times < pd.Timestamp(end)).to_numpy()
+    return inside
+
+
+def find_discrepancies(crm: pd.DataFrame, payments: pd.DataFrame, crm_source: str, window: pd.Timedelta,
+                       tolerance: float, start=None, end=None, amount_columns=('amount',),
+                       unpaid=None) -> pd.DataFrame:
+    """
+    A discrepancy sheet: CRM requests without a payment, then payments
+    without a CRM request, in their stored order. Payments are labelled with
+    their `source` column. Requests flagged in the boolean array `unpaid`
+    are not expected to have a payment and are never reported. Only rows
+    timed from `start` up to (not including) `end` are reported; the others
+    only serve as counterparts.
+    """
+    crm_hit, payment_hit = match_requests(crm, payments, window, tolerance, amount_columns)
+    keep = ~crm_hit & _in_range(crm['time'], start, end)
+    if unpaid is not None:
+        keep &= ~unpaid
+    crm_rows = crm.loc[keep]
+    payment_rows = payments.loc[~payment_hit & _in_range(payments['time'], start, end)]
+    return pd.concat([
+        _discrepancy_rows(crm_source, crm_rows['time'], crm_rows['client_id'].fillna('').str.strip().str.lower(),
+                          '', crm_rows['amount'], crm_rows['name'].fillna(''), crm_rows['request_id']),
+        _discrepancy_rows(payment_rows['source'], payment_rows['time'], '',
+                          payment_rows['trading_account'].fillna('').str.strip().str.lower(),
+                          payment_rows['amount'], '', payment_rows['transaction_id']),
+    ], ignore_index=True)
+
+
+def _load(columns, time_column, start=None, end=None, *where) -> pd.DataFrame:
+    # Resolved records are left out entirely, as matched and as counterparts
+    table = columns[0].table
+    query = select(*columns, time_column.label('time')).where(table.c.resolved_at.is_(None), *where)
+    query = query.order_by(table.c.id)
+    if start is not None:
+        query = query.where(time_column >= start)
+    if end is not None:
+        query = query.where(time_column < end)
+    frame = pd.DataFrame(db.session.execute(query).all(), columns=[*(c.key for c in columns), 'time'])
+    return frame.astype({'time': 'datetime64[ns]', 'amount': 'float64'})
+
+
+def resolve_discrepancies(records, user_id=None) -> int:
+    """
+    Confirm discrepancies, given as (Source, Record ID) pairs, so that later
+    reconciliations skip their records. The records of each table are marked
+    with one set-based UPDATE (per RESOLVE_BATCH_SIZE IDs); records already
+    resolved keep their first resolution. Returns the number newly resolved.
+    """
+    ids = defaultdict(set)
+    for source, record_id in records:
+        if source not in RECORD_SOURCES:
+            raise ValueError(f"Unknown discrepancy source '{source}'.")
+        ids[RECORD_SOURCES[source]].add(str(record_id))
+
+    now, resolved = datetime.utcnow(), 0
+    for (model, key), values in ids.items():
+        values = sorted(values)
+        for start in range(0, len(values), RESOLVE_BATCH_SIZE):
+            result = db.session.execute(
+                update(model)
+                .where(getattr(model, key).in_(values[start:start + RESOLVE_BATCH_SIZE]), model.resolved_at.is_(None))
+                .values(resolved_at=now, resolved_by=user_id))
+            resolved += result.rowcount
+    db.session.commit()
+    return resolved
+
+
+def confirmed_in_sheet(df: pd.DataFrame) -> list:
+    """(Source, Record ID) of the rows marked Y in a downloaded discrepancy sheet."""
+    missing = [c for c in ['Source', 'Record ID', CONFIRMED_COLUMN] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s) {', '.join(missing)} in the discrepancy sheet.")
+    confirmed = df.loc[df[CONFIRMED_COLUMN].astype(str).str.strip().str.upper() == 'Y']
+    return list(zip(confirmed['Source'].str.strip(), confirmed['Record ID'].astype(str).str.strip()))
+
+
+def _load_payments(type_, channels, start=None, end=None) -> pd.DataFrame:
+    payments = _load([Payment.transaction_id, Payment.trading_account, Payment.amount, Payment.channel],
+                     Payment.confirmed, start, end, Payment.type == type_, Payment.channel.in_(channels))
+    payments['source'] = payments['channel'].map({channel: ledger for (t, channel), ledger
+                                                  in PAYMENT_LEDGERS.items() if t == type_})
+    return payments
+
+
+def _reconciliation_settings(start, end):
+    window = pd.Timedelta(hours=current_app.config['RECONCILIATION_WINDOW_HOURS'])
+    tolerance = current_app.config['RECONCILIATION_AMOUNT_TOLERANCE']
+    # Records up to one window outside the range are loaded too, so a record
+    # is not reported only because its counterpart falls across the boundary.
+    outer_start = None if start is None else pd.Timestamp(start) - window
+    outer_end = None if end is None else pd.Timestamp(end) + window
+    return window, tolerance, outer_start, outer_end
+
+
+def reconcile_deposits(start=None, end=None) -> pd.DataFrame:
+    """
+    Deposit Discrepancies between the stored CRM deposits and M2p deposits
+    for records timed from `start` up to (not including) `end`. TopChange
+    deposits are not paid through M2P and are never reported.
+    """
+    window, tolerance, outer_start, outer_end = _reconciliation_settings(start, end)
+    crm = _load([CRMDeposit.request_id, CRMDeposit.client_id, CRMDeposit.name, CRMDeposit.payment_method,
+                 CRMDeposit.amount], CRMDeposit.request_time, outer_start, outer_end)
+    m2p = _load_payments('DEPOSIT', ['M2p'], outer_start, outer_end)
+    topchange = (crm['payment_method'].fillna('').str.strip().str.lower() == 'topchange').to_numpy()
+    return find_discrepancies(crm, m2p, 'CRM Deposit', window, tolerance, start, end, unpaid=topchange)
+
+
+def reconcile_withdrawals(start=None, end=None) -> pd.DataFrame:
+    """
+    Withdrawal Discrepancies between the stored CRM withdrawals (by review
+    time) and the M2p and Settlement withdrawals. A payout matches either
+    the USD Withdrawal Amount or the Net Withdrawal Amount actually sent.
+    """
+    window, tolerance, outer_start, outer_end = _reconciliation_settings(start, end)
+    crm = _load([CRMWithdrawal.request_id, CRMWithdrawal.client_id, CRMWithdrawal.name, CRMWithdrawal.amount,
+                 CRMWithdrawal.net_amount], CRMWithdrawal.review_time, outer_start, outer_end)
+    crm['net_amount'] = crm['net_amount'].astype('float64')
+    payouts = _load_payments('WITHDRAW', ['M2p', 'Settlement'], outer_start, outer_end)
+    return find_discrepancies(crm, payouts, 'CRM Withdrawal', window, tolerance, start, end,
+                              amount_columns=('amount', 'net_amount'))
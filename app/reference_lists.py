@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import click
+import pandas as pd
+from flask import current_app
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.logins import LoginSet
+from app.models import ReferenceList, ReferenceListVersion, ReferenceListEntry
+
+# Lists the app knows about; name -> label shown in the UI
+REFERENCE_LISTS = {
+    'excluded': 'Excluded Accounts',
+    'vip': 'VIP Clients',
+    'welcome_bonus': 'Welcome Bonus Accounts',
+}
+
+INSERT_BATCH_SIZE = 10000
+# Attempts at taking the next version number when concurrent imports collide
+VERSION_ATTEMPTS = 5
+
+# (name, version) -> LoginSet. Versions are immutable, so an entry never goes
+# stale; moving a list to a new version simply makes reports ask for a new key.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def import_reference_list(name, logins, user_id=None, source_digest=None, make_current=True):
+    """
+    Store `logins` as the next version of reference list `name` and, unless
+    `make_current` is false, make it current. If `source_digest` matches the
+    source file of the current version (or, for a version that is not made
+    current, of any version), that version is returned unchanged instead.
+
+    Versions that are not made current are pinned by one analyst's report
+    only; every other report keeps using the current version.
+    """
+    if name not in REFERENCE_LISTS:
+        raise ValueError(f"Unknown reference list '{name}'.")
+
+    login_set = LoginSet.coerce(logins)
+    for attempt in range(VERSION_ATTEMPTS):
+        try:
+            version, added = _add_version(name, login_set, user_id, source_digest, make_current)
+            break
+        except IntegrityError:
+            # A concurrent import created the list or took the version number first
+            db.session.rollback()
+            if attempt == VERSION_ATTEMPTS - 1:
+                raise
+    if added:
+        _store(name, version.version, login_set)
+    return version
+
+
+def _add_version(name, login_set, user_id, source_digest, make_current):
+    """Import one version of list `name` in a transaction; returns (version, whether it was added)."""
+    # The lock makes concurrent imports of a list take turns on PostgreSQL;
+    # elsewhere the unique (list_id, version) constraint catches collisions.
+    ref = ReferenceList.query.filter_by(name=name).with_for_update().first()
+    if ref is None:
+        ref = ReferenceList(name=name, current_version=0)
+        db.session.add(ref)
+        db.session.flush()
+    elif source_digest:
+        existing = ref.versions.filter_by(source_digest=source_digest)
+        if make_current:
+            existing = existing.filter_by(version=ref.current_version)
+        existing = existing.first()
+        if existing is not None:
+            return existing, False
+
+    version = ReferenceListVersion(list_id=ref.id, version=_next_version(ref),
+                                   entry_count=len(login_set), source_digest=source_digest,
+                                   created_by=user_id)
+    db.session.add(version)
+    db.session.flush()
+
+    values = login_set.array.tolist()
+    for start in range(0, len(values), INSERT_BATCH_SIZE):
+        db.session.execute(insert(ReferenceListEntry), [
+            {'version_id': version.id, 'login': login}
+            for login in values[start:start + INSERT_BATCH_SIZE]
+        ])
+
+    if make_current:
+        ref.current_version = version.version
+        ref.updated_at = datetime.utcnow()
+    db.session.commit()
+    return version, True
+
+
+def _next_version(ref):
+    latest = db.session.scalar(select(func.max(ReferenceListVersion.version))
+                               .where(ReferenceListVersion.list_id == ref.id))
+    return (latest or 0) + 1
+
+
+def current_version(name):
+    """Return the current version number of list `name`, or None if it has none."""
+    ref = ReferenceList.query.filter_by(name=name).first()
+    return ref.current_version if ref is not None and ref.current_version else None
+
+
+def get_login_set(name, version=None):
+    """
+    Return (LoginSet, version) for list `name`. `version=None` means the
+    current version; a list that was never imported yields an empty set.
+    """
+    if version is None:
+        version = current_version(name)
+        if version is None:
+            return LoginSet(), None
+
+    with _cache_lock:
+        login_set = _cache.get((name, version))
+        if login_set is not None:
+            _cache.move_to_end((name, version))
+            return login_set, version
+
+    rows = (db.session.query(ReferenceListEntry.login)
+            .join(ReferenceListVersion, ReferenceListVersion.id == ReferenceListEntry.version_id)
+            .join(ReferenceList, ReferenceList.id == ReferenceListVersion.list_id)
+            .filter(ReferenceList.name == name, ReferenceListVersion.version == version)
+            .all())
+    login_set = LoginSet([row[0] for row in rows])
+    _store(name, version, login_set)
+    return login_set, version
+
+
+def _store(name, version, login_set):
+    max_entries = current_app.config.get('REFERENCE_LIST_CACHE_SIZE', 16)
+    with _cache_lock:
+        _cache[(name, version)] = login_set
+        _cache.move_to_end((name, version))
+        while len(_cache) > max_entries:
+            _cache.popitem(last=False)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+@click.command('import-reference-list')
+@click.argument('name', type=click.Choice(sorted(REFERENCE_LISTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_reference_list_command(name, path):
+    """Import a one-column CSV of logins as the next version of a reference list."""
+    try:
+        logins = pd.read_csv(path, header=None).iloc[:, 0]
+    except pd.errors.EmptyDataError:
+        logins = []
+    version = import_reference_list(name, logins)
+    click.echo(f"Imported {version.entry_count} logins into {name} v{version.version}")
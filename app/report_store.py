@@ -0,0 +1,98 @@
+import hashlib
+import os
+
+import pandas as pd
+from sqlalchemy import create_engine, insert, inspect, select
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.database import normalize_database_url, engine_options, configure_sqlite_pragmas
+from app.models import ReportRun, ReportClientResult, ReportCalculation
+
+# Result table column -> ReportClientResult attribute
+RESULT_COLUMNS = {
+    "Total Volume": "total_volume", "Trader Profit": "trader_profit", "Swaps": "swaps",
+    "Commission": "commission", "TP Profit": "tp_profit", "Broker Profit": "broker_profit", "Net": "net",
+}
+
+INSERT_BATCH_SIZE = 10000
+
+REPORT_TABLES = [ReportRun.__table__, ReportClientResult.__table__, ReportCalculation.__table__]
+
+
+def create_results_engine(config, url=None):
+    """
+    Engine for saving report results outside the Flask app (the Streamlit
+    dashboard), configured like the app's own: `url` defaults to
+    SQLALCHEMY_DATABASE_URI, so both write to the same database by default.
+    """
+    url = normalize_database_url(url or config['SQLALCHEMY_DATABASE_URI'])
+    options = engine_options({**config, 'SQLALCHEMY_DATABASE_URI': url})
+    engine = create_engine(url, **options)
+    if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+        os.makedirs(os.path.dirname(os.path.abspath(engine.url.database)), exist_ok=True)
+    configure_sqlite_pragmas(engine, config['SQLITE_BUSY_TIMEOUT_MS'])
+
+    # Databases managed by Flask-Migrate get these tables from the migration;
+    # a standalone results database is set up here.
+    if 'alembic_version' not in inspect(engine).get_table_names():
+        db.metadata.create_all(engine, tables=REPORT_TABLES)
+    return engine
+
+
+def report_run_key(*inputs) -> str:
+    """Digest identifying a report by everything it was computed from."""
+    return hashlib.sha256(repr(inputs).encode()).hexdigest()
+
+
+def _client_rows(run_id, table_name, df):
+    rows = df.loc[df["Login"].astype(str) != "Summary"].reindex(columns=["Login", *RESULT_COLUMNS])
+    rows = rows.rename(columns={"Login": "login", **RESULT_COLUMNS}).astype({"login": str})
+    rows = rows.astype(object).where(rows.notna(), None)
+    rows.insert(0, "table_name", table_name)
+    rows.insert(0, "run_id", run_id)
+    return rows.to_dict("records")
+
+
+def _calculation_rows(run_id, df):
+    values = pd.to_numeric(df["Value"], errors="coerce")
+    text = df["Value"].astype(str).where(values.isna() & (df["Value"].astype(str) != ""), None)
+    return [
+        {"run_id": run_id, "position": i, "source": source, "description": description,
+         "value": None if pd.isna(value) else float(value), "value_text": value_text}
+        for i, (source, description, value, value_text)
+        in enumerate(zip(df["Source"], df["Description"], values, text))
+    ]
+
+
+def save_report_results(engine, run_key, tables: dict, calculations: pd.DataFrame = None,
+                        deals_digest=None, date_range=None) -> bool:
+    """
+    Save the per-login `tables` (name -> DataFrame with a Login column) and
+    the Final Calculations of one report in a single transaction, inserting
+    rows in batches. Summary rows are not stored; they are sums of the rest.
+    Returns False without writing anything if `run_key` was already saved.
+    """
+    with engine.connect() as conn:
+        if conn.execute(select(ReportRun.id).where(ReportRun.run_key == run_key)).first():
+            return False
+
+    try:
+        with engine.begin() as conn:
+            run_id = conn.execute(insert(ReportRun).values(
+                run_key=run_key, deals_digest=deals_digest, date_range=date_range or None
+            )).inserted_primary_key[0]
+
+            rows = []
+            for name, df in tables.items():
+                if df is not None and not df.empty:
+                    rows.extend(_client_rows(run_id, name, df))
+            for start in range(0, len(rows), INSERT_BATCH_SIZE):
+                conn.execute(insert(ReportClientResult), rows[start:start + INSERT_BATCH_SIZE])
+
+            if calculations is not None and not calculations.empty:
+                conn.execute(insert(ReportCalculation), _calculation_rows(run_id, calculations))
+    except IntegrityError:
+        # Saved concurrently by another session
+        return False
+    return True
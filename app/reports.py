@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+from app.processing import run_report_processing
+from app.reference_lists import REFERENCE_LISTS, get_login_set
+from app.storage import get_upload_store
+from app.uploads import read_csv_upload
+
+# Results of recent reports, keyed by everything they were computed from, so
+# that viewing a report and downloading its tables does not rerun processing.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def report_results(uploads, versions):
+    """
+    Return (results, list_versions) for a session's upload set and the
+    reference list versions it pinned. `list_versions` maps each list used to
+    the version that was applied (None if the list has never been imported).
+    """
+    config = current_app.config
+    report_segments = config.get('REPORT_SEGMENTS')
+    # Other managed lists (e.g. welcome bonus) that a configured segment refers to
+    extra = sorted({spec['logins'] for spec in (report_segments or {}).values()
+                    if spec.get('logins') in REFERENCE_LISTS and spec['logins'] not in ('excluded', 'vip')})
+
+    login_sets, list_versions = {}, {}
+    for name in ['excluded', 'vip', *extra]:
+        login_sets[name], list_versions[name] = get_login_set(name, versions.get(name))
+
+    key = (uploads['deals']['digest'], tuple(sorted(list_versions.items())),
+           repr(config.get('CLIENT_SEGMENTS')), repr(report_segments),
+           bool(config.get('MONEY_FIXED_POINT')))
+    with _cache_lock:
+        results = _cache.get(key)
+        if results is not None:
+            _cache.move_to_end(key)
+            return results, list_versions
+
+    deals_df = read_csv_upload(get_upload_store(), uploads['deals'])
+    results = run_report_processing(deals_df, login_sets['excluded'], login_sets['vip'],
+                                    segments=config.get('CLIENT_SEGMENTS'),
+                                    report_segments=report_segments,
+                                    login_lists={name: login_sets[name] for name in extra},
+                                    fixed_point=config.get('MONEY_FIXED_POINT', False))
+
+    with _cache_lock:
+        _cache[key] = results
+        _cache.move_to_end(key)
+        while len(_cache) > config.get('REPORT_CACHE_SIZE', 4):
+            _cache.popitem(last=False)
+    return results, list_versions
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -1,19 +1,54 @@
-import os
+import io
+from datetime import datetime, timedelta
 import pandas as pd
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, session
+from flask import (Blueprint, render_template, redirect, url_for, flash, request, current_app, session,
+                   Response, abort, stream_with_context, send_file)
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.utils import secure_filename
 
 from app import db
-from app.models import User, Role, Log
+from app.models import User, Role, ReferenceList
 from app.forms import LoginForm, RegistrationForm
-from app.processing import run_report_processing
+from app.processing import DEALS_REQUIRED_COLUMNS
 from app.charts import create_charts
-from app.logger import record_log
+from app.logger import record_log, query_log_page
+from app.storage import get_upload_store, cleanup_upload_store
+from app.uploads import receive_uploads, read_csv_upload, UploadValidationError
+from app.reference_lists import REFERENCE_LISTS, import_reference_list, current_version
+from app.reports import report_results
+from app.exports import EXPORT_FORMATS, iter_export, table_slug
+from app.pdf import PDF_MODES, write_pdf_report
+from app.payments import read_export, import_payments, ledger_counts
+from app.rebates import import_rebates, total_rebate, rebates_by_ib, rebate_period
+from app.crm import import_crm_deposits, import_crm_withdrawals, crm_counts
+from app.treasury_report import final_report
+from app.reconciliation import reconcile_deposits, reconcile_withdrawals, resolve_discrepancies, confirmed_in_sheet
 
 
 bp = Blueprint('main', __name__)
 
+LOG_ACTIONS = ['user_login', 'user_logout', 'files_uploaded', 'report_generated', 'reference_list_updated',
+               'report_downloaded', 'payments_imported', 'rebates_imported', 'crm_imported',
+               'discrepancies_resolved']
+
+# Upload form field -> validation options for app.uploads.IncomingFile
+UPLOAD_FIELDS = {
+    'deals_csv': {'required_columns': DEALS_REQUIRED_COLUMNS},
+    'ex_csv': {'has_header': False},
+    'vip_csv': {'has_header': False},
+}
+# Treasury import form choices: kind -> label
+TREASURY_IMPORTS = {'m2p': 'M2P Payments', 'ib_rebate': 'IB Rebates', 'crm_deposit': 'CRM Deposits',
+                    'crm_withdrawal': 'CRM Withdrawals'}
+# Reconciliation pages: kind -> (sheet title, function returning its discrepancies)
+RECONCILIATIONS = {
+    'deposits': ('Deposit Discrepancies', reconcile_deposits),
+    'withdrawals': ('Withdrawal Discrepancies', reconcile_withdrawals),
+}
+# Discrepancy rows shown on the page; downloads include all of them
+DISCREPANCY_PAGE_ROWS = 500
+# Optional upload fields that replace a managed reference list for the uploader's report
+REFERENCE_LIST_FIELDS = {'ex_csv': 'excluded', 'vip_csv': 'vip'}
+
 # ... (other routes remain the same) ...
 
 @bp.route('/')
@@ -72,29 +107,55 @@ def logout():
 @login_required
 def upload_file():
     if request.method == 'POST':
-        if 'deals_csv' not in request.files or 'ex_csv' not in request.files or 'vip_csv' not in request.files:
-            flash('All three files are required', 'warning')
+        boundary = request.mimetype_params.get('boundary')
+        if request.mimetype != 'multipart/form-data' or not boundary:
+            flash('Please select a deals file to upload', 'warning')
             return redirect(request.url)
 
-        # ... (rest of upload logic is the same)
-        deals_file = request.files['deals_csv']
-        ex_file = request.files['ex_csv']
-        vip_file = request.files['vip_csv']
+        # The request body is streamed straight into the content-addressed
+        # upload store; each file is hashed and validated as it arrives, so a
+        # deals file with the wrong columns is rejected before it is written.
+        store = get_upload_store()
+        try:
+            received = receive_uploads(request.stream, boundary, store, UPLOAD_FIELDS,
+                                       max_bytes=current_app.config['UPLOAD_MAX_DECOMPRESSED_BYTES'])
+        except UploadValidationError as e:
+            flash(f'Upload rejected: {e}', 'danger')
+            return redirect(request.url)
+        except ValueError:
+            flash('The upload could not be read. Please try again.', 'danger')
+            return redirect(request.url)
 
-        if deals_file.filename == '' or ex_file.filename == '' or vip_file.filename == '':
-            flash('One or more files were not selected', 'warning')
+        if 'deals_csv' not in received:
+            flash('Please select a deals file to upload', 'warning')
             return redirect(request.url)
 
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder)
+        # Excluded/VIP files are optional: when given they are stored as a
+        # version pinned to this session's report only, otherwise the current
+        # version is used. Only the Lists page changes the current version.
+        reference_versions = {}
+        for field, name in REFERENCE_LIST_FIELDS.items():
+            if field in received:
+                incoming = received[field]
+                try:
+                    df = read_csv_upload(store, {'digest': incoming.digest, 'compression': incoming.compression}, header=None)
+                    logins = df.iloc[:, 0]
+                except pd.errors.EmptyDataError:
+                    logins = []
+                version = import_reference_list(name, logins, current_user.id, source_digest=incoming.digest,
+                                                make_current=False)
+                reference_versions[name] = version.version
+            else:
+                reference_versions[name] = current_version(name)
 
-        deals_file.save(os.path.join(upload_folder, secure_filename('deals.csv')))
-        ex_file.save(os.path.join(upload_folder, secure_filename('excluded.csv')))
-        vip_file.save(os.path.join(upload_folder, secure_filename('vip.csv')))
+        deals = received['deals_csv']
+        uploads = {'deals': {'digest': deals.digest, 'compression': deals.compression, 'rows': deals.rows}}
+        cleanup_upload_store(store, keep={deals.digest})
 
-        record_log('files_uploaded')
+        record_log('files_uploaded', f"{deals.rows} deal rows")
         flash('Files successfully uploaded. You can now generate the report.', 'success')
+        session['uploads'] = uploads
+        session['reference_versions'] = reference_versions
         session['files_uploaded'] = True
         return redirect(url_for('main.dashboard'))
 
@@ -103,21 +164,19 @@ def upload_file():
 @bp.route('/report/generate')
 @login_required
 def generate_report():
-    if not session.get('files_uploaded'):
+    uploads = session.get('uploads')
+    if not session.get('files_uploaded') or not uploads:
         flash('Please upload the report files first.', 'warning')
         return redirect(url_for('main.upload_file'))
 
-    upload_folder = current_app.config['UPLOAD_FOLDER']
-    deals_path = os.path.join(upload_folder, 'deals.csv')
-    excluded_path = os.path.join(upload_folder, 'excluded.csv')
-    vip_path = os.path.join(upload_folder, 'vip.csv')
-
     try:
-        deals_df = pd.read_csv(deals_path)
-        excluded_df = pd.read_csv(excluded_path, header=None)
-        vip_df = pd.read_csv(vip_path, header=None)
+        results, list_versions = report_results(uploads, session.get('reference_versions', {}))
 
-        results = run_report_processing(deals_df, excluded_df, vip_df)
+        coerced = sum(results['Coerced Values'].values())
+        if coerced:
+            columns = ', '.join(sorted(results['Coerced Values']))
+            flash(f'{coerced} values in {columns} were not plain numbers and were cleaned '
+                  f'(blanks count as 0).', 'warning')
 
         # Convert all result tables to HTML
         report_tables = {
@@ -128,7 +187,7 @@ def generate_report():
         # Generate charts
         report_charts = create_charts(results)
 
-        record_log('report_generated')
+        record_log('report_generated', f"excluded v{list_versions['excluded'] or 0}, vip v{list_versions['vip'] or 0}")
 
         # Render the results template directly
         return render_template('results.html', title='Report Results', tables=report_tables, charts=report_charts)
@@ -140,6 +199,67 @@ def generate_report():
         flash(f'An error occurred during report generation: {e}', 'danger')
         return redirect(url_for('main.dashboard'))
 
+@bp.route('/report/download/<table>.<fmt>')
+@login_required
+def download_table(table, fmt):
+    uploads = session.get('uploads')
+    if not session.get('files_uploaded') or not uploads:
+        flash('Please upload the report files first.', 'warning')
+        return redirect(url_for('main.upload_file'))
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+
+    try:
+        results, _ = report_results(uploads, session.get('reference_versions', {}))
+    except FileNotFoundError:
+        flash('Could not find uploaded files. Please upload again.', 'danger')
+        return redirect(url_for('main.upload_file'))
+
+    tables = {table_slug(name): (name, df) for name, df in results.items() if isinstance(df, pd.DataFrame)}
+    if table not in tables:
+        abort(404)
+    name, df = tables[table]
+    try:
+        body = iter_export(df, fmt, sheet_name=name)
+    except RuntimeError as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('main.dashboard'))
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    record_log('report_downloaded', f"{name} ({fmt})")
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{table}.{extension}"',
+    })
+
+@bp.route('/report/pdf')
+@login_required
+def download_pdf():
+    uploads = session.get('uploads')
+    if not session.get('files_uploaded') or not uploads:
+        flash('Please upload the report files first.', 'warning')
+        return redirect(url_for('main.upload_file'))
+    mode = request.args.get('mode', 'summary')
+    if mode not in PDF_MODES:
+        abort(404)
+
+    try:
+        results, _ = report_results(uploads, session.get('reference_versions', {}))
+    except FileNotFoundError:
+        flash('Could not find uploaded files. Please upload again.', 'danger')
+        return redirect(url_for('main.upload_file'))
+
+    # Final Calculations first, then the per-login tables; raw deals are left out
+    names = ['Final Calculations'] + [name for name, df in results.items()
+                                      if isinstance(df, pd.DataFrame) and name != 'Final Calculations'
+                                      and not name.endswith(' Raw')]
+    buffer = io.BytesIO()
+    write_pdf_report({name: results[name] for name in names}, buffer, mode=mode)
+    buffer.seek(0)
+
+    record_log('report_downloaded', f"PDF ({mode})")
+    return send_file(buffer, mimetype='application/pdf', as_attachment=True,
+                     download_name=f"deals_report_{mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
+
 @bp.route('/admin')
 @login_required
 def admin():
@@ -147,5 +267,152 @@ def admin():
         flash('You do not have permission to access the admin panel.', 'danger')
         return redirect(url_for('main.dashboard'))
 
-    logs = Log.query.order_by(Log.timestamp.desc()).all()
-    return render_template('admin.html', title='Admin Panel', logs=logs)
+    filters = {
+        'user': request.args.get('user', '').strip(),
+        'action': request.args.get('action', '').strip(),
+        'start': request.args.get('start', '').strip(),
+        'end': request.args.get('end', '').strip(),
+    }
+    try:
+        start = datetime.strptime(filters['start'], '%Y-%m-%d') if filters['start'] else None
+        # The end date is inclusive, so filter on the start of the following day.
+        end = datetime.strptime(filters['end'], '%Y-%m-%d') + timedelta(days=1) if filters['end'] else None
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format.', 'warning')
+        start = end = None
+
+    logs, next_cursor, prev_cursor = query_log_page(
+        username=filters['user'] or None,
+        action=filters['action'] or None,
+        start=start,
+        end=end,
+        before=request.args.get('before'),
+        after=request.args.get('after'),
+        per_page=current_app.config['LOG_PAGE_SIZE'],
+    )
+    active_filters = {k: v for k, v in filters.items() if v}
+    return render_template('admin.html', title='Admin Panel', logs=logs, filters=filters,
+                           actions=LOG_ACTIONS, active_filters=active_filters,
+                           next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+@bp.route('/reference-lists', methods=['GET', 'POST'])
+@login_required
+def reference_lists():
+    if not (current_user.has_role('Owner') or current_user.has_role('Admin')):
+        flash('You do not have permission to manage reference lists.', 'danger')
+        return redirect(url_for('main.dashboard'))
+
+    if request.method == 'POST':
+        name = request.form.get('name')
+        file = request.files.get('list_csv')
+        if name not in REFERENCE_LISTS or file is None or file.filename == '':
+            flash('Choose a list and a CSV file of logins.', 'warning')
+            return redirect(request.url)
+        try:
+            df = pd.read_csv(file.stream, header=None)
+            logins = df.iloc[:, 0]
+        except pd.errors.EmptyDataError:
+            logins = []
+        version = import_reference_list(name, logins, current_user.id)
+        record_log('reference_list_updated', f"{name} v{version.version}")
+        flash(f"{REFERENCE_LISTS[name]} updated to version {version.version} "
+              f"({version.entry_count} logins).", 'success')
+        return redirect(url_for('main.reference_lists'))
+
+    lists = {ref.name: ref for ref in ReferenceList.query.all()}
+    return render_template('reference_lists.html', title='Reference Lists',
+                           labels=REFERENCE_LISTS, lists=lists)
+
+@bp.route('/treasury', methods=['GET', 'POST'])
+@login_required
+def treasury():
+    if not (current_user.has_role('Owner') or current_user.has_role('Admin')):
+        flash('You do not have permission to manage treasury data.', 'danger')
+        return redirect(url_for('main.dashboard'))
+
+    if request.method == 'POST':
+        kind = request.form.get('kind')
+        file = request.files.get('export_csv')
+        if kind not in TREASURY_IMPORTS or file is None or file.filename == '':
+            flash('Choose an import type and a CSV file.', 'warning')
+            return redirect(request.url)
+        try:
+            if kind == 'ib_rebate':
+                added, action = {'IB Rebate': import_rebates(read_export(file.stream))}, 'rebates_imported'
+            elif kind == 'crm_deposit':
+                added, action = {'CRM Deposit': import_crm_deposits(read_export(file.stream))}, 'crm_imported'
+            elif kind == 'crm_withdrawal':
+                added, action = {'CRM Withdrawal': import_crm_withdrawals(read_export(file.stream))}, 'crm_imported'
+            else:
+                added, action = import_payments(read_export(file.stream)), 'payments_imported'
+        except (ValueError, pd.errors.EmptyDataError) as e:
+            flash(f'Could not import {file.filename}: {e}', 'danger')
+            return redirect(request.url)
+        summary = ', '.join(f"{ledger} {count}" for ledger, count in added.items())
+        record_log(action, summary)
+        flash(f'{TREASURY_IMPORTS[kind]} imported. Rows added: {summary}.', 'success')
+        return redirect(url_for('main.treasury'))
+
+    start, end = _date_arg('start'), _date_arg('end')
+    report, period = final_report(start and start.date(), end and end.date())
+    return render_template('treasury.html', title='Treasury', imports=TREASURY_IMPORTS,
+                           report=report, period=period,
+                           start=request.args.get('start', ''), end=request.args.get('end', ''),
+                           ledgers={**ledger_counts(), **crm_counts()}, total_rebate=total_rebate(),
+                           rebate_period=rebate_period(), top_ibs=rebates_by_ib(limit=20),
+                           reconciliations=RECONCILIATIONS)
+
+
+def _date_arg(name):
+    try:
+        return datetime.strptime(request.args.get(name, ''), '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+@bp.route('/treasury/discrepancies/<kind>', methods=['GET', 'POST'])
+@login_required
+def discrepancies(kind):
+    if not (current_user.has_role('Owner') or current_user.has_role('Admin')):
+        flash('You do not have permission to manage treasury data.', 'danger')
+        return redirect(url_for('main.dashboard'))
+    if kind not in RECONCILIATIONS:
+        abort(404)
+
+    title, reconcile = RECONCILIATIONS[kind]
+    if request.method == 'POST':
+        # Rows ticked on the page, and/or a downloaded sheet with Y in the Confirmed column
+        records = [tuple(value.split(':', 1)) for value in request.form.getlist('confirm') if ':' in value]
+        sheet = request.files.get('sheet_csv')
+        try:
+            if sheet is not None and sheet.filename:
+                records.extend(confirmed_in_sheet(read_export(sheet.stream)))
+            resolved = resolve_discrepancies(records, current_user.id)
+        except (ValueError, pd.errors.EmptyDataError) as e:
+            flash(f'Could not confirm discrepancies: {e}', 'danger')
+            return redirect(request.url)
+        record_log('discrepancies_resolved', f"{title}: {resolved}")
+        flash(f'{resolved} discrepanc{"y" if resolved == 1 else "ies"} confirmed.', 'success')
+        return redirect(request.url)
+
+    start, end = _date_arg('start'), _date_arg('end')
+    df = reconcile(start, end + timedelta(days=1) if end else None)
+
+    fmt = request.args.get('format')
+    if fmt:
+        if fmt not in EXPORT_FORMATS:
+            abort(404)
+        try:
+            body = iter_export(df, fmt, sheet_name=title)
+        except RuntimeError as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('main.discrepancies', kind=kind))
+        mimetype, extension = EXPORT_FORMATS[fmt]
+        record_log('report_downloaded', f"{title} ({fmt})")
+        return Response(stream_with_context(body), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename="{table_slug(title)}.{extension}"',
+        })
+
+    return render_template('discrepancies.html', title=title, kind=kind, rows=df.head(DISCREPANCY_PAGE_ROWS),
+                           total=len(df), start=request.args.get('start', ''), end=request.args.get('end', ''),
+                           formats=EXPORT_FORMATS)
@@ -0,0 +1,127 @@
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Segment name -> rules matched against the deal's Group (e.g. "real\Chines-2").
+# A Group belongs to a segment if it starts with any of the prefixes or
+# matches (re.search) any of the patterns. Groups may belong to several
+# segments, so per-desk and per-region segments can overlap.
+DEFAULT_SEGMENTS = {
+    "Chinese": {"prefixes": ["real\\Chines", "BBOOK\\Chines"]},
+}
+
+# Segments reported on by run_report_processing. Each one gets a lot volume in
+# the final calculations (subtracted from the retail lots) and, with
+# "table": True, a per-login breakdown. A deal belongs to a segment when it
+# satisfies every rule given:
+#   groups - a client segment from DEFAULT_SEGMENTS / CLIENT_SEGMENTS
+#   logins - the name of a login list passed in by the caller (e.g. "vip")
+#   books  - only deals from these books
+# Deals from excluded accounts never count towards a segment.
+REPORT_SEGMENTS = {
+    "Chinese Clients": {"groups": "Chinese", "table": True},
+    "VIP Clients": {"logins": "vip"},
+}
+
+# Distinct Group values remembered per classifier before the cache is reset
+MAX_CACHED_GROUPS = 100000
+
+
+class _PrefixTrie:
+    """Character trie mapping group prefixes to the segments that own them."""
+
+    def __init__(self):
+        self._root = {}
+
+    def add(self, prefix, segment):
+        node = self._root
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node.setdefault(None, set()).add(segment)
+
+    def segments_for(self, text):
+        """Return every segment with a prefix of `text`, in one walk down the trie."""
+        found = set(self._root.get(None, ()))
+        node = self._root
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                break
+            found.update(node.get(None, ()))
+        return found
+
+
+class GroupClassifier:
+    """
+    Assigns deal Groups to client segments.
+
+    Rules are evaluated once per distinct Group value and the answer is
+    cached, so classifying a column costs O(distinct groups) plus one
+    vectorized lookup instead of a string test on every row.
+    """
+
+    def __init__(self, segments=None):
+        segments = DEFAULT_SEGMENTS if segments is None else segments
+        self.names = list(segments)
+        self._trie = _PrefixTrie()
+        self._patterns = []
+        for name, rules in segments.items():
+            for prefix in rules.get("prefixes", ()):
+                self._trie.add(prefix, name)
+            for pattern in rules.get("patterns", ()):
+                self._patterns.append((re.compile(pattern), name))
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def segments_of(self, group) -> frozenset:
+        """Return the segments a single Group value belongs to."""
+        key = str(group).strip()
+        found = self._cache.get(key)
+        if found is None:
+            matched = self._trie.segments_for(key)
+            matched.update(name for regex, name in self._patterns if regex.search(key))
+            found = frozenset(matched)
+            with self._lock:
+                if len(self._cache) >= MAX_CACHED_GROUPS:
+                    self._cache.clear()
+                self._cache[key] = found
+        return found
+
+    def classify(self, groups: pd.Series, names=None) -> dict[str, np.ndarray]:
+        """Return segment name -> boolean mask aligned with `groups`."""
+        names = self.names if names is None else names
+        codes, uniques = pd.factorize(groups.astype(str), use_na_sentinel=False)
+        memberships = [self.segments_of(g) for g in uniques]
+        masks = {}
+        for name in names:
+            hits = np.fromiter((name in m for m in memberships), dtype=bool, count=len(memberships))
+            masks[name] = hits[codes]
+        return masks
+
+    def mask(self, groups: pd.Series, segment: str) -> np.ndarray:
+        """Boolean mask of rows whose Group belongs to `segment`."""
+        return self.classify(groups, [segment])[segment]
+
+
+_classifiers = {}
+_classifiers_lock = threading.Lock()
+
+
+def _rules_key(segments):
+    return tuple(
+        (name, tuple(rules.get("prefixes", ())), tuple(rules.get("patterns", ())))
+        for name, rules in segments.items()
+    )
+
+
+def get_classifier(segments=None) -> GroupClassifier:
+    """Return a shared classifier for `segments`, so its Group cache survives between reports."""
+    segments = DEFAULT_SEGMENTS if segments is None else segments
+    key = _rules_key(segments)
+    with _classifiers_lock:
+        classifier = _classifiers.get(key)
+        if classifier is None:
+            classifier = _classifiers[key] = GroupClassifier(segments)
+        return classifier
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import click
+from flask import current_app
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadStore:
+    """
+    Content-addressed storage for uploaded report files.
+
+    Each file is stored once under `blobs/<aa>/<sha256>`, so identical uploads
+    from different users share one copy and stored files are never modified.
+    Sessions only keep the digests of their current upload set, which makes
+    concurrent report generation safe: nobody can overwrite a file another
+    analyst is reading.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.tmp_dir = os.path.join(root, 'tmp')
+
+    def path_for(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def save(self, stream):
+        """Copy `stream` into the store in chunks and return its SHA-256 digest."""
+        sha = hashlib.sha256()
+        out, tmp_path = self.new_temp_file()
+        try:
+            with out:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    sha.update(chunk)
+                    out.write(chunk)
+            return self.commit(tmp_path, sha.hexdigest())
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def new_temp_file(self):
+        """Open a temp file inside the store; returns (file object, path)."""
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        return os.fdopen(fd, 'wb'), tmp_path
+
+    def commit(self, tmp_path, digest):
+        """Move a fully written temp file into place under its digest."""
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            # Already stored: drop the duplicate and mark the blob as recently used.
+            os.remove(tmp_path)
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return digest
+
+    def open(self, digest):
+        """Resolve a digest to its file path, refreshing its LRU position."""
+        path = self.path_for(digest)
+        os.utime(path)  # raises FileNotFoundError if the blob was evicted
+        return path
+
+    def _blobs(self):
+        for dirpath, _, filenames in os.walk(self.blob_dir):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, name, stat.st_mtime, stat.st_size
+
+    def cleanup(self, max_bytes, keep=(), grace_seconds=0):
+        """
+        Evict least recently used blobs until the store fits in `max_bytes`.
+        Digests in `keep`, and blobs used within the last `grace_seconds` (which
+        other sessions may still be reading), are never evicted. Returns the
+        number of blobs removed.
+        """
+        blobs = sorted(self._blobs(), key=lambda b: b[2])
+        total = sum(b[3] for b in blobs)
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        for path, digest, used, size in blobs:
+            if total <= max_bytes or used > cutoff:
+                break
+            if digest in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def get_upload_store():
+    return UploadStore(current_app.config['UPLOAD_FOLDER'])
+
+
+def cleanup_upload_store(store, max_bytes=None, keep=()):
+    """Evict stored uploads past the configured size cap, sparing those still in their grace period."""
+    config = current_app.config
+    max_bytes = max_bytes if max_bytes is not None else config['UPLOAD_STORE_MAX_BYTES']
+    return store.cleanup(max_bytes, keep=keep, grace_seconds=config['UPLOAD_STORE_GRACE_SECONDS'])
+
+
+@click.command('cleanup-uploads')
+@click.option('--max-bytes', default=None, type=int, help='Target size of the upload store.')
+def cleanup_uploads_command(max_bytes):
+    """Evict least recently used uploads until the store is under its size cap."""
+    removed = cleanup_upload_store(get_upload_store(), max_bytes)
+    click.echo(f"Removed {removed} stored uploads.")
@@ -0,0 +1,113 @@
+from datetime import datetime, time, timedelta
+
+import click
+from sqlalchemy import func, select
+
+from app import db
+from app.ledger_totals import CRM_DEPOSIT_LEDGER, CRM_TOPCHANGE_LEDGER, CRM_WITHDRAWAL_LEDGER
+from app.models import (CRMWithdrawal, IBRebate, ReferenceList, ReferenceListEntry, ReferenceListVersion,
+                        TreasuryDaily)
+from app.payments import PAYMENT_LEDGERS
+from app.rebates import total_rebate
+
+# Daily ledger (TreasuryDaily.ledger) -> Final Report line of its summed amount
+LEDGER_LINES = {
+    'M2p Deposit': 'M2p Deposit',
+    'Settlement Deposit': 'Settlement Deposit',
+    'M2p Withdraw': 'M2p Withdrawal',
+    'Settlement Withdraw': 'Settlement Withdrawal',
+    CRM_DEPOSIT_LEDGER: 'CRM Deposit Total',
+    CRM_TOPCHANGE_LEDGER: 'CRM TopChange Total',
+    CRM_WITHDRAWAL_LEDGER: 'CRM Withdraw Total',
+}
+
+# Lines of the Final Report, in order
+FINAL_REPORT_LINES = ['Total Rebate', 'M2p Deposit', 'Settlement Deposit', 'M2p Withdrawal', 'Settlement Withdrawal',
+                      'CRM Deposit Total', 'Tier Fee Deposit', 'Tier Fee Withdraw', 'Welcome Bonus Withdrawals',
+                      'CRM TopChange Total', 'CRM Withdraw Total']
+
+# Payment ledger -> Final Report line of its summed tier fees
+TIER_FEE_LINES = {ledger: 'Tier Fee Deposit' if type_ == 'DEPOSIT' else 'Tier Fee Withdraw'
+                  for (type_, _), ledger in PAYMENT_LEDGERS.items()}
+
+WELCOME_BONUS_LIST = 'welcome_bonus'
+
+
+def _day_range(column, start=None, end=None):
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column <= end)
+    return conditions
+
+
+def _time_range(column, start=None, end=None):
+    """Conditions keeping the times in `column` on the days from `start` to `end` (inclusive)."""
+    conditions = []
+    if start is not None:
+        conditions.append(column >= datetime.combine(start, time.min))
+    if end is not None:
+        conditions.append(column < datetime.combine(end + timedelta(days=1), time.min))
+    return conditions
+
+
+def _welcome_bonus_logins():
+    return (select(ReferenceListEntry.login)
+            .join(ReferenceListVersion, ReferenceListEntry.version_id == ReferenceListVersion.id)
+            .join(ReferenceList, ReferenceListVersion.list_id == ReferenceList.id)
+            .where(ReferenceList.name == WELCOME_BONUS_LIST,
+                   ReferenceListVersion.version == ReferenceList.current_version))
+
+
+def final_report(start=None, end=None) -> tuple[dict, tuple]:
+    """
+    The treasury Final Report for the days from `start` to `end` (dates,
+    inclusive; None is unbounded): (line -> total in FINAL_REPORT_LINES
+    order, (first, last) time of any record in the range).
+
+    Payment and CRM totals, and their first/last times, are read from the
+    daily ledger totals kept on import, and rebates from their daily totals,
+    so the work grows with the number of days rather than of records. Only
+    Welcome Bonus Withdrawals, which depend on the current welcome bonus
+    list, are summed from the withdrawals of the listed logins.
+    """
+    lines = dict.fromkeys(FINAL_REPORT_LINES, 0.0)
+    times = []
+
+    query = (select(TreasuryDaily.ledger, func.sum(TreasuryDaily.amount), func.sum(TreasuryDaily.tier_fee),
+                    func.min(TreasuryDaily.first_time), func.max(TreasuryDaily.last_time))
+             .where(*_day_range(TreasuryDaily.day, start, end))
+             .group_by(TreasuryDaily.ledger))
+    for ledger, amount, tier_fee, first, last in db.session.execute(query):
+        lines[LEDGER_LINES[ledger]] += float(amount)
+        if ledger in TIER_FEE_LINES:
+            lines[TIER_FEE_LINES[ledger]] += float(tier_fee)
+        times.extend([first, last])
+    # TopChange deposits are part of the CRM deposit total
+    lines['CRM Deposit Total'] += lines['CRM TopChange Total']
+
+    lines['Total Rebate'] = total_rebate(start, end)
+    in_range = _time_range(IBRebate.rebate_time, start, end)
+    times.append(db.session.scalar(select(func.min(IBRebate.rebate_time)).where(*in_range)))
+    times.append(db.session.scalar(select(func.max(IBRebate.rebate_time)).where(*in_range)))
+
+    lines['Welcome Bonus Withdrawals'] = float(db.session.scalar(
+        select(func.coalesce(func.sum(CRMWithdrawal.amount), 0.0))
+        .where(CRMWithdrawal.login.in_(_welcome_bonus_logins()),
+               *_time_range(CRMWithdrawal.review_time, start, end))))
+
+    times = [t for t in times if t is not None]
+    return lines, (min(times), max(times)) if times else (None, None)
+
+
+@click.command('treasury-report')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='First day (inclusive).')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='Last day (inclusive).')
+def treasury_report_command(start, end):
+    """Print the treasury Final Report."""
+    lines, (first, last) = final_report(start and start.date(), end and end.date())
+    if first is not None:
+        click.echo(f"From {first:%Y-%m-%d %H:%M:%S} to {last:%Y-%m-%d %H:%M:%S}")
+    for line, value in lines.items():
+        click.echo(f"{line}: {value:,.2f}")
@@ -0,0 +1,317 @@
+import csv
+import gzip
+import hashlib
+import os
+import struct
+import zipfile
+import zlib
+
+import pandas as pd
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NeedData
+
+from app.storage import CHUNK_SIZE
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for .csv.zst uploads
+    zstandard = None
+
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class UploadValidationError(ValueError):
+    """Raised when an uploaded file is rejected while it is being received."""
+
+
+class UploadTooLargeError(UploadValidationError):
+    """Raised when an upload decompresses to more than its size limit."""
+
+
+# ─── Decompression ───────────────────────────────────────────────────────────
+#
+# Decoders pass what they decompress to `sink` at most CHUNK_SIZE bytes at a
+# time, so a small, highly compressed upload never expands in memory at once.
+
+class _GzipDecoder:
+    """Decompresses every member of a gzip stream, as gzip.open reads them back."""
+
+    def __init__(self, sink):
+        self._sink = sink
+        self._z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def feed(self, data):
+        while data:
+            if self._z.eof:
+                data = self._z.unused_data + data
+                self._z = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self._sink(self._z.decompress(data, CHUNK_SIZE))
+            data = self._z.unconsumed_tail
+
+    def close(self):
+        self._sink(self._z.flush())
+
+
+class _ZipDecoder:
+    """Decompresses the first member of a zip archive as the bytes arrive."""
+
+    _LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+
+    def __init__(self, sink):
+        self._sink = sink
+        self._buffer = b''
+        self._z = None
+        self._stored_remaining = None
+        self._done = False
+
+    def feed(self, data):
+        if self._done:
+            return
+        if self._z is None and self._stored_remaining is None:
+            self._buffer += data
+            if len(self._buffer) < self._LOCAL_HEADER.size:
+                return
+            (_, _, flags, method, _, _, _, csize, _, name_len,
+             extra_len) = self._LOCAL_HEADER.unpack_from(self._buffer)
+            start = self._LOCAL_HEADER.size + name_len + extra_len
+            if len(self._buffer) < start:
+                return
+            if method == 8:
+                self._z = zlib.decompressobj(-zlib.MAX_WBITS)
+            elif method == 0 and not flags & 0x08:
+                self._stored_remaining = csize
+            else:
+                raise UploadValidationError('Unsupported zip compression method.')
+            data, self._buffer = self._buffer[start:], b''
+
+        if self._z is not None:
+            while data and not self._z.eof:
+                self._sink(self._z.decompress(data, CHUNK_SIZE))
+                data = self._z.unconsumed_tail
+            self._done = self._z.eof
+            return
+        out = data[:self._stored_remaining]
+        self._stored_remaining -= len(out)
+        self._done = self._stored_remaining == 0
+        self._sink(out)
+
+    def close(self):
+        if self._z is not None:
+            self._sink(self._z.flush())
+
+
+class _ZstdDecoder:
+    def __init__(self, sink):
+        if zstandard is None:
+            raise UploadValidationError('Zstandard-compressed files need the zstandard package installed.')
+        self._writer = zstandard.ZstdDecompressor().stream_writer(_SinkWriter(sink), write_size=CHUNK_SIZE)
+
+    def feed(self, data):
+        self._writer.write(data)
+
+    def close(self):
+        self._writer.flush()
+
+
+class _SinkWriter:
+    """File-like adapter for zstandard's stream_writer."""
+
+    def __init__(self, sink):
+        self._sink = sink
+
+    def write(self, data):
+        self._sink(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class _PlainDecoder:
+    def __init__(self, sink):
+        self._sink = sink
+
+    def feed(self, data):
+        self._sink(data)
+
+    def close(self):
+        pass
+
+
+# Magic bytes -> (compression name understood by pandas, decoder factory)
+CODECS = [
+    (b'\x1f\x8b', 'gzip', _GzipDecoder),
+    (b'PK\x03\x04', 'zip', _ZipDecoder),
+    (b'\x28\xb5\x2f\xfd', 'zstd', _ZstdDecoder),
+]
+
+
+def detect_compression(head, sink):
+    for magic, name, factory in CODECS:
+        if head.startswith(magic):
+            return name, factory(sink)
+    return None, _PlainDecoder(sink)
+
+
+def open_upload(path, compression):
+    """Open a stored upload as a binary stream that decompresses as it is read."""
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zip':
+        with zipfile.ZipFile(path) as zf:
+            return zf.open(zf.infolist()[0])
+    if compression == 'zstd':
+        if zstandard is None:
+            raise UploadValidationError('Zstandard-compressed files need the zstandard package installed.')
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True)
+    return open(path, 'rb')
+
+
+def read_csv_upload(store, upload, **kwargs):
+    """Read a stored upload (as recorded in the session) into a DataFrame."""
+    with open_upload(store.open(upload['digest']), upload['compression']) as fh:
+        return pd.read_csv(fh, **kwargs)
+
+
+# ─── Incoming file ───────────────────────────────────────────────────────────
+
+class IncomingFile:
+    """
+    Receives one uploaded file chunk by chunk.
+
+    Raw bytes go straight into a temp file in the upload store while a SHA-256
+    digest is computed. A decompressed view of the same bytes is used to read
+    the header (checked against `required_columns` as soon as the first line is
+    complete) and to count rows, so nothing is ever held in memory in full.
+    The upload is rejected as soon as its decompressed contents pass
+    `max_bytes`, so a small compressed file cannot expand without bound.
+    """
+
+    def __init__(self, store, filename, required_columns=None, has_header=True, max_bytes=None):
+        self.store = store
+        self.filename = filename
+        self.required_columns = required_columns
+        self.has_header = has_header
+        self.max_bytes = max_bytes
+        self.compression = None
+        self.digest = None
+        self.size = 0
+        self.decompressed_size = 0
+        self._sha = hashlib.sha256()
+        self._out, self._tmp_path = store.new_temp_file()
+        self._decoder = None
+        self._pending = b''
+        self._header = None if has_header else []
+        self._head = b''
+        self._newlines = 0
+        self._last_byte = b''
+
+    @property
+    def rows(self):
+        lines = self._newlines + (1 if self._last_byte not in (b'', b'\n') else 0)
+        return max(lines - (1 if self.has_header else 0), 0)
+
+    def write(self, data):
+        self._sha.update(data)
+        self._out.write(data)
+        self.size += len(data)
+
+        if self._decoder is None:
+            self._pending += data
+            if len(self._pending) < 4:
+                return
+            self.compression, self._decoder = detect_compression(self._pending, self._inspect)
+            data, self._pending = self._pending, b''
+        self._decoder.feed(data)
+
+    def _inspect(self, text):
+        if not text:
+            return
+        self.decompressed_size += len(text)
+        if self.max_bytes is not None and self.decompressed_size > self.max_bytes:
+            raise UploadTooLargeError(
+                f'{self.filename}: larger than {self.max_bytes / 1024 ** 2:,.0f} MB once decompressed.')
+        self._newlines += text.count(b'\n')
+        self._last_byte = text[-1:]
+        if self._header is None:
+            self._head += text
+            if b'\n' in self._head:
+                self._check_header(self._head.split(b'\n', 1)[0])
+            elif len(self._head) > MAX_HEADER_BYTES:
+                raise UploadValidationError(f'{self.filename}: header line is too long.')
+
+    def _check_header(self, line):
+        try:
+            decoded = line.decode('utf-8-sig').rstrip('\r')
+        except UnicodeDecodeError:
+            raise UploadValidationError(f'{self.filename}: not a UTF-8 CSV file.')
+        self._header = next(csv.reader([decoded]), [])
+        self._head = b''
+        if self.required_columns:
+            missing = [c for c in self.required_columns if c not in self._header]
+            if missing:
+                raise UploadValidationError(
+                    f"{self.filename}: missing required column(s) {', '.join(missing)}.")
+
+    def finish(self):
+        """Validate what is left and move the file into the store."""
+        if self._decoder is None:
+            self.compression, self._decoder = detect_compression(self._pending, self._inspect)
+            pending, self._pending = self._pending, b''
+            self._decoder.feed(pending)
+        self._decoder.close()
+        self._out.close()
+
+        if self._header is None:
+            self._check_header(self._head)
+        if self.size == 0 and self.has_header:
+            raise UploadValidationError(f'{self.filename}: file is empty.')
+        self.digest = self.store.commit(self._tmp_path, self._sha.hexdigest())
+        return self
+
+    def discard(self):
+        self._out.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+# ─── Request parsing ─────────────────────────────────────────────────────────
+
+def receive_uploads(stream, boundary, store, fields, max_bytes=None):
+    """
+    Stream a multipart request body into `store`.
+
+    `fields` maps form field names to keyword arguments for `IncomingFile`
+    (e.g. `required_columns`); `max_bytes` caps each file's decompressed size. Returns a dict of field name -> finished
+    `IncomingFile`; fields whose file input was left empty are omitted.
+    Raises `UploadValidationError` as soon as a file fails validation, without
+    reading the rest of the request.
+    """
+    decoder = MultipartDecoder(boundary.encode())
+    received, current = {}, None
+
+    try:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, File) and event.name in fields and event.filename:
+                    current = IncomingFile(store, event.filename, max_bytes=max_bytes, **fields[event.name])
+                    received[event.name] = current
+                elif isinstance(event, (Field, File)):
+                    current = None
+                elif isinstance(event, Data) and current is not None:
+                    current.write(event.data)
+                    if not event.more_data:
+                        current.finish()
+                        current = None
+                event = decoder.next_event()
+            if not chunk or isinstance(event, Epilogue):
+                break
+    except Exception:
+        for incoming in received.values():
+            if incoming.digest is None:
+                incoming.discard()
+        raise
+
+    return received
@@ -7,4 +7,62 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'instance', 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Engine tuning, applied by app.database. The pool settings are per worker
+    # process, so total connections = workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
     UPLOAD_FOLDER = os.path.join(basedir, 'instance', 'uploads')
+    # Uploads are content-addressed and shared between users; least recently
+    # used files are evicted once the store grows past this size.
+    UPLOAD_STORE_MAX_BYTES = int(os.environ.get('UPLOAD_STORE_MAX_BYTES', 2 * 1024 ** 3))
+    # Files read or uploaded within this many seconds may still back another
+    # analyst's session and are kept even when the store is over its size.
+    UPLOAD_STORE_GRACE_SECONDS = int(os.environ.get('UPLOAD_STORE_GRACE_SECONDS', 12 * 3600))
+    # Largest size an uploaded file may decompress to; bigger uploads are
+    # rejected while they are being received.
+    UPLOAD_MAX_DECOMPRESSED_BYTES = int(os.environ.get('UPLOAD_MAX_DECOMPRESSED_BYTES', 1024 ** 3))
+
+    # Audit logs are buffered in memory and written in batches by a
+    # background thread; set AUDIT_LOG_ASYNC=0 to write them inline.
+    AUDIT_LOG_ASYNC = os.environ.get('AUDIT_LOG_ASYNC', '1') != '0'
+    AUDIT_LOG_BATCH_SIZE = int(os.environ.get('AUDIT_LOG_BATCH_SIZE', 100))
+    AUDIT_LOG_FLUSH_INTERVAL = float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL', 2.0))
+    AUDIT_LOG_FALLBACK_PATH = os.path.join(basedir, 'instance', 'audit_fallback.log')
+
+    LOG_PAGE_SIZE = 50
+    LOG_RETENTION_DAYS = int(os.environ.get('LOG_RETENTION_DAYS', 90))
+    LOG_ARCHIVE_FOLDER = os.path.join(basedir, 'instance', 'log_archive')
+
+    # Seconds a logged-in user's record (and role) is served from memory
+    # instead of the database; 0 disables the cache.
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+
+    # Database the Streamlit dashboard (report.py) saves its results to;
+    # unset means the app database above, which shares the same schema.
+    RESULTS_DATABASE_URL = os.environ.get('RESULTS_DATABASE_URL')
+
+    # CRM requests and M2P payments are counterparts when their times are at
+    # most this many hours apart (the CRM exports local time, M2P UTC) and
+    # their USD amounts differ by at most the tolerance.
+    RECONCILIATION_WINDOW_HOURS = float(os.environ.get('RECONCILIATION_WINDOW_HOURS', 3.5))
+    RECONCILIATION_AMOUNT_TOLERANCE = 1.0
+
+    # Number of reference list versions (excluded/VIP/welcome bonus) kept in memory
+    REFERENCE_LIST_CACHE_SIZE = 16
+    # Number of computed reports kept in memory for viewing and table downloads
+    REPORT_CACHE_SIZE = 4
+
+    # Client segment rules matched against each deal's Group, e.g.
+    # {'Chinese': {'prefixes': ['real\\Chines'], 'patterns': [r'-CN\d*$']}}.
+    # None uses app.segments.DEFAULT_SEGMENTS.
+    CLIENT_SEGMENTS = None
+    # Segments reported with their own lot volume (and optionally a table);
+    # None uses app.segments.REPORT_SEGMENTS.
+    REPORT_SEGMENTS = None
+
+    # Compute report money figures as exact int64 1e-4 units instead of floats
+    MONEY_FIXED_POINT = os.environ.get('MONEY_FIXED_POINT', '0') == '1'
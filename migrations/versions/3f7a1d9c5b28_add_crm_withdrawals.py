@@ -0,0 +1,50 @@
+"""Add CRM withdrawals table
+
+Revision ID: 3f7a1d9c5b28
+Revises: e8c3b5f0a974
+Create Date: 2025-08-14 09:12:05.551903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f7a1d9c5b28'
+down_revision = 'e8c3b5f0a974'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('crm_withdrawals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('request_id', sa.String(length=32), nullable=False),
+    sa.Column('client_id', sa.String(length=32), nullable=True),
+    sa.Column('name', sa.String(length=128), nullable=True),
+    sa.Column('client_type', sa.String(length=32), nullable=True),
+    sa.Column('email', sa.String(length=120), nullable=True),
+    sa.Column('referrer', sa.String(length=128), nullable=True),
+    sa.Column('trading_account', sa.String(length=128), nullable=True),
+    sa.Column('withdrawal_method', sa.String(length=64), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=True),
+    sa.Column('currency', sa.String(length=16), nullable=True),
+    sa.Column('net_amount', sa.Float(), nullable=True),
+    sa.Column('net_currency', sa.String(length=32), nullable=True),
+    sa.Column('review_time', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(length=32), nullable=True),
+    sa.Column('imported_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('request_id')
+    )
+    with op.batch_alter_table('crm_withdrawals', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_crm_withdrawals_client_id'), ['client_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_crm_withdrawals_review_time'), ['review_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('crm_withdrawals', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_crm_withdrawals_review_time'))
+        batch_op.drop_index(batch_op.f('ix_crm_withdrawals_client_id'))
+
+    op.drop_table('crm_withdrawals')
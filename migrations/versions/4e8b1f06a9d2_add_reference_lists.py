@@ -0,0 +1,58 @@
+"""Add reference list tables
+
+Revision ID: 4e8b1f06a9d2
+Revises: c7d2a4e91f30
+Create Date: 2025-08-07 09:41:05.532817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8b1f06a9d2'
+down_revision = 'c7d2a4e91f30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reference_lists',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('current_version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('reference_list_versions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('list_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.Column('source_digest', sa.String(length=64), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['list_id'], ['reference_lists.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('list_id', 'version', name='uq_reference_list_version')
+    )
+    with op.batch_alter_table('reference_list_versions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_reference_list_versions_source_digest'), ['source_digest'], unique=False)
+
+    op.create_table('reference_list_entries',
+    sa.Column('version_id', sa.Integer(), nullable=False),
+    sa.Column('login', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['version_id'], ['reference_list_versions.id'], ),
+    sa.PrimaryKeyConstraint('version_id', 'login')
+    )
+
+
+def downgrade():
+    op.drop_table('reference_list_entries')
+    with op.batch_alter_table('reference_list_versions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reference_list_versions_source_digest'))
+
+    op.drop_table('reference_list_versions')
+    op.drop_table('reference_lists')
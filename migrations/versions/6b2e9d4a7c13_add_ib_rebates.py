@@ -0,0 +1,72 @@
+"""Add IB rebate tables
+
+Revision ID: 6b2e9d4a7c13
+Revises: d41f7a2c8e65
+Create Date: 2025-08-12 16:48:02.611937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b2e9d4a7c13'
+down_revision = 'd41f7a2c8e65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ib_rebates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rebate_key', sa.String(length=128), nullable=False),
+    sa.Column('transaction_id', sa.String(length=64), nullable=True),
+    sa.Column('order_id', sa.String(length=32), nullable=True),
+    sa.Column('platform', sa.String(length=64), nullable=True),
+    sa.Column('account_id', sa.String(length=32), nullable=True),
+    sa.Column('volume', sa.Float(), nullable=True),
+    sa.Column('symbol', sa.String(length=32), nullable=True),
+    sa.Column('swaps', sa.Float(), nullable=True),
+    sa.Column('commission', sa.Float(), nullable=True),
+    sa.Column('profit', sa.Float(), nullable=True),
+    sa.Column('trader', sa.String(length=128), nullable=True),
+    sa.Column('receiver', sa.String(length=128), nullable=True),
+    sa.Column('rebate_platform', sa.String(length=64), nullable=True),
+    sa.Column('rebate_account', sa.String(length=64), nullable=True),
+    sa.Column('rebate_rules', sa.String(length=128), nullable=True),
+    sa.Column('commission_parameter', sa.String(length=32), nullable=True),
+    sa.Column('formula', sa.String(length=128), nullable=True),
+    sa.Column('currency', sa.String(length=16), nullable=True),
+    sa.Column('rebate', sa.Float(), nullable=True),
+    sa.Column('open_time', sa.DateTime(), nullable=True),
+    sa.Column('close_time', sa.DateTime(), nullable=True),
+    sa.Column('rebate_time', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(length=32), nullable=True),
+    sa.Column('failure_reason', sa.String(length=256), nullable=True),
+    sa.Column('imported_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('rebate_key')
+    )
+    with op.batch_alter_table('ib_rebates', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ib_rebates_order_id'), ['order_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ib_rebates_rebate_time'), ['rebate_time'], unique=False)
+
+    op.create_table('ib_rebate_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('receiver', sa.String(length=128), nullable=False),
+    sa.Column('rebate_account', sa.String(length=64), nullable=False),
+    sa.Column('symbol', sa.String(length=32), nullable=False),
+    sa.Column('rebate', sa.Float(), nullable=False),
+    sa.Column('volume', sa.Float(), nullable=False),
+    sa.Column('rebate_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'receiver', 'rebate_account', 'symbol')
+    )
+
+
+def downgrade():
+    op.drop_table('ib_rebate_daily')
+    with op.batch_alter_table('ib_rebates', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ib_rebates_rebate_time'))
+        batch_op.drop_index(batch_op.f('ix_ib_rebates_order_id'))
+
+    op.drop_table('ib_rebates')
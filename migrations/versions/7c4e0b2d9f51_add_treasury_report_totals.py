@@ -0,0 +1,101 @@
+"""Add treasury daily totals and CRM withdrawal logins
+
+Revision ID: 7c4e0b2d9f51
+Revises: b5d8e2a41f36
+Create Date: 2025-08-18 15:03:27.914466
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4e0b2d9f51'
+down_revision = 'b5d8e2a41f36'
+branch_labels = None
+depends_on = None
+
+PAYMENT_LEDGERS = {
+    ('DEPOSIT', 'M2p'): 'M2p Deposit',
+    ('DEPOSIT', 'Settlement'): 'Settlement Deposit',
+    ('WITHDRAW', 'M2p'): 'M2p Withdraw',
+    ('WITHDRAW', 'Settlement'): 'Settlement Withdraw',
+}
+
+
+def _backfill_daily_totals(conn):
+    payments = sa.table('payments', sa.column('type', sa.String), sa.column('channel', sa.String),
+                        sa.column('confirmed', sa.DateTime), sa.column('amount', sa.Float),
+                        sa.column('tier_fee', sa.Float))
+    deposits = sa.table('crm_deposits', sa.column('payment_method', sa.String),
+                        sa.column('request_time', sa.DateTime), sa.column('amount', sa.Float))
+    withdrawals = sa.table('crm_withdrawals', sa.column('review_time', sa.DateTime), sa.column('amount', sa.Float))
+
+    records = []
+    for type_, channel, when, amount, tier_fee in conn.execute(sa.select(payments)):
+        records.append((PAYMENT_LEDGERS[(type_, channel)], when, amount, tier_fee))
+    for method, when, amount in conn.execute(sa.select(deposits)):
+        ledger = 'CRM TopChange' if (method or '').upper() == 'TOPCHANGE' else 'CRM Deposit'
+        records.append((ledger, when, amount, None))
+    for when, amount in conn.execute(sa.select(withdrawals)):
+        records.append(('CRM Withdrawal', when, amount, None))
+
+    totals = {}
+    for ledger, when, amount, tier_fee in records:
+        if when is None:
+            continue
+        row = totals.setdefault((when.date(), ledger), {
+            'day': when.date(), 'ledger': ledger, 'amount': 0.0, 'tier_fee': 0.0,
+            'record_count': 0, 'first_time': when, 'last_time': when})
+        row['amount'] += amount or 0.0
+        row['tier_fee'] += tier_fee or 0.0
+        row['record_count'] += 1
+        row['first_time'] = min(row['first_time'], when)
+        row['last_time'] = max(row['last_time'], when)
+    if totals:
+        daily = sa.table('treasury_daily', sa.column('day', sa.Date), sa.column('ledger', sa.String),
+                         sa.column('amount', sa.Float), sa.column('tier_fee', sa.Float),
+                         sa.column('record_count', sa.Integer), sa.column('first_time', sa.DateTime),
+                         sa.column('last_time', sa.DateTime))
+        conn.execute(daily.insert(), list(totals.values()))
+
+
+def upgrade():
+    op.create_table('treasury_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('ledger', sa.String(length=32), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('tier_fee', sa.Float(), nullable=False),
+    sa.Column('record_count', sa.Integer(), nullable=False),
+    sa.Column('first_time', sa.DateTime(), nullable=True),
+    sa.Column('last_time', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('day', 'ledger')
+    )
+    with op.batch_alter_table('crm_withdrawals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('login', sa.BigInteger(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_crm_withdrawals_login'), ['login'], unique=False)
+
+    # Fill in what was imported before: logins of CRM withdrawals and the daily totals
+    conn = op.get_bind()
+    withdrawals = sa.table('crm_withdrawals', sa.column('id', sa.Integer),
+                           sa.column('trading_account', sa.String), sa.column('login', sa.BigInteger))
+    logins = []
+    for row_id, account in conn.execute(sa.select(withdrawals.c.id, withdrawals.c.trading_account)
+                                        .where(withdrawals.c.trading_account.isnot(None))):
+        match = re.search(r'(\d+)\D*$', account)
+        if match:
+            logins.append({'row_id': row_id, 'row_login': int(match.group(1))})
+    if logins:
+        conn.execute(withdrawals.update().where(withdrawals.c.id == sa.bindparam('row_id'))
+                     .values(login=sa.bindparam('row_login')), logins)
+    _backfill_daily_totals(conn)
+
+
+def downgrade():
+    with op.batch_alter_table('crm_withdrawals', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_crm_withdrawals_login'))
+        batch_op.drop_column('login')
+
+    op.drop_table('treasury_daily')
@@ -0,0 +1,64 @@
+"""Add saved report result tables
+
+Revision ID: 9a3c5e7f1b24
+Revises: 4e8b1f06a9d2
+Create Date: 2025-08-09 14:22:37.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3c5e7f1b24'
+down_revision = '4e8b1f06a9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('run_key', sa.String(length=64), nullable=False),
+    sa.Column('deals_digest', sa.String(length=64), nullable=True),
+    sa.Column('date_range', sa.String(length=128), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_key')
+    )
+    with op.batch_alter_table('report_runs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_report_runs_deals_digest'), ['deals_digest'], unique=False)
+
+    op.create_table('report_client_results',
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('login', sa.String(length=32), nullable=False),
+    sa.Column('total_volume', sa.Float(), nullable=True),
+    sa.Column('trader_profit', sa.Float(), nullable=True),
+    sa.Column('swaps', sa.Float(), nullable=True),
+    sa.Column('commission', sa.Float(), nullable=True),
+    sa.Column('tp_profit', sa.Float(), nullable=True),
+    sa.Column('broker_profit', sa.Float(), nullable=True),
+    sa.Column('net', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['run_id'], ['report_runs.id'], ),
+    sa.PrimaryKeyConstraint('run_id', 'table_name', 'login')
+    )
+    op.create_table('report_calculations',
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=128), nullable=True),
+    sa.Column('description', sa.String(length=256), nullable=True),
+    sa.Column('value', sa.Float(), nullable=True),
+    sa.Column('value_text', sa.String(length=128), nullable=True),
+    sa.ForeignKeyConstraint(['run_id'], ['report_runs.id'], ),
+    sa.PrimaryKeyConstraint('run_id', 'position')
+    )
+
+
+def downgrade():
+    op.drop_table('report_calculations')
+    op.drop_table('report_client_results')
+    with op.batch_alter_table('report_runs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_report_runs_deals_digest'))
+
+    op.drop_table('report_runs')
@@ -0,0 +1,34 @@
+"""Add discrepancy resolution columns
+
+Revision ID: b5d8e2a41f36
+Revises: 3f7a1d9c5b28
+Create Date: 2025-08-16 11:40:18.730245
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d8e2a41f36'
+down_revision = '3f7a1d9c5b28'
+branch_labels = None
+depends_on = None
+
+TABLES = ['payments', 'crm_deposits', 'crm_withdrawals']
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('resolved_at', sa.DateTime(), nullable=True))
+            batch_op.add_column(sa.Column('resolved_by', sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(f'fk_{table}_resolved_by_users', 'users', ['resolved_by'], ['id'])
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_constraint(f'fk_{table}_resolved_by_users', type_='foreignkey')
+            batch_op.drop_column('resolved_by')
+            batch_op.drop_column('resolved_at')
@@ -0,0 +1,30 @@
+"""Add composite indexes for log pagination
+
+Revision ID: c7d2a4e91f30
+Revises: b503926bc974
+Create Date: 2025-08-06 10:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2a4e91f30'
+down_revision = 'b503926bc974'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('logs', schema=None) as batch_op:
+        batch_op.create_index('ix_logs_timestamp_id', ['timestamp', 'id'], unique=False)
+        batch_op.create_index('ix_logs_user_id_timestamp', ['user_id', 'timestamp', 'id'], unique=False)
+        batch_op.create_index('ix_logs_action_timestamp', ['action', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_logs_action_timestamp')
+        batch_op.drop_index('ix_logs_user_id_timestamp')
+        batch_op.drop_index('ix_logs_timestamp_id')
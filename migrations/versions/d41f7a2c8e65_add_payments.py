@@ -0,0 +1,54 @@
+"""Add payments table
+
+Revision ID: d41f7a2c8e65
+Revises: 9a3c5e7f1b24
+Create Date: 2025-08-11 11:05:19.374502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41f7a2c8e65'
+down_revision = '9a3c5e7f1b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('transaction_id', sa.String(length=128), nullable=False),
+    sa.Column('payment_id', sa.String(length=64), nullable=True),
+    sa.Column('type', sa.String(length=16), nullable=False),
+    sa.Column('channel', sa.String(length=16), nullable=False),
+    sa.Column('payment_gateway', sa.String(length=64), nullable=True),
+    sa.Column('status', sa.String(length=16), nullable=True),
+    sa.Column('booked', sa.DateTime(), nullable=True),
+    sa.Column('confirmed', sa.DateTime(), nullable=True),
+    sa.Column('trading_account', sa.String(length=64), nullable=True),
+    sa.Column('wallet_address', sa.String(length=128), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=True),
+    sa.Column('currency', sa.String(length=16), nullable=True),
+    sa.Column('settlement_amount', sa.Float(), nullable=True),
+    sa.Column('settlement_currency', sa.String(length=16), nullable=True),
+    sa.Column('processing_fee', sa.Float(), nullable=True),
+    sa.Column('tier_fee', sa.Float(), nullable=True),
+    sa.Column('balance_after', sa.Float(), nullable=True),
+    sa.Column('comment', sa.String(length=256), nullable=True),
+    sa.Column('imported_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('transaction_id')
+    )
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index('ix_payments_type_channel_confirmed', ['type', 'channel', 'confirmed'], unique=False)
+        batch_op.create_index(batch_op.f('ix_payments_trading_account'), ['trading_account'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_payments_trading_account'))
+        batch_op.drop_index('ix_payments_type_channel_confirmed')
+
+    op.drop_table('payments')
@@ -0,0 +1,49 @@
+"""Add CRM deposits table
+
+Revision ID: e8c3b5f0a974
+Revises: 6b2e9d4a7c13
+Create Date: 2025-08-13 10:27:44.209381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c3b5f0a974'
+down_revision = '6b2e9d4a7c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('crm_deposits',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('request_id', sa.String(length=32), nullable=False),
+    sa.Column('client_id', sa.String(length=32), nullable=True),
+    sa.Column('name', sa.String(length=128), nullable=True),
+    sa.Column('client_type', sa.String(length=32), nullable=True),
+    sa.Column('email', sa.String(length=120), nullable=True),
+    sa.Column('referrer', sa.String(length=128), nullable=True),
+    sa.Column('trading_account', sa.String(length=128), nullable=True),
+    sa.Column('payment_method', sa.String(length=64), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=True),
+    sa.Column('currency', sa.String(length=16), nullable=True),
+    sa.Column('payment_amount', sa.String(length=64), nullable=True),
+    sa.Column('request_time', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(length=32), nullable=True),
+    sa.Column('imported_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('request_id')
+    )
+    with op.batch_alter_table('crm_deposits', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_crm_deposits_client_id'), ['client_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_crm_deposits_request_time'), ['request_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('crm_deposits', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_crm_deposits_request_time'))
+        batch_op.drop_index(batch_op.f('ix_crm_deposits_client_id'))
+
+    op.drop_table('crm_deposits')
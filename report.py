@@ -7,43 +7,24 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime
 import numpy as np
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
 import base64
-from sqlalchemy import create_engine, inspect
+import hashlib
 
-st.set_page_config(layout="wide", page_title="Complete Deals Reporting Dashboard", page_icon="📊")
-
-engine = create_engine("sqlite:///C:\\Users\\mahdi\\Downloads\\report_results.db")
+# Shared with the Flask app (run this script from the repository root)
+from app.exports import write_excel
+from app.logins import LoginSet, to_login_array
+from app.pdf import PDF_MODES, write_pdf_report
+from app.processing import aggregate_book, calculate_vip_volume, generate_chinese_clients
+from app.report_store import create_results_engine, report_run_key, save_report_results
+from config import Config
 
-def update_table(df_new: pd.DataFrame, table_name: str, key_cols: list[str]) -> None:
-    """
-    Append only new rows in df_new to table_name, comparing on key_cols.
-    
-    - df_new: the DataFrame you want to save
-    - table_name: the target SQL table
-    - key_cols: list of columns that uniquely identify a row (e.g. ['DealID'] or ['Login','Date'])
-    """
-    inspector = inspect(engine)
-    
-    if table_name in inspector.get_table_names():
-        # Read existing table
-        df_existing = pd.read_sql_table(table_name, engine)
-        # Identify new rows by doing an anti-join on the key columns
-        merged = df_new.merge(df_existing[key_cols], on=key_cols, how='left', indicator=True)
-        df_to_append = merged[merged['_merge'] == 'left_only'].drop(columns=['_merge'])
-    else:
-        # Table doesn't exist yet → everything is new
-        df_to_append = df_new.copy()
+st.set_page_config(layout="wide", page_title="Complete Deals Reporting Dashboard", page_icon="📊")
 
-    if not df_to_append.empty:
-        df_to_append.to_sql(table_name, engine, if_exists="append", index=False)
-        st.write(f"✅ Appended {len(df_to_append):,} new rows to `{table_name}`")
-    else:
-        st.write(f"ℹ️ No new rows to append to `{table_name}`")
+@st.cache_resource(show_spinner=False)
+def results_engine():
+    """Engine for the results database (RESULTS_DATABASE_URL, else the Flask app's database)."""
+    config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    return create_results_engine(config, Config.RESULTS_DATABASE_URL)
 
 # ─── Helpers ────────────────────────────────────────────────────────────────
 
@@ -92,6 +73,26 @@ def filter_by_date_range(df: pd.DataFrame, start_date, end_date, datetime_col="D
         return df[mask].copy()
     return df
 
+# Magic bytes of the compressed formats accepted by the file uploaders
+COMPRESSION_MAGIC = [
+    (b"\x1f\x8b", "gzip"),
+    (b"PK\x03\x04", "zip"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+
+def read_uploaded_csv(uploaded, **kwargs) -> pd.DataFrame:
+    """Read a plain, .csv.gz, .csv.zst or .zip upload; pandas decompresses it as a stream."""
+    head = uploaded.read(4)
+    uploaded.seek(0)
+    compression = next((name for magic, name in COMPRESSION_MAGIC if head.startswith(magic)), None)
+    return pd.read_csv(uploaded, compression=compression, **kwargs)
+
+# ─── Excel Export ────────────────────────────────────────────────────────────
+
+def write_excel_report(sheets: dict, output) -> None:
+    """Write the non-empty frames in `sheets` to an .xlsx workbook (see app.exports.write_excel)."""
+    write_excel({name: df for name, df in sheets.items() if not df.empty}, output)
+
 # ─── Core Processing ─────────────────────────────────────────────────────────
 
 def process_and_split(df: pd.DataFrame) -> dict[str,pd.DataFrame]:
@@ -141,152 +142,6 @@ def enrich_and_dedupe(df: pd.DataFrame) -> pd.DataFrame:
     headers = list(df.columns) + ["Profit Value", "Profit Unit", "Date", "Time"]
     return pd.DataFrame(output, columns=headers)
 
-def aggregate_book(df: pd.DataFrame, excluded: set[str], book_type: str) -> pd.DataFrame:
-    """
-    Aggregate book data with proper excluded account handling based on book type.
-    
-    For A Book and Multi Book: Set commission, TP profit, and broker profit to 0 for excluded accounts
-    For B Book: Skip excluded accounts entirely
-    """
-    if df.empty:
-        return pd.DataFrame()
-    
-    required = [
-        "Login", "Notional volume in USD", "Trader profit",
-        "Swaps", "Commission", "TP broker profit", "Total broker profit"
-    ]
-    for col in required:
-        if col not in df:
-            st.error(f"Missing column {col}!")
-            st.stop()
-        if col != "Login":
-            df[col] = sanitize_numeric_series(df[col])
-
-    rows = []
-    for login, group in df.groupby("Login", dropna=False):
-        if pd.isna(login):
-            continue
-        
-        login_str = str(login).strip()
-        is_excluded = login_str in excluded
-        
-        # For B Book: Skip excluded accounts entirely (like in Apps Script)
-        if book_type == "B Book" and is_excluded:
-            continue
-        
-        # For A Book and Multi Book: Zero out specific fields for excluded accounts
-        if is_excluded and book_type in ["A Book", "Multi Book"]:
-            comm = 0
-            tp = 0
-            bk = 0
-        else:
-            comm = group["Commission"].sum()
-            tp = group["TP broker profit"].sum()
-            bk = group["Total broker profit"].sum()
-
-        rec = {
-            "Login": login_str,
-            "Total Volume": group["Notional volume in USD"].sum(),
-            "Trader Profit": group["Trader profit"].sum(),
-            "Swaps": group["Swaps"].sum(),
-            "Commission": comm,
-            "TP Profit": tp,
-            "Broker Profit": bk
-        }
-        rec["Net"] = rec["Trader Profit"] + rec["Swaps"] - rec["Commission"]
-        rows.append(rec)
-
-    df_out = pd.DataFrame(rows)
-    if not df_out.empty:
-        summary = {c: round4(df_out[c].sum()) for c in df_out.columns if c != "Login"}
-        summary["Login"] = "Summary"
-        return pd.concat([df_out, pd.DataFrame([summary])], ignore_index=True)
-    return df_out
-
-def generate_chinese_clients(enriched_books: dict, excluded: set) -> pd.DataFrame:
-    """Generate Chinese clients analysis with proper excluded account handling"""
-    chinese_prefixes = ['real\\Chines', 'BBOOK\\Chines']
-    chinese_summary = {}
-    
-    for book_name, df in enriched_books.items():
-        if df.empty:
-            continue
-        
-        required_cols = ["Login", "Group", "Notional volume in USD", "Trader profit", 
-                        "Swaps", "Commission", "TP broker profit", "Total broker profit"]
-        
-        if not all(col in df.columns for col in required_cols):
-            continue
-            
-        for _, row in df.iterrows():
-            login = str(row["Login"]).strip()
-            group = str(row["Group"]).strip()
-            
-            if not login:
-                continue
-                
-            # Skip excluded accounts entirely for Chinese clients analysis
-            if login in excluded:
-                continue
-                
-            # Check if client is Chinese
-            if not any(group.startswith(prefix) for prefix in chinese_prefixes):
-                continue
-                
-            if login not in chinese_summary:
-                chinese_summary[login] = {
-                    "Total Volume": 0,
-                    "Trader Profit": 0,
-                    "Swaps": 0,
-                    "Commission": 0,
-                    "TP Profit": 0,
-                    "Broker Profit": 0
-                }
-            
-            chinese_summary[login]["Total Volume"] += float(row["Notional volume in USD"] or 0)
-            chinese_summary[login]["Trader Profit"] += float(row["Trader profit"] or 0)
-            chinese_summary[login]["Swaps"] += float(row["Swaps"] or 0)
-            chinese_summary[login]["Commission"] += float(row["Commission"] or 0)
-            chinese_summary[login]["TP Profit"] += float(row["TP broker profit"] or 0)
-            chinese_summary[login]["Broker Profit"] += float(row["Total broker profit"] or 0)
-    
-    if not chinese_summary:
-        return pd.DataFrame(columns=["Login", "Total Volume", "Trader Profit", "Swaps", 
-                                   "Commission", "TP Profit", "Broker Profit", "Net"])
-    
-    # Convert to DataFrame
-    rows = []
-    for login, data in chinese_summary.items():
-        net = data["Trader Profit"] + data["Swaps"] - data["Commission"]
-        rows.append({
-            "Login": login,
-            "Total Volume": round4(data["Total Volume"]),
-            "Trader Profit": round4(data["Trader Profit"]),
-            "Swaps": round4(data["Swaps"]),
-            "Commission": round4(data["Commission"]),
-            "TP Profit": round4(data["TP Profit"]),
-            "Broker Profit": round4(data["Broker Profit"]),
-            "Net": round4(net)
-        })
-    
-    df_chinese = pd.DataFrame(rows)
-    
-    # Add summary row
-    if not df_chinese.empty:
-        summary = {
-            "Login": "Summary",
-            "Total Volume": round4(df_chinese["Total Volume"].sum()),
-            "Trader Profit": round4(df_chinese["Trader Profit"].sum()),
-            "Swaps": round4(df_chinese["Swaps"].sum()),
-            "Commission": round4(df_chinese["Commission"].sum()),
-            "TP Profit": round4(df_chinese["TP Profit"].sum()),
-            "Broker Profit": round4(df_chinese["Broker Profit"].sum()),
-            "Net": round4(df_chinese["Net"].sum())
-        }
-        df_chinese = pd.concat([df_chinese, pd.DataFrame([summary])], ignore_index=True)
-    
-    return df_chinese
-
 def generate_client_summary(results: dict) -> pd.DataFrame:
     """Generate consolidated client summary across all books"""
     all_clients = {}
@@ -354,26 +209,6 @@ def generate_client_summary(results: dict) -> pd.DataFrame:
     
     return df_summary
 
-def calculate_vip_volume(enriched_books: dict, vip_clients: set, excluded: set) -> float:
-    """Calculate total volume for VIP clients, excluding excluded accounts"""
-    total_vip_volume = 0
-    
-    for book_name, df in enriched_books.items():
-        if df.empty or "Login" not in df.columns or "Notional volume in USD" not in df.columns:
-            continue
-            
-        for _, row in df.iterrows():
-            login = str(row["Login"]).strip()
-            
-            # Skip excluded accounts
-            if login in excluded:
-                continue
-                
-            if login in vip_clients:
-                total_vip_volume += float(row["Notional volume in USD"] or 0)
-    
-    return total_vip_volume
-
 def generate_final_calculations(results: dict, chinese_df: pd.DataFrame, vip_volume: float, 
                               date_range: str = "") -> pd.DataFrame:
     """Generate comprehensive final calculations matching Apps Script logic"""
@@ -462,77 +297,111 @@ def generate_final_calculations(results: dict, chinese_df: pd.DataFrame, vip_vol
     
     return pd.DataFrame(calculations, columns=["Source", "Description", "Value"])
 
-def create_pdf_report(all_data: dict, date_range: str = "") -> bytes:
-    """Create comprehensive PDF report"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Title
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        alignment=1,  # Center
-        textColor=colors.darkblue
-    )
-    
-    title = f"Deals Reporting Dashboard{' - ' + date_range if date_range else ''}"
-    story.append(Paragraph(title, title_style))
-    story.append(Spacer(1, 20))
-    
-    # Helper function to create tables
-    def create_table(df, title):
-        if df.empty:
-            return []
-        
-        elements = []
-        
-        # Section title
-        section_style = ParagraphStyle(
-            'SectionTitle',
-            parent=styles['Heading2'],
-            fontSize=12,
-            spaceAfter=10,
-            textColor=colors.darkgreen
-        )
-        elements.append(Paragraph(title, section_style))
-        
-        # Prepare data
-        data = [list(df.columns)]
-        for _, row in df.iterrows():
-            data.append([str(val) for val in row])
-        
-        # Create table
-        table = Table(data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 8),
-            ('FONTSIZE', (0, 1), (-1, -1), 7),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 20))
-        return elements
-    
-    # Add all sections
-    for title, df in all_data.items():
-        if not df.empty:
-            story.extend(create_table(df, title))
-            if title in ["A Book Result", "B Book Result"]:  # Add page break after major sections
-                story.append(PageBreak())
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer.getvalue()
+# ─── Cached Pipeline Stages ──────────────────────────────────────────────────
+# Every widget interaction reruns this script, so each stage is cached and
+# keyed by the SHA-256 of the uploads it depends on plus its own parameters;
+# a rerun only recomputes the stages whose inputs changed. Arguments starting
+# with "_" are not hashed by Streamlit; they carry the data the key describes.
+# Large frames are cached as shared resources (no copy per rerun), everything
+# else with st.cache_data. max_entries and ttl bound memory use.
+
+CACHE_MAX_ENTRIES = 4
+CACHE_TTL = 60 * 60
+
+def uploaded_digest(uploaded) -> str:
+    """SHA-256 of an uploaded file, computed once per upload."""
+    if uploaded is None:
+        return ""
+    digests = st.session_state.setdefault("upload_digests", {})
+    key = getattr(uploaded, "file_id", None) or (uploaded.name, uploaded.size)
+    if key not in digests:
+        sha = hashlib.sha256()
+        uploaded.seek(0)
+        for chunk in iter(lambda: uploaded.read(1024 * 1024), b""):
+            sha.update(chunk)
+        uploaded.seek(0)
+        digests[key] = sha.hexdigest()
+    return digests[key]
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, show_spinner=False)
+def load_deals(deals_digest: str, _deals_file) -> pd.DataFrame:
+    _deals_file.seek(0)
+    return read_uploaded_csv(_deals_file)
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, show_spinner=False)
+def split_deals(deals_digest: str, _deals_file) -> dict:
+    """Enriched books before date filtering."""
+    books = process_and_split(load_deals(deals_digest, _deals_file))
+    return {k: enrich_and_dedupe(v) for k, v in books.items()}
+
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, show_spinner=False)
+def filter_deals(deals_digest: str, start: str, end: str, _deals_file) -> dict:
+    enriched = split_deals(deals_digest, _deals_file)
+    if not (start and end):
+        return enriched
+    return {k: filter_by_date_range(v, start, end) for k, v in enriched.items()}
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES * 2, ttl=CACHE_TTL, show_spinner=False)
+def load_login_set(digest: str, _uploaded) -> LoginSet:
+    if _uploaded is None:
+        return LoginSet()
+    _uploaded.seek(0)
+    df = read_uploaded_csv(_uploaded, header=None, names=["Login"])
+    return LoginSet(df["Login"])
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, show_spinner=False)
+def run_analyses(deals_digest: str, start: str, end: str, ex_digest: str, vip_digest: str,
+                 _deals_file, _ex_file, _vip_file):
+    """All book aggregations and derived tables for one set of inputs."""
+    enriched = filter_deals(deals_digest, start, end, _deals_file)
+    excluded = load_login_set(ex_digest, _ex_file)
+    vip = load_login_set(vip_digest, _vip_file)
+    date_range = f"From {start} to {end}" if start and end else ""
+
+    # Book aggregations with book-specific exclusion logic
+    results = {name: aggregate_book(df, excluded, name) for name, df in enriched.items()}
+    chinese_clients = generate_chinese_clients(enriched, excluded)
+    client_summary = generate_client_summary(results)
+    # VIP volume calculation (excluding excluded accounts)
+    vip_volume = calculate_vip_volume(enriched, vip, excluded)
+    final_calculations = generate_final_calculations(results, chinese_clients, vip_volume, date_range)
+    return results, chinese_clients, client_summary, vip_volume, final_calculations
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, show_spinner=False)
+def vip_breakdown(deals_digest: str, start: str, end: str, vip_digest: str, _deals_file, _vip_file) -> pd.DataFrame:
+    """Per-login volume, trader profit and commission of VIP clients."""
+    enriched = filter_deals(deals_digest, start, end, _deals_file)
+    vip = load_login_set(vip_digest, _vip_file)
+    cols = {"Notional volume in USD": "Volume", "Trader profit": "Trader Profit", "Commission": "Commission"}
+    frames = []
+    for df in enriched.values():
+        if df.empty or "Login" not in df.columns:
+            continue
+        logins = to_login_array(df["Login"])
+        mask = vip.isin(logins)
+        if mask.any():
+            part = df.loc[mask].reindex(columns=list(cols)).apply(sanitize_numeric_series).rename(columns=cols)
+            part.insert(0, "Login", logins[mask].astype(str))
+            frames.append(part)
+    if not frames:
+        return pd.DataFrame()
+    vip_agg = pd.concat(frames).groupby("Login").sum().round(4)
+    vip_agg["Net"] = vip_agg["Trader Profit"] - vip_agg["Commission"]
+    return vip_agg
+
+@st.cache_data(max_entries=2, ttl=CACHE_TTL, show_spinner=False)
+def build_excel_report(analysis_key: tuple, _sheets: dict) -> bytes:
+    """Build the Excel workbook; only called when the download is requested."""
+    excel_buffer = io.BytesIO()
+    write_excel_report(_sheets, excel_buffer)
+    return excel_buffer.getvalue()
+
+@st.cache_data(max_entries=2, ttl=CACHE_TTL, show_spinner=False)
+def build_pdf_report(analysis_key: tuple, _pdf_data: dict, date_range: str, mode: str) -> bytes:
+    """Build the PDF report; only called when the download is requested."""
+    pdf_buffer = io.BytesIO()
+    write_pdf_report(_pdf_data, pdf_buffer, date_range, mode)
+    return pdf_buffer.getvalue()
 
 # ─── Streamlit UI ───────────────────────────────────────────────────────────
 
@@ -544,9 +413,10 @@ st.sidebar.header("🔧 Configuration")
 
 # File uploads
 st.sidebar.subheader("📁 Upload Files")
-deals_csv = st.sidebar.file_uploader("Deals CSV", type="csv", key="deals")
-ex_csv = st.sidebar.file_uploader("Excluded Accounts CSV", type="csv", key="excluded")
-vip_csv = st.sidebar.file_uploader("VIP Client List CSV", type="csv", key="vip")
+UPLOAD_TYPES = ["csv", "gz", "zst", "zip"]
+deals_csv = st.sidebar.file_uploader("Deals CSV", type=UPLOAD_TYPES, key="deals")
+ex_csv = st.sidebar.file_uploader("Excluded Accounts CSV", type=UPLOAD_TYPES, key="excluded")
+vip_csv = st.sidebar.file_uploader("VIP Client List CSV", type=UPLOAD_TYPES, key="vip")
 
 # Date range
 st.sidebar.subheader("📅 Date Range Filter")
@@ -561,6 +431,12 @@ st.sidebar.subheader("📋 Report Options")
 show_charts = st.sidebar.checkbox("Show Charts", value=True)
 show_detailed_tables = st.sidebar.checkbox("Show Detailed Tables", value=True)
 generate_pdf = st.sidebar.checkbox("Generate PDF Report")
+pdf_mode = st.sidebar.radio("PDF Detail", list(PDF_MODES), format_func=PDF_MODES.get,
+                            horizontal=True, disabled=not generate_pdf)
+if st.sidebar.button("🧹 Clear Cached Results"):
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    st.session_state.pop("saved_analysis", None)
 
 if not deals_csv:
     st.warning("📤 Please upload your Deals CSV file to continue.")
@@ -570,65 +446,39 @@ if not deals_csv:
 # ─── Main Processing ─────────────────────────────────────────────────────────
 
 try:
+    deals_digest = uploaded_digest(deals_csv)
+    ex_digest = uploaded_digest(ex_csv)
+    vip_digest = uploaded_digest(vip_csv)
+    start_key, end_key = (start_dt, end_dt) if use_date_filter and start_dt and end_dt else ("", "")
+    date_range_str = f"From {start_key} to {end_key}" if start_key else ""
+
     # 1) Read & Process
     with st.spinner("🔄 Processing deals data..."):
-        raw = pd.read_csv(deals_csv)
-        books = process_and_split(raw)
-        enriched = {k: enrich_and_dedupe(v) for k, v in books.items()}
-        
-        # Apply date filtering if enabled
-        if use_date_filter and start_dt and end_dt:
-            date_range_str = f"From {start_dt} to {end_dt}"
-            for k in enriched:
-                enriched[k] = filter_by_date_range(enriched[k], start_dt, end_dt)
-        else:
-            date_range_str = ""
+        raw = load_deals(deals_digest, deals_csv)
+        enriched = filter_deals(deals_digest, start_key, end_key, deals_csv)
 
     # 2) Load additional data
-    excluded = set()
-    if ex_csv:
-        excluded_df = pd.read_csv(ex_csv, header=None, names=["Login"])
-        excluded = set(excluded_df["Login"].str.strip())
-
-    vip = set()
-    if vip_csv:
-        vip_df = pd.read_csv(vip_csv, header=None, names=["Login"])
-        vip = set(vip_df["Login"].str.strip())
+    excluded = load_login_set(ex_digest, ex_csv)
+    vip = load_login_set(vip_digest, vip_csv)
 
     # 3) Generate all analyses with proper excluded account handling
     with st.spinner("📊 Generating comprehensive analysis..."):
-        # Book aggregations with book-specific exclusion logic
-        results = {}
-        for book_name, book_data in enriched.items():
-            results[book_name] = aggregate_book(book_data, excluded, book_name)
-        
-        # Chinese clients analysis
-        chinese_clients = generate_chinese_clients(enriched, excluded)
-        
-        # Client summary
-        client_summary = generate_client_summary(results)
-        
-        # VIP volume calculation (excluding excluded accounts)
-        vip_volume = calculate_vip_volume(enriched, vip, excluded)
-        
-        # Final calculations
-        final_calculations = generate_final_calculations(results, chinese_clients, vip_volume, date_range_str)
-        
-        # Save to database
-        for name, df in results.items():
-            if not df.empty:
-                update_table(df, f"{name.replace(' ', '_')}_Results", ["Login"])
-        
-        if not chinese_clients.empty:
-            update_table(chinese_clients, "Chinese_Clients", ["Login"])
-        
-        if not client_summary.empty:
-            update_table(client_summary, "Client_Summary", ["Login"])
-        
-        if not final_calculations.empty:
-            update_table(final_calculations, "Final_Calculations", ["Source"])
-
-        st.success("✅ All results saved to SQLite database (report_results.db)")
+        results, chinese_clients, client_summary, vip_volume, final_calculations = run_analyses(
+            deals_digest, start_key, end_key, ex_digest, vip_digest, deals_csv, ex_csv, vip_csv)
+
+        # Save to database once per distinct set of inputs, not on every rerun
+        analysis_key = (deals_digest, start_key, end_key, ex_digest, vip_digest)
+        if st.session_state.get("saved_analysis") != analysis_key:
+            saved = save_report_results(
+                results_engine(), report_run_key(*analysis_key),
+                {**{f"{name} Result": df for name, df in results.items()},
+                 "Chinese Clients": chinese_clients, "Client Summary": client_summary},
+                final_calculations, deals_digest=deals_digest, date_range=date_range_str)
+            st.session_state["saved_analysis"] = analysis_key
+            if saved:
+                st.success("✅ All results saved to the results database")
+            else:
+                st.info("ℹ️ These results were already saved to the results database")
     
 
     # ─── Dashboard Metrics ─────────────────────────────────────────────────────
@@ -840,32 +690,9 @@ try:
             st.subheader("⭐ VIP Client Analysis")
             
             if vip:
-                # VIP client breakdown
-                vip_breakdown = []
-                for book_name, df in enriched.items():
-                    if df.empty:
-                        continue
-                    for _, row in df.iterrows():
-                        login = str(row.get("Login", "")).strip()
-                        if login in vip:
-                            vip_breakdown.append({
-                                "Book": book_name,
-                                "Login": login,
-                                "Volume": float(row.get("Notional volume in USD", 0)),
-                                "Trader Profit": float(row.get("Trader profit", 0)),
-                                "Commission": float(row.get("Commission", 0))
-                            })
+                vip_agg = vip_breakdown(deals_digest, start_key, end_key, vip_digest, deals_csv, vip_csv)
                 
-                if vip_breakdown:
-                    vip_df = pd.DataFrame(vip_breakdown)
-                    # Aggregate by login
-                    vip_agg = vip_df.groupby("Login").agg({
-                        "Volume": "sum",
-                        "Trader Profit": "sum", 
-                        "Commission": "sum"
-                    }).round(4)
-                    vip_agg["Net"] = vip_agg["Trader Profit"] - vip_agg["Commission"]
-                    
+                if not vip_agg.empty:
                     st.dataframe(vip_agg, use_container_width=True)
                     
                     col1, col2, col3 = st.columns(3)
@@ -968,46 +795,29 @@ try:
     with export_col1:
         st.subheader("📊 Excel Report")
         
-        # Generate comprehensive Excel report
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine="openpyxl") as writer:
-            # Raw data splits
-            for name, df in books.items():
-                if not df.empty:
-                    df.to_excel(writer, name, index=False)
-            
-            # Enriched data
-            for name, df in enriched.items():
-                if not df.empty:
-                    df.to_excel(writer, f"{name} Enriched", index=False)
-            
-            # Analysis results
-            for name, df in results.items():
-                if not df.empty:
-                    df.to_excel(writer, f"{name} Result", index=False)
-            
-            # Additional analyses
-            if not client_summary.empty:
-                client_summary.to_excel(writer, "Client Summary", index=False)
-            
-            if not chinese_clients.empty:
-                chinese_clients.to_excel(writer, "Chinese Clients", index=False)
-            
-            if not final_calculations.empty:
-                final_calculations.to_excel(writer, "Final Calculations", index=False)
-            
-            # Reference data
-            if ex_csv:
-                pd.DataFrame(sorted(excluded), columns=["Login"]).to_excel(writer, "Excluded Accounts", index=False)
-            if vip_csv:
-                pd.DataFrame(sorted(vip), columns=["Login"]).to_excel(writer, "VIP Client List", index=False)
-        
-        excel_buffer.seek(0)
+        # The workbook is generated only when the button is clicked. The
+        # enriched books hold every raw column, so the split books are not
+        # written a second time.
+        sheets = {}
+        # Enriched data
+        sheets.update({f"{name} Enriched": df for name, df in enriched.items()})
+        # Analysis results
+        sheets.update({f"{name} Result": df for name, df in results.items()})
+        # Additional analyses
+        sheets["Client Summary"] = client_summary
+        sheets["Chinese Clients"] = chinese_clients
+        sheets["Final Calculations"] = final_calculations
+        # Reference data
+        if ex_csv:
+            sheets["Excluded Accounts"] = pd.DataFrame({"Login": excluded.array})
+        if vip_csv:
+            sheets["VIP Client List"] = pd.DataFrame({"Login": vip.array})
+
         filename = f"deals_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         
         st.download_button(
             "📊 Download Excel Report",
-            data=excel_buffer,
+            data=lambda: build_excel_report(analysis_key, sheets),
             file_name=filename,
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             help="Complete Excel workbook with all analyses and raw data"
@@ -1028,12 +838,11 @@ try:
                     "Chinese Clients": chinese_clients
                 }
                 
-                pdf_bytes = create_pdf_report(pdf_data, date_range_str)
-                pdf_filename = f"deals_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+                pdf_filename = f"deals_report_{pdf_mode}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
                 
                 st.download_button(
                     "📄 Download PDF Report",
-                    data=pdf_bytes,
+                    data=lambda: build_pdf_report(analysis_key, pdf_data, date_range_str, pdf_mode),
                     file_name=pdf_filename,
                     mime="application/pdf",
                     help="Executive summary PDF report"
@@ -0,0 +1,46 @@
+import os
+import tempfile
+import unittest
+
+from app import create_app, db
+from app.models import User, Role, invalidate_user_cache
+from app.reference_lists import clear_cache
+from app.reports import clear_cache as clear_report_cache
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    AUDIT_LOG_ASYNC = False
+
+
+class AppTestCase(unittest.TestCase):
+    """Creates an app backed by a throwaway SQLite file with one Viewer user."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        TestConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(self.tmpdir.name, 'test.db')
+        TestConfig.AUDIT_LOG_FALLBACK_PATH = os.path.join(self.tmpdir.name, 'audit_fallback.log')
+        TestConfig.UPLOAD_FOLDER = os.path.join(self.tmpdir.name, 'uploads')
+        self.app = create_app(TestConfig)
+        invalidate_user_cache()
+        clear_cache()
+        clear_report_cache()
+        with self.app.app_context():
+            db.create_all()
+            role = Role(name='Viewer')
+            user = User(username='analyst', email='analyst@example.com', role=role)
+            user.set_password('Secret123!')
+            db.session.add_all([role, user])
+            db.session.commit()
+            self.user_id = user.id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def login(self, client, username='analyst', password='Secret123!'):
+        return client.post('/login', data={'username': username, 'password': password})
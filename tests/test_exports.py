@@ -0,0 +1,105 @@
+import io
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from app import exports
+from app.exports import iter_export, table_slug, write_excel
+from tests.base import AppTestCase
+from tests.test_storage import DEALS_CSV
+
+
+class TestExportWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'Login': ['1001', '1002', 'Summary'],
+            'Total Volume': [10.5, np.nan, 10.5],
+            'Mixed': [1, 'x', None],
+        })
+
+    def test_csv_is_streamed_in_chunks(self):
+        with mock.patch.object(exports, 'EXPORT_CHUNK_ROWS', 2):
+            parts = list(iter_export(self.df, 'csv'))
+        self.assertEqual(len(parts), 3)
+        back = pd.read_csv(io.StringIO(''.join(parts)), dtype={'Login': str})
+        self.assertEqual(list(back['Login']), ['1001', '1002', 'Summary'])
+
+    @unittest.skipIf(exports.pq is None, 'pyarrow not installed')
+    def test_parquet_round_trip(self):
+        with mock.patch.object(exports, 'EXPORT_CHUNK_ROWS', 2):
+            data = b''.join(iter_export(self.df, 'parquet'))
+        back = pd.read_parquet(io.BytesIO(data))
+        self.assertEqual(list(back['Mixed'].iloc[:2]), ['1', 'x'])
+        self.assertTrue(pd.isna(back['Mixed'].iloc[2]))
+        self.assertEqual(back['Total Volume'].iloc[0], 10.5)
+
+    def test_excel_splits_long_tables(self):
+        with mock.patch.object(exports, 'EXCEL_MAX_ROWS', 3):
+            data = b''.join(iter_export(self.df, 'xlsx', sheet_name='A Book Result'))
+        sheets = pd.read_excel(io.BytesIO(data), sheet_name=None, dtype={'Login': str})
+        self.assertEqual(list(sheets), ['A Book Result (1)', 'A Book Result (2)'])
+        self.assertEqual(list(sheets['A Book Result (2)']['Login']), ['Summary'])
+
+    def test_excel_workbook_of_several_tables(self):
+        buffer = io.BytesIO()
+        write_excel({'Final Calculations': self.df.head(1), 'VIP Clients': self.df.head(0)}, buffer)
+        sheets = pd.read_excel(io.BytesIO(buffer.getvalue()), sheet_name=None, dtype={'Login': str})
+        self.assertEqual(list(sheets), ['Final Calculations', 'VIP Clients'])
+        self.assertEqual(list(sheets['Final Calculations']['Login']), ['1001'])
+        self.assertEqual(list(sheets['VIP Clients'].columns), ['Login', 'Total Volume', 'Mixed'])
+
+    def test_excel_dates(self):
+        df = pd.DataFrame({'Confirmed': pd.to_datetime(['2024-01-01 12:00', None], utc=True),
+                           'Day': pd.to_datetime(['2024-01-02 08:30:15', '2024-01-03 00:00:00'])})
+        data = b''.join(iter_export(df, 'xlsx', sheet_name='Payments'))
+        back = pd.read_excel(io.BytesIO(data))
+        self.assertEqual(back['Confirmed'].iloc[0], pd.Timestamp('2024-01-01 12:00'))
+        self.assertTrue(pd.isna(back['Confirmed'].iloc[1]))
+        self.assertEqual(back['Day'].iloc[0], pd.Timestamp('2024-01-02 08:30:15'))
+
+        from openpyxl import load_workbook
+        cell = load_workbook(io.BytesIO(data))['Payments']['B2']
+        self.assertEqual(cell.number_format, 'yyyy-mm-dd hh:mm:ss')
+
+    def test_excel_sheet_names(self):
+        name = 'Settlement Withdraw / Discrepancies [all]'
+        with mock.patch.object(exports, 'EXCEL_MAX_ROWS', 3):
+            data = b''.join(iter_export(self.df, 'xlsx', sheet_name=name))
+        sheets = pd.read_excel(io.BytesIO(data), sheet_name=None)
+        self.assertEqual(list(sheets), ['Settlement Withdraw _ Discr (1)', 'Settlement Withdraw _ Discr (2)'])
+
+    def test_table_slug(self):
+        self.assertEqual(table_slug('Multi Book Raw'), 'multi-book-raw')
+
+
+class TestDownloadRoutes(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.app.test_client()
+        self.login(self.client)
+        self.client.post('/upload', data={'deals_csv': (io.BytesIO(DEALS_CSV.encode()), 'deals.csv')},
+                         content_type='multipart/form-data')
+
+    def test_download_csv(self):
+        response = self.client.get('/report/download/a-book-result.csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        table = pd.read_csv(io.BytesIO(response.data), dtype={'Login': str})
+        self.assertEqual(list(table['Login']), ['1001', '1002', 'Summary'])
+
+    def test_unknown_table_or_format(self):
+        self.assertEqual(self.client.get('/report/download/nope.csv').status_code, 404)
+        self.assertEqual(self.client.get('/report/download/a-book-result.doc').status_code, 404)
+
+    def test_results_page_links_downloads(self):
+        response = self.client.get('/report/generate')
+        self.assertIn(b'/report/download/client-summary.xlsx', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import gzip
+import json
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import User, Role, Log
+from app.logger import audit_writer, query_log_page, archive_logs
+from tests.base import AppTestCase
+
+
+class TestAuditLogWriter(AppTestCase):
+
+    def test_entries_are_batched(self):
+        """Queued entries are held in memory until flushed, then written together."""
+        self.app.config['AUDIT_LOG_ASYNC'] = True
+        for i in range(3):
+            audit_writer.enqueue(self.user_id, f'action_{i}')
+        self.assertEqual(audit_writer.pending(), 3)
+        with self.app.app_context():
+            self.assertEqual(Log.query.count(), 0)
+
+        self.assertEqual(audit_writer.flush(), 3)
+        self.assertEqual(audit_writer.pending(), 0)
+        with self.app.app_context():
+            actions = [log.action for log in Log.query.order_by(Log.id)]
+        self.assertEqual(actions, ['action_0', 'action_1', 'action_2'])
+
+    def test_busy_database_falls_back_to_file(self):
+        """A locked database sends the batch to the append-only fallback file."""
+        audit_writer.app.config['AUDIT_LOG_ASYNC'] = True
+        audit_writer.enqueue(self.user_id, 'files_uploaded', 'deals.csv')
+        busy = OperationalError('INSERT', {}, Exception('database is locked'))
+        with mock.patch.object(db.session, 'execute', side_effect=busy):
+            self.assertEqual(audit_writer.flush(), 0)
+
+        with open(self.app.config['AUDIT_LOG_FALLBACK_PATH'], encoding='utf-8') as fh:
+            entries = [json.loads(line) for line in fh]
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['action'], 'files_uploaded')
+        self.assertEqual(entries[0]['user_id'], self.user_id)
+
+    def test_login_records_log(self):
+        """Logging in through the app still produces an audit entry."""
+        client = self.app.test_client()
+        self.login(client)
+        with self.app.app_context():
+            self.assertEqual([log.action for log in Log.query], ['user_login'])
+
+
+class TestLogViewer(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        base = datetime(2025, 8, 1, 12, 0, 0)
+        with self.app.app_context():
+            owner_role = Role(name='Owner')
+            owner = User(username='owner', email='owner@example.com', role=owner_role)
+            owner.set_password('Secret123!')
+            db.session.add_all([owner_role, owner])
+            db.session.commit()
+            self.owner_id = owner.id
+            # Two entries share each timestamp so the id tie-breaker matters.
+            for i in range(10):
+                db.session.add(Log(user_id=self.user_id if i % 2 else self.owner_id,
+                                   action='user_login' if i % 3 else 'files_uploaded',
+                                   timestamp=base + timedelta(minutes=i // 2)))
+            db.session.commit()
+
+    def test_keyset_pages_cover_every_row_once(self):
+        with self.app.app_context():
+            seen, cursor = [], None
+            while True:
+                logs, cursor, _ = query_log_page(before=cursor, per_page=3)
+                seen.extend((log.timestamp, log.id) for log in logs)
+                if cursor is None:
+                    break
+            self.assertEqual(len(seen), 10)
+            self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_newer_page_returns_previous_rows(self):
+        with self.app.app_context():
+            first, next_cursor, _ = query_log_page(per_page=4)
+            second, _, prev_cursor = query_log_page(before=next_cursor, per_page=4)
+            back, _, _ = query_log_page(after=prev_cursor, per_page=4)
+            self.assertEqual([log.id for log in back], [log.id for log in first])
+
+    def test_filters(self):
+        with self.app.app_context():
+            logs, _, _ = query_log_page(username='analyst', action='user_login', per_page=50)
+            self.assertTrue(logs)
+            self.assertTrue(all(log.user_id == self.user_id and log.action == 'user_login' for log in logs))
+            logs, _, _ = query_log_page(start=datetime(2025, 8, 1, 12, 3), per_page=50)
+            self.assertEqual(len(logs), 4)
+            logs, _, _ = query_log_page(username='nobody', per_page=50)
+            self.assertEqual(logs, [])
+
+    def test_admin_page_renders_filtered_page(self):
+        client = self.app.test_client()
+        self.login(client, 'owner')
+        response = client.get('/admin?action=files_uploaded&start=2025-08-01&end=2025-08-01')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Files Uploaded', response.data)
+
+    def test_archive_moves_old_rows_to_gzip(self):
+        archive_dir = os.path.join(self.tmpdir.name, 'archive')
+        with self.app.app_context():
+            recent = Log(user_id=self.user_id, action='user_logout', timestamp=datetime.utcnow())
+            db.session.add(recent)
+            db.session.commit()
+            count, path = archive_logs(30, archive_dir, batch_size=4)
+            self.assertEqual(count, 10)
+            self.assertEqual([log.action for log in Log.query], ['user_logout'])
+        with gzip.open(path, 'rt', encoding='utf-8') as fh:
+            self.assertEqual(len(fh.readlines()), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
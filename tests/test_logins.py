@@ -0,0 +1,37 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from app.logins import LoginSet, to_login_array
+
+
+class TestLoginSet(unittest.TestCase):
+
+    def test_mixed_inputs_normalize_to_ints(self):
+        logins = LoginSet([' 1005', 1002, 1002.0, 'abc', None, 1003.5])
+        self.assertEqual(list(logins.array), [1002, 1005])
+        self.assertEqual(len(logins), 2)
+        self.assertIn('1005', logins)
+        self.assertIn(1002, logins)
+        self.assertNotIn(1003, logins)
+
+    def test_vectorized_membership(self):
+        logins = LoginSet(pd.Series(['1005', '1002']))
+        column = pd.Series([1001, 1002, np.nan, 1005, 9999])
+        self.assertEqual(list(logins.isin(column)), [False, True, False, True, False])
+
+    def test_empty_set(self):
+        self.assertEqual(list(LoginSet().isin([1, 2])), [False, False])
+
+    def test_invalid_logins_never_match(self):
+        self.assertEqual(list(to_login_array(['x', '', 12.0])), [-1, -1, 12])
+
+    def test_coerce_keeps_existing_instance(self):
+        logins = LoginSet([1])
+        self.assertIs(LoginSet.coerce(logins), logins)
+        self.assertIsInstance(LoginSet.coerce({'1'}), LoginSet)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from sqlalchemy import event
+
+from app import db
+from app.models import User, Role
+from tests.base import AppTestCase
+
+
+class TestUserCache(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.statements = []
+        with self.app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def test_authenticated_views_reuse_cached_user(self):
+        """Only the first page view after login loads the user, with its role joined in."""
+        client = self.app.test_client()
+        self.login(client)
+        self.statements.clear()
+
+        client.get('/dashboard')
+        self.assertEqual(len(self.statements), 1)
+        self.assertIn('JOIN roles', self.statements[0])
+
+        self.statements.clear()
+        client.get('/dashboard')
+        client.get('/upload')
+        self.assertEqual(self.statements, [])
+
+    def test_role_change_invalidates_cache(self):
+        client = self.app.test_client()
+        self.login(client)
+        self.assertEqual(client.get('/admin').status_code, 302)
+
+        with self.app.app_context():
+            owner = Role(name='Owner')
+            db.session.add(owner)
+            user = db.session.get(User, self.user_id)
+            user.role = owner
+            db.session.commit()
+
+        self.assertEqual(client.get('/admin').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from app.money import to_units, from_units, unit_of, divide_units, quantize
+from app.processing import aggregate_book
+
+
+class TestFixedPointMoney(unittest.TestCase):
+
+    def test_unit_conversions(self):
+        self.assertEqual(list(to_units(pd.Series([0.1, -2.00005, np.nan]))), [1000, -20000, 0])
+        self.assertEqual(unit_of('12.3456'), 123456)
+        self.assertEqual(unit_of('bad'), 0)
+        self.assertEqual(from_units(123456), 12.3456)
+
+    def test_rounding_is_half_even(self):
+        self.assertEqual(divide_units(5, 10), 0)
+        self.assertEqual(divide_units(15, 10), 2)
+        self.assertEqual(quantize('-55.00', 100), '-0.5500')
+        self.assertEqual(quantize('0.005', 100), '0.0000')
+
+    def test_book_totals_are_exact(self):
+        rng = np.random.default_rng(7)
+        amounts = [f"{v:.2f}" for v in rng.uniform(-1e6, 1e6, 5000)]
+        df = pd.DataFrame({
+            'Login': rng.integers(1000, 1100, 5000),
+            'Notional volume in USD': amounts, 'Trader profit': amounts, 'Swaps': '0',
+            'Commission': '0', 'TP broker profit': '0', 'Total broker profit': '0',
+        })
+        result = aggregate_book(df, set(), 'A Book', fixed_point=True)
+        expected = sum(Decimal(a) for a in amounts)
+        self.assertEqual(Decimal(str(result.iloc[-1]['Total Volume'])), expected)
+        self.assertEqual(Decimal(str(result.iloc[-1]['Net'])), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import io
+import unittest
+
+from app import db
+from app.models import Role, User, Payment
+from app.payments import read_export, parse_m2p, import_payments, ledger_counts
+from tests.base import AppTestCase
+
+M2P_CSV = (
+    "﻿Booked,Confirmed,Status,Type,Payment ID,Transaction ID,Payment gateway,Wallet address,Trading account,"
+    "Price,Final amount,Final currency,Transaction amount,Transaction currency,Settlement amount,"
+    "Settlement currency,Processing fee,Tier fee,Total fee,Balance after,Comment\n"
+    "2025-08-01T08:56:00Z,2025-08-01T08:55:52Z,DONE,DEPOSIT,p1,tx1,USDT BEP20,0xabc,9c2lng87,1,800,USB,800,USB,800,USB,0,5.6,5.6,1221.14,\n"
+    "2025-08-01T09:00:00Z,2025-08-01T09:00:00+02:00,done,DEPOSIT,p2,tx2,Settlement USDT,0xdef,acc2,1,\"1,200\",USB,\"1,200\",USB,1200,USB,0,0,0,0,\n"
+    "2025-08-03T10:44:40Z,2025-08-03T10:44:40Z,DONE,WITHDRAW,p3,tx3,USDT TRC20,TWb,ja8eygpu,1,100,USX,100,USX,100,USX,0,2.5,2.5,2509.38,\n"
+    "2025-08-03T10:44:40Z,2025-08-03T10:44:40Z,DONE,WITHDRAW,p4,tx4,Balance,,acc4,1,5,USX,5,USX,5,USX,0,0,0,0,\n"
+    "2025-08-03T10:44:40Z,2025-08-03T10:44:40Z,PENDING,DEPOSIT,p5,tx5,USDT TRC20,,acc5,1,5,USX,5,USX,5,USX,0,0,0,0,\n"
+    "2025-08-03T10:44:40Z,2025-08-03T10:44:40Z,DONE,DEPOSIT,p6, ,USDT TRC20,,acc6,1,5,USX,5,USX,5,USX,0,0,0,0,\n"
+    "2025-08-01T08:56:00Z,2025-08-01T08:55:52Z,DONE,DEPOSIT,p1,tx1,USDT BEP20,0xabc,9c2lng87,1,800,USB,800,USB,800,USB,0,5.6,5.6,1221.14,\n"
+)
+
+
+def m2p_export(text=M2P_CSV):
+    return read_export(io.BytesIO(text.encode()))
+
+
+class TestM2PParsing(unittest.TestCase):
+
+    def test_routes_done_transactions_to_ledgers(self):
+        rows = parse_m2p(m2p_export())
+        self.assertEqual(list(rows['transaction_id']), ['tx1', 'tx2', 'tx3', 'tx1'])
+        self.assertEqual(list(zip(rows['type'], rows['channel'])),
+                         [('DEPOSIT', 'M2p'), ('DEPOSIT', 'Settlement'), ('WITHDRAW', 'M2p'), ('DEPOSIT', 'M2p')])
+        self.assertEqual(list(rows['amount']), [800.0, 1200.0, 100.0, 800.0])
+        self.assertEqual(str(rows['confirmed'].iloc[1]), '2025-08-01 07:00:00')
+        self.assertIsNone(rows['comment'].iloc[0])
+
+    def test_missing_columns(self):
+        with self.assertRaises(ValueError):
+            parse_m2p(read_export(io.BytesIO(b'Transaction ID,Status\ntx1,DONE\n')))
+
+
+class TestPaymentImport(AppTestCase):
+
+    def test_import_skips_known_transactions(self):
+        with self.app.app_context():
+            added = import_payments(m2p_export())
+            self.assertEqual(added, {'M2p Deposit': 1, 'Settlement Deposit': 1,
+                                     'M2p Withdraw': 1, 'Settlement Withdraw': 0})
+            again = import_payments(m2p_export())
+            self.assertEqual(sum(again.values()), 0)
+            self.assertEqual(Payment.query.count(), 3)
+            self.assertEqual(ledger_counts()['M2p Deposit'], 1)
+            self.assertEqual(Payment.query.filter_by(transaction_id='tx1').one().tier_fee, 5.6)
+
+    def test_admin_imports_from_treasury_page(self):
+        with self.app.app_context():
+            admin_role = Role(name='Admin')
+            admin = User(username='admin', email='admin@example.com', role=admin_role)
+            admin.set_password('Secret123!')
+            db.session.add_all([admin_role, admin])
+            db.session.commit()
+        client = self.app.test_client()
+        self.login(client, 'admin')
+        response = client.post('/treasury', data={
+            'kind': 'm2p', 'export_csv': (io.BytesIO(M2P_CSV.encode()), 'm2p.csv'),
+        }, content_type='multipart/form-data', follow_redirects=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'M2p Deposit 1', response.data)
+
+        response = client.post('/treasury', data={
+            'kind': 'm2p', 'export_csv': (io.BytesIO(b'Booked,Status\nx,DONE\n'), 'bad.csv'),
+        }, content_type='multipart/form-data', follow_redirects=True)
+        self.assertIn(b'Missing required column', response.data)
+
+    def test_viewer_cannot_open_treasury(self):
+        client = self.app.test_client()
+        self.login(client)
+        self.assertEqual(client.get('/treasury').status_code, 302)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import io
+import unittest
+
+import numpy as np
+import pandas as pd
+from reportlab.platypus import LongTable
+
+from app.pdf import format_cells, summary_view, table_flowables, write_pdf_report
+from tests.base import AppTestCase
+from tests.test_storage import DEALS_CSV
+
+
+def _book(rows):
+    df = pd.DataFrame({
+        'Login': [str(1000 + i) for i in range(rows)],
+        'Total Volume': np.arange(rows, dtype=float) + 0.123456,
+        'Net': np.full(rows, np.nan),
+    })
+    return pd.concat([df, pd.DataFrame([{'Login': 'Summary', 'Total Volume': 1.5, 'Net': 0.0}])],
+                     ignore_index=True)
+
+
+class TestPdfEngine(unittest.TestCase):
+
+    def test_format_cells(self):
+        text = format_cells(_book(1))
+        self.assertEqual(text.to_numpy().tolist(), [['1000', '0.1235', ''], ['Summary', '1.5', '0.0']])
+
+    def test_long_tables_are_chunked_with_repeated_header(self):
+        tables = table_flowables(_book(25), available_width=500, chunk_rows=10)
+        self.assertEqual(len(tables), 3)
+        self.assertTrue(all(isinstance(t, LongTable) and t.repeatRows == 1 for t in tables))
+        self.assertEqual([len(t._cellvalues) for t in tables], [11, 11, 7])
+        self.assertEqual(tables[1]._cellvalues[0][0], 'Login')
+
+    def test_summary_view(self):
+        df, caption = summary_view(_book(25))
+        self.assertEqual(list(df['Login']), ['Summary'])
+        self.assertEqual(caption, 'Totals over 25 logins')
+
+    def test_summary_mode_is_shorter(self):
+        tables = {'Final Calculations': pd.DataFrame({'Source': ['A Book'], 'Value': [1.0]}),
+                  'A Book Result': _book(3000)}
+        full, summary = io.BytesIO(), io.BytesIO()
+        write_pdf_report(tables, full, mode='full')
+        write_pdf_report(tables, summary, mode='summary')
+        self.assertTrue(full.getvalue().startswith(b'%PDF'))
+        self.assertGreater(full.getvalue().count(b'/Type /Page\n'), 10)
+        self.assertEqual(summary.getvalue().count(b'/Type /Page\n'), 1)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            write_pdf_report({}, io.BytesIO(), mode='brief')
+
+
+class TestPdfRoute(AppTestCase):
+
+    def test_download_pdf(self):
+        client = self.app.test_client()
+        self.login(client)
+        client.post('/upload', data={'deals_csv': (io.BytesIO(DEALS_CSV.encode()), 'deals.csv')},
+                    content_type='multipart/form-data')
+        response = client.get('/report/pdf?mode=full')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/pdf')
+        self.assertTrue(response.data.startswith(b'%PDF'))
+        self.assertEqual(client.get('/report/pdf?mode=brief').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import pandas as pd
-from app.processing import run_report_processing, aggregate_book, generate_final_calculations
+from app.processing import (run_report_processing, aggregate_book, generate_final_calculations, compute_segments,
+                            generate_client_summary, sanitize_numeric_series)
 
 class TestReportProcessing(unittest.TestCase):
 
@@ -110,5 +111,70 @@ class TestReportProcessing(unittest.TestCase):
         # There should be 2 rows: user 1003 and the Summary row
         self.assertEqual(len(agg_result), 2)
 
+    def test_segment_lots(self):
+        """Chinese and VIP lots are taken out of the retail lots."""
+        results = run_report_processing(self.deals_df, self.excluded_df, self.vip_df)
+        final_calcs = results['Final Calculations'].set_index('Source')['Value']
+        # Chinese: 20000 + 25000 + 8000 = 53000; VIP (1002): 20000 + 8000 = 28000
+        self.assertAlmostEqual(float(final_calcs['Chinese Clients']), 0.265)
+        self.assertAlmostEqual(float(final_calcs['VIP Clients']), 0.14)
+        self.assertAlmostEqual(float(final_calcs['Retail Clients']), 0.26)
+        self.assertEqual(list(results['Chinese Clients']['Login']), ['1002', '1004', 'Summary'])
+
+    def test_custom_segments_in_one_pass(self):
+        """Declarative segments combine group, login list and book rules."""
+        books = {
+            'A Book': self.deals_df[self.deals_df['Processing rule'] == 'Pipwise'],
+            'B Book': self.deals_df[self.deals_df['Processing rule'] == 'Retail B-book'],
+        }
+        segments = {
+            'B Book Chinese': {'groups': 'Chinese', 'books': ['B Book'], 'table': True},
+            'Bonus': {'logins': 'bonus'},
+        }
+        tables, volumes = compute_segments(books, {'1005'}, {'bonus': [1001, 1005]}, segments)
+        self.assertEqual(volumes, {'B Book Chinese': 25000.0, 'Bonus': 10000.0})
+        self.assertEqual(list(tables['B Book Chinese']['Login']), ['1004', 'Summary'])
+        self.assertNotIn('Bonus', tables)
+
+    def test_client_summary_breakdown_and_top_n(self):
+        """The client summary merges books and can add per-book columns and a top-N cut."""
+        results = run_report_processing(self.deals_df, self.excluded_df, self.vip_df)
+        books = {name: results[f'{name} Result'] for name in ['A Book', 'B Book', 'Multi Book']}
+        summary = generate_client_summary(books, breakdown=['Total Volume'], top_n=2)
+        # 1005 has 50000 in A Book; 1001 has 10000 in A Book and 5000 in Multi Book
+        self.assertEqual(list(summary['Login']), ['1005', '1002', 'Summary'])
+        self.assertEqual(list(summary.columns[-3:]),
+                         ['A Book Total Volume', 'B Book Total Volume', 'Multi Book Total Volume'])
+        self.assertEqual(float(summary.iloc[-1]['Total Volume']), 78000.0)
+
+        full = results['Client Summary'].set_index('Login')
+        self.assertEqual(float(full.loc['1001', 'Total Volume']), 15000.0)
+        self.assertEqual(float(full.loc['Summary', 'Total Volume']), 133000.0)
+
+    def test_fixed_point_mode(self):
+        """Fixed-point money gives the same figures, and the lot lines add up exactly."""
+        results = run_report_processing(self.deals_df, self.excluded_df, self.vip_df, fixed_point=True)
+        final_calcs = results['Final Calculations'].set_index('Source')['Value']
+        self.assertEqual(final_calcs['Total A Book'], 162.0)
+        self.assertEqual(final_calcs['Total B Book'], -110.0)
+        self.assertEqual(final_calcs['Retail Clients'] + final_calcs['Chinese Clients'] + final_calcs['VIP Clients'],
+                         final_calcs['Total Volume'])
+        self.assertIn('-0.5500 USD', list(results['A Book Raw']['Profit']))
+
+    def test_sanitize_numeric_series(self):
+        """Clean columns take the fast path; only unparseable values are regex-cleaned and counted."""
+        clean = pd.Series([1.5, 2.0])
+        self.assertIs(sanitize_numeric_series(clean), clean)
+
+        coercions = {}
+        dirty = pd.Series(['10', ' 2.5 ', '$1,000', '', None, '105.00 USD'], name='Swaps')
+        result = sanitize_numeric_series(dirty, coercions)
+        self.assertEqual(list(result), [10.0, 2.5, 1000.0, 0.0, 0.0, 105.0])
+        self.assertEqual(coercions, {'Swaps': 4})
+
+        ints = sanitize_numeric_series(pd.Series([1, 2], name='Swaps'), coercions)
+        self.assertEqual(ints.dtype, 'float64')
+        self.assertEqual(coercions, {'Swaps': 4})
+
 if __name__ == '__main__':
     unittest.main()
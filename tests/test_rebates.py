@@ -0,0 +1,84 @@
+import io
+import unittest
+from datetime import date
+
+from app import db
+from app.models import Role, User, IBRebate, IBRebateDaily
+from app.payments import read_export
+from app.rebates import parse_rebates, import_rebates, total_rebate, rebates_by_ib, rebate_period
+from tests.base import AppTestCase
+
+HEADER = ("Platform,Order ID,Account ID,Volume,Symbol,Swaps,Commission,Profit,Trader,Receiver,Rebate Platform,"
+          "Rebate Account,Rebate Rules,Commission Parameter,Formula,Currency,Rebate,Open Time,Close Time,"
+          "Rebate Time,Status,Failure Reason,Transaction ID\n")
+
+
+def rebate_row(order, receiver, account, symbol, volume, rebate, when, tx):
+    return (f"mt5,{order},30116,{volume},{symbol},0,0,1,Trader(t),{receiver},Wallet,{account},Rule,5,f,USD,"
+            f"{rebate},{when},{when},{when},Success,,{tx}\n")
+
+
+FIRST = HEADER + (
+    rebate_row(1, 'Shayan(ja8)', 'y4', 'EURUSD', 0.1, 0.6, '2025-08-01 14:43:46', 'tx1')
+    + rebate_row(2, 'Shayan(ja8)', 'y4', 'EURUSD', 0.2, 1.2, '2025-08-01 15:00:00', 'tx2')
+    + rebate_row(3, 'Mina(ab1)', 'z9', 'XAUUSD', 0.01, 0.05, '2025-08-02 09:00:00', '')
+    + rebate_row(4, 'Mina(ab1)', 'z9', 'XAUUSD', 0.01, 0.05, 'not a date', 'tx4')
+)
+SECOND = HEADER + (
+    rebate_row(2, 'Shayan(ja8)', 'y4', 'EURUSD', 0.2, 1.2, '2025-08-01 15:00:00', 'tx2')
+    + rebate_row(5, 'Shayan(ja8)', 'y4', 'EURUSD', 0.5, 3.0, '2025-08-01 20:00:00', 'tx5')
+    + rebate_row(6, 'Mina(ab1)', 'z9', 'BTCUSD', 1, 2.0, '2025-08-03 10:00:00', 'tx6')
+)
+
+
+def export(text):
+    return read_export(io.BytesIO(text.encode()))
+
+
+class TestRebateParsing(unittest.TestCase):
+
+    def test_keys_and_invalid_rows(self):
+        rows = parse_rebates(export(FIRST))
+        self.assertEqual(list(rows['rebate_key']), ['tx1', 'tx2', 'order:3:z9'])
+        self.assertIsNone(rows['transaction_id'].iloc[2])
+        self.assertAlmostEqual(rows['rebate'].sum(), 1.85)
+
+
+class TestRebateImport(AppTestCase):
+
+    def test_aggregates_follow_imports(self):
+        with self.app.app_context():
+            self.assertEqual(import_rebates(export(FIRST)), 3)
+            self.assertEqual(import_rebates(export(SECOND)), 2)
+            self.assertEqual(IBRebate.query.count(), 5)
+
+            # The daily totals agree with a full scan of the rebates
+            self.assertAlmostEqual(total_rebate(), db.session.query(db.func.sum(IBRebate.rebate)).scalar())
+            day = db.session.get(IBRebateDaily, (date(2025, 8, 1), 'Shayan(ja8)', 'y4', 'EURUSD'))
+            self.assertEqual((round(day.rebate, 4), round(day.volume, 4), day.rebate_count), (4.8, 0.8, 3))
+
+            self.assertAlmostEqual(total_rebate(start=date(2025, 8, 2)), 2.05)
+            by_ib = rebates_by_ib(end=date(2025, 8, 2))
+            self.assertEqual(list(by_ib['Receiver']), ['Shayan(ja8)', 'Mina(ab1)'])
+            self.assertEqual(list(by_ib['Rebates']), [3, 1])
+            first, last = rebate_period()
+            self.assertEqual((str(first), str(last)), ('2025-08-01 14:43:46', '2025-08-03 10:00:00'))
+
+    def test_import_from_treasury_page(self):
+        with self.app.app_context():
+            owner_role = Role(name='Owner')
+            owner = User(username='owner', email='owner@example.com', role=owner_role)
+            owner.set_password('Secret123!')
+            db.session.add_all([owner_role, owner])
+            db.session.commit()
+        client = self.app.test_client()
+        self.login(client, 'owner')
+        response = client.post('/treasury', data={
+            'kind': 'ib_rebate', 'export_csv': (io.BytesIO(FIRST.encode()), 'ib rebate.csv'),
+        }, content_type='multipart/form-data', follow_redirects=True)
+        self.assertIn(b'IB Rebate 3', response.data)
+        self.assertIn(b'Report from 2025-08-01 to 2025-08-02', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
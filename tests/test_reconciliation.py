@@ -0,0 +1,209 @@
+import io
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from app import db
+from app.models import Role, User, Payment, CRMDeposit
+from app.crm import (split_amount, split_net_amount, parse_crm_deposits, import_crm_deposits,
+                     parse_crm_withdrawals, import_crm_withdrawals)
+from app.payments import read_export, import_payments
+from app.reconciliation import (DISCREPANCY_COLUMNS, window_join, match_requests, reconcile_deposits,
+                                reconcile_withdrawals, resolve_discrepancies)
+from tests.base import AppTestCase
+from tests.test_payments import m2p_export
+
+CRM_DEPOSIT_CSV = (
+    "﻿Request ID,Client ID,Name,Client Type,Email,Phone Number,Referrer,Request Type,Trading Account,"
+    "Payment Method,Trading Amount,Payment Amount,Request Time,Status\n"
+    "dsthzg4p,9C2LNG87,Hadi,trader,h@example.com,+90 1,,Deposit,Wallet,Tether,USD 800,USDT BEP20 800,2025-08-01 12:21:29,Approved\n"
+    "n6xpniuy,kkti6g1t,Behnam,trader,b@example.com,+98 1,,Deposit,Wallet,Tether,USC 1000,USDT BEP20 10,2025-08-04 12:56:25,Approved\n"
+    "tc000001,kkti6g1t,Behnam,trader,b@example.com,+98 1,,Deposit,Wallet,TopChange,\"USD 1,500\",IRT 1,2025-08-04 13:00:00,Approved\n"
+    ",nobody,,trader,,,,Deposit,Wallet,Tether,USD 5,,2025-08-04 13:00:00,Approved\n"
+)
+
+CRM_WITHDRAWAL_CSV = (
+    "﻿Request ID,Client ID,Name,Client Type,Email,Phone Number,Referrer,Request Type,Trading Account,"
+    "Withdrawal Method,Withdrawal Amount,Net Withdrawal Amount,Review Time,Status\n"
+    "8k42rppo,ja8eygpu,Shayan,ib,s@example.com,+98 1,,Withdrawal,Wallet,USDT,USD 100,USDT TRC20 100,2025-08-03 14:13:29,Approved\n"
+    "68die13l,kkti6g1t,Behnam,trader,b@example.com,+98 1,,Withdrawal,Wallet,USDT,USC 1500,USDT BEP20 12,2025-07-31 09:26:53,Approved\n"
+    "w3,abc,Sara,trader,a@example.com,+98 1,,Withdrawal,Wallet,USDT,USD 40,,2025-08-02 10:00:00,Approved\n"
+)
+
+
+def crm_export(text=CRM_DEPOSIT_CSV):
+    return read_export(io.BytesIO(text.encode()))
+
+
+class TestCRMParsing(unittest.TestCase):
+
+    def test_amount_units(self):
+        unit, amount = split_amount(pd.Series(['USD 1,000', 'USC 1500', '', 'USDT TRC20 15']))
+        self.assertEqual(list(unit), ['USD', 'USC', '', 'USDT'])
+        self.assertEqual(list(amount), [1000.0, 15.0, 0.0, 20.0])
+
+    def test_rows_need_a_request_id(self):
+        rows = parse_crm_deposits(crm_export())
+        self.assertEqual(list(rows['request_id']), ['dsthzg4p', 'n6xpniuy', 'tc000001'])
+        self.assertEqual(list(rows['amount']), [800.0, 10.0, 1500.0])
+
+    def test_withdrawal_amounts(self):
+        currency, amount = split_net_amount(pd.Series(['USDT TRC20 15', 'USD 10', 'USC 250', '']))
+        self.assertEqual(list(currency[:3]), ['USDT TRC20', 'USD', 'USC'])
+        self.assertEqual(list(amount[:3]), [15.0, 10.0, 2.5])
+        self.assertTrue(np.isnan(amount[3]))
+
+        rows = parse_crm_withdrawals(crm_export(CRM_WITHDRAWAL_CSV))
+        self.assertEqual(list(rows['amount']), [100.0, 15.0, 40.0])
+        self.assertEqual(list(rows['net_amount'][:2]), [100.0, 12.0])
+        self.assertTrue(pd.isna(rows['net_amount'].iloc[2]))
+
+
+class TestWindowJoin(unittest.TestCase):
+
+    def test_agrees_with_pairwise_comparison(self):
+        rng = np.random.default_rng(7)
+        n = 400
+        start = np.datetime64('2025-08-01T00:00:00', 'ns')
+        left = (rng.integers(0, 20, n), start + rng.integers(0, 3 * 86400, n).astype('timedelta64[s]'),
+                rng.integers(1, 40, n).astype(float))
+        right = (rng.integers(-1, 20, n), start + rng.integers(0, 3 * 86400, n).astype('timedelta64[s]'),
+                 rng.integers(1, 40, n) + rng.choice([0, 0.5, 2.0], n))
+        left[1][:5] = np.datetime64('NaT')
+        window = pd.Timedelta(hours=3.5)
+
+        left_hit, right_hit = window_join(*left, *right, window, 1.0)
+
+        pairs = ((left[0][:, None] == right[0][None, :])
+                 & (np.abs(left[1][:, None] - right[1][None, :]) <= window.to_timedelta64())
+                 & (np.abs(left[2][:, None] - right[2][None, :]) <= 1.0))
+        np.testing.assert_array_equal(left_hit, pairs.any(axis=1))
+        np.testing.assert_array_equal(right_hit, pairs.any(axis=0))
+        self.assertFalse(left_hit[:5].any())
+
+    def test_trading_account_containing_client_id(self):
+        crm = pd.DataFrame({'client_id': ['abc12345', 'zzz'], 'amount': [100.0, 100.0],
+                            'time': pd.to_datetime(['2025-08-01 12:00', '2025-08-01 12:00'])})
+        m2p = pd.DataFrame({'trading_account': ['mt5 - ABC12345 - 30148', 'other'], 'amount': [100.5, 100.0],
+                            'time': pd.to_datetime(['2025-08-01 09:00', '2025-08-01 12:00'])})
+        crm_hit, m2p_hit = match_requests(crm, m2p, pd.Timedelta(hours=3.5), 1.0)
+        self.assertEqual(list(crm_hit), [True, False])
+        self.assertEqual(list(m2p_hit), [True, False])
+
+    def test_any_amount_column_matches(self):
+        crm = pd.DataFrame({'client_id': ['a1', 'b2'], 'amount': [15.0, 15.0], 'net_amount': [12.0, np.nan],
+                            'time': pd.to_datetime(['2025-08-01 12:00', '2025-08-01 12:00'])})
+        payouts = pd.DataFrame({'trading_account': ['a1', 'b2'], 'amount': [12.0, 12.0],
+                                'time': pd.to_datetime(['2025-08-01 12:00', '2025-08-01 12:00'])})
+        crm_hit, payout_hit = match_requests(crm, payouts, pd.Timedelta(hours=3.5), 1.0,
+                                             amount_columns=('amount', 'net_amount'))
+        self.assertEqual(list(crm_hit), [True, False])
+        self.assertEqual(list(payout_hit), [True, False])
+
+
+class TestReconciliation(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.app.app_context():
+            import_payments(m2p_export())
+            db.session.add(Payment(transaction_id='tx9', type='DEPOSIT', channel='M2p', trading_account='zz9',
+                                   amount=50.0, confirmed=datetime(2025, 8, 5, 10, 0)))
+            db.session.commit()
+            self.assertEqual(import_crm_deposits(crm_export()), 3)
+            self.assertEqual(import_crm_deposits(crm_export()), 0)
+
+    def test_unmatched_records(self):
+        with self.app.app_context():
+            self.assertEqual(CRMDeposit.query.count(), 3)
+            df = reconcile_deposits()
+        self.assertEqual(list(df.columns), DISCREPANCY_COLUMNS)
+        # dsthzg4p matches tx1 3h25m apart; TopChange requests are not paid through M2P
+        self.assertEqual(df.values.tolist(), [
+            ['CRM Deposit', '2025-08-04', 'kkti6g1t', '', 10.0, 'Behnam', '', 'n6xpniuy'],
+            ['M2p Deposit', '2025-08-05', '', 'zz9', 50.0, '', '', 'tx9'],
+        ])
+
+    def test_date_range(self):
+        with self.app.app_context():
+            df = reconcile_deposits(datetime(2025, 8, 1), datetime(2025, 8, 5))
+            self.assertEqual(list(df['Record ID']), ['n6xpniuy'])
+            # tx1's CRM request lies outside the range but still counts as its counterpart
+            self.assertTrue(reconcile_deposits(datetime(2025, 8, 1), datetime(2025, 8, 1, 12)).empty)
+
+    def test_withdrawals(self):
+        with self.app.app_context():
+            self.assertEqual(import_crm_withdrawals(crm_export(CRM_WITHDRAWAL_CSV)), 3)
+            db.session.add_all([
+                Payment(transaction_id='s1', type='WITHDRAW', channel='Settlement', trading_account='kkti6g1t',
+                        amount=12.0, confirmed=datetime(2025, 7, 31, 6, 0)),
+                Payment(transaction_id='s2', type='WITHDRAW', channel='Settlement', trading_account='qq1',
+                        amount=70.0, confirmed=datetime(2025, 8, 2, 6, 0)),
+            ])
+            db.session.commit()
+            df = reconcile_withdrawals()
+        # 8k42rppo is paid by M2P tx3, 68die13l by s1 (its USDT net amount)
+        self.assertEqual(df.values.tolist(), [
+            ['CRM Withdrawal', '2025-08-02', 'abc', '', 40.0, 'Sara', '', 'w3'],
+            ['Settlement Withdraw', '2025-08-02', '', 'qq1', 70.0, '', '', 's2'],
+        ])
+
+    def test_resolved_records_are_skipped(self):
+        with self.app.app_context():
+            self.assertEqual(resolve_discrepancies([('CRM Deposit', 'n6xpniuy'), ('M2p Deposit', 'tx9')]), 2)
+            self.assertEqual(resolve_discrepancies([('CRM Deposit', 'n6xpniuy')]), 0)
+            self.assertTrue(reconcile_deposits().empty)
+            self.assertIsNotNone(db.session.scalar(db.select(Payment.resolved_at).filter_by(transaction_id='tx9')))
+
+            # A resolved record no longer counts as a counterpart either
+            resolve_discrepancies([('M2p Deposit', 'tx1')])
+            self.assertEqual(list(reconcile_deposits()['Record ID']), ['dsthzg4p'])
+
+            with self.assertRaises(ValueError):
+                resolve_discrepancies([('Bank', 'x')])
+
+    def _admin_client(self):
+        with self.app.app_context():
+            admin_role = Role(name='Admin')
+            admin = User(username='admin', email='admin@example.com', role=admin_role)
+            admin.set_password('Secret123!')
+            db.session.add_all([admin_role, admin])
+            db.session.commit()
+        client = self.app.test_client()
+        self.login(client, 'admin')
+        return client
+
+    def test_confirm_on_page_and_from_sheet(self):
+        client = self._admin_client()
+        response = client.post('/treasury/discrepancies/deposits', data={'confirm': ['CRM Deposit:n6xpniuy']},
+                               follow_redirects=True)
+        self.assertIn(b'1 discrepancy confirmed', response.data)
+        self.assertNotIn(b'n6xpniuy', response.data)
+
+        sheet = client.get('/treasury/discrepancies/deposits?format=csv').get_data(as_text=True)
+        sheet = sheet.replace(',,,tx9', ',,Y,tx9')
+        response = client.post('/treasury/discrepancies/deposits', data={
+            'sheet_csv': (io.BytesIO(sheet.encode()), 'deposit-discrepancies.csv'),
+        }, content_type='multipart/form-data', follow_redirects=True)
+        self.assertIn(b'1 discrepancy confirmed', response.data)
+        self.assertIn('✅ All rows matched', response.get_data(as_text=True))
+
+    def test_discrepancy_page_and_download(self):
+        client = self._admin_client()
+
+        response = client.get('/treasury/discrepancies/deposits')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'n6xpniuy', response.data)
+        self.assertIn(b'2 records without a counterpart', response.data)
+
+        response = client.get('/treasury/discrepancies/deposits?start=2025-08-05&end=2025-08-05&format=csv')
+        self.assertEqual(response.status_code, 200)
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(lines[1:], ['M2p Deposit,2025-08-05,,zz9,50.0,,,tx9'])
+        self.assertEqual(client.get('/treasury/discrepancies/other').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
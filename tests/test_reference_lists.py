@@ -0,0 +1,123 @@
+import hashlib
+import io
+import unittest
+from unittest import mock
+
+from app import db
+from app.models import Role, User, Log, ReferenceList, ReferenceListEntry
+from app import reference_lists
+from app.reference_lists import import_reference_list, get_login_set, clear_cache
+from tests.base import AppTestCase
+from tests.test_storage import DEALS_CSV
+
+
+class TestReferenceLists(AppTestCase):
+
+    def test_import_creates_new_versions(self):
+        with self.app.app_context():
+            first = import_reference_list('excluded', ['1005', '1006', 'bad', '1005'])
+            second = import_reference_list('excluded', [2001])
+            self.assertEqual((first.version, first.entry_count), (1, 2))
+            self.assertEqual(second.version, 2)
+            self.assertEqual(ReferenceList.query.filter_by(name='excluded').one().current_version, 2)
+            self.assertEqual(ReferenceListEntry.query.count(), 3)
+
+            clear_cache()
+            old, version = get_login_set('excluded', 1)
+            self.assertEqual((sorted(old), version), (['1005', '1006'], 1))
+            current, version = get_login_set('excluded')
+            self.assertEqual((list(current), version), (['2001'], 2))
+
+    def test_same_source_reuses_current_version(self):
+        with self.app.app_context():
+            first = import_reference_list('vip', [1002], source_digest='abc')
+            again = import_reference_list('vip', [1002], source_digest='abc')
+            self.assertEqual(again.id, first.id)
+
+    def test_colliding_version_number_is_retried(self):
+        with self.app.app_context():
+            import_reference_list('vip', [1002])
+            # A concurrent import took the next number between reading and inserting
+            with mock.patch.object(reference_lists, '_next_version', side_effect=[1, 2]) as taken:
+                version = import_reference_list('vip', [1003])
+            self.assertEqual((version.version, taken.call_count), (2, 2))
+            self.assertEqual(ReferenceList.query.filter_by(name='vip').one().current_version, 2)
+            self.assertEqual(list(get_login_set('vip')[0]), ['1003'])
+
+    def test_loaded_sets_are_cached(self):
+        with self.app.app_context():
+            import_reference_list('vip', [1002])
+            clear_cache()
+            first, _ = get_login_set('vip')
+            self.assertIs(get_login_set('vip')[0], first)
+
+    def test_unknown_list_is_empty(self):
+        with self.app.app_context():
+            login_set, version = get_login_set('welcome_bonus')
+            self.assertEqual((len(login_set), version), (0, None))
+            with self.assertRaises(ValueError):
+                import_reference_list('nope', [1])
+
+    def test_report_uses_stored_lists_when_upload_omits_them(self):
+        with self.app.app_context():
+            import_reference_list('excluded', [1001])
+        client = self.app.test_client()
+        self.login(client)
+        client.post('/upload', data={'deals_csv': (io.BytesIO(DEALS_CSV.encode()), 'deals.csv')},
+                    content_type='multipart/form-data')
+        response = client.get('/report/generate')
+        self.assertEqual(response.status_code, 200)
+        with self.app.app_context():
+            log = Log.query.filter_by(action='report_generated').one()
+            self.assertEqual(log.details, 'excluded v1, vip v0')
+
+    def test_uploaded_list_applies_to_the_uploaders_report_only(self):
+        with self.app.app_context():
+            import_reference_list('excluded', [1001])
+        client = self.app.test_client()
+        self.login(client)
+        client.post('/upload', data={
+            'deals_csv': (io.BytesIO(DEALS_CSV.encode()), 'deals.csv'),
+            'ex_csv': (io.BytesIO(b'1002\n'), 'excluded.csv'),
+        }, content_type='multipart/form-data')
+        with client.session_transaction() as sess:
+            self.assertEqual(sess['reference_versions'], {'excluded': 2, 'vip': None})
+        self.assertEqual(client.get('/report/generate').status_code, 200)
+        with self.app.app_context():
+            self.assertEqual(ReferenceList.query.filter_by(name='excluded').one().current_version, 1)
+            self.assertEqual(list(get_login_set('excluded')[0]), ['1001'])
+            self.assertEqual(Log.query.filter_by(action='report_generated').one().details, 'excluded v2, vip v0')
+
+            # Uploading the same file again reuses its version; the next published import follows it
+            digest = hashlib.sha256(b'1002\n').hexdigest()
+            self.assertEqual(import_reference_list('excluded', [1002], source_digest=digest,
+                                                   make_current=False).version, 2)
+            self.assertEqual(import_reference_list('excluded', [1003]).version, 3)
+
+    def test_admin_can_import_from_page(self):
+        with self.app.app_context():
+            admin_role = Role(name='Admin')
+            admin = User(username='admin', email='admin@example.com', role=admin_role)
+            admin.set_password('Secret123!')
+            db.session.add_all([admin_role, admin])
+            db.session.commit()
+        client = self.app.test_client()
+        self.login(client, 'admin')
+        response = client.post('/reference-lists', data={
+            'name': 'welcome_bonus',
+            'list_csv': (io.BytesIO(b'3001\n3002\n'), 'bonus.csv'),
+        }, content_type='multipart/form-data', follow_redirects=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'version 1', response.data)
+        with self.app.app_context():
+            self.assertEqual(sorted(get_login_set('welcome_bonus')[0]), ['3001', '3002'])
+
+    def test_viewer_cannot_manage_lists(self):
+        client = self.app.test_client()
+        self.login(client)
+        response = client.get('/reference-lists')
+        self.assertEqual(response.status_code, 302)
+
+
+if __name__ == '__main__':
+    unittest.main()
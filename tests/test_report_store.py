@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+from sqlalchemy import select, func
+
+from app.models import ReportRun, ReportClientResult, ReportCalculation
+from app.report_store import create_results_engine, report_run_key, save_report_results
+from config import Config
+
+
+class TestReportStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        config = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+        self.engine = create_results_engine(config, 'sqlite:///' + os.path.join(self.tmpdir.name, 'results', 'r.db'))
+        self.book = pd.DataFrame({
+            'Login': ['1001', '1002', 'Summary'],
+            'Total Volume': [100.0, 50.0, 150.0],
+            'Trader Profit': [1.0, None, 1.0],
+            'Swaps': [0.0, 0.0, 0.0], 'Commission': [2.0, 1.0, 3.0],
+            'TP Profit': [0.5, 0.5, 1.0], 'Broker Profit': [1.0, 1.0, 2.0], 'Net': [-1.0, -1.0, -2.0],
+        })
+        self.calculations = pd.DataFrame([
+            ['DATE RANGE', '', 'From a to b'],
+            ['A Book', 'Volume (Lot)', 1.25],
+            ['', '', ''],
+        ], columns=['Source', 'Description', 'Value'])
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmpdir.cleanup()
+
+    def _count(self, model):
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(model)).scalar()
+
+    def test_saves_one_run_once(self):
+        key = report_run_key('digest', '', '', '', '')
+        self.assertTrue(save_report_results(self.engine, key, {'A Book Result': self.book, 'Empty': pd.DataFrame()},
+                                            self.calculations, deals_digest='digest'))
+        self.assertFalse(save_report_results(self.engine, key, {'A Book Result': self.book}, self.calculations))
+
+        self.assertEqual(self._count(ReportRun), 1)
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(ReportClientResult.login, ReportClientResult.trader_profit)
+                                .order_by(ReportClientResult.login)).all()
+            calcs = conn.execute(select(ReportCalculation.source, ReportCalculation.value,
+                                        ReportCalculation.value_text)
+                                 .order_by(ReportCalculation.position)).all()
+        self.assertEqual(rows, [('1001', 1.0), ('1002', None)])
+        self.assertEqual(calcs, [('DATE RANGE', None, 'From a to b'), ('A Book', 1.25, None), ('', None, None)])
+
+    def test_batches_large_tables(self):
+        book = pd.DataFrame({'Login': [str(i) for i in range(25000)], 'Total Volume': 1.0})
+        save_report_results(self.engine, report_run_key('big'), {'B Book Result': book})
+        self.assertEqual(self._count(ReportClientResult), 25000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+import pandas as pd
+
+from app.segments import GroupClassifier, get_classifier
+
+
+class TestGroupClassifier(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = GroupClassifier({
+            'Chinese': {'prefixes': ['real\\Chines', 'BBOOK\\Chines']},
+            'Desk A': {'prefixes': ['real\\'], 'patterns': [r'-A$']},
+            'Region EU': {'patterns': [r'\\EU']},
+        })
+
+    def test_prefix_and_pattern_rules(self):
+        groups = pd.Series([' real\\Chines-2', 'BBOOK\\Retail-A', 'BBOOK\\EU', None, 'real\\EU'])
+        masks = self.classifier.classify(groups)
+        self.assertEqual(list(masks['Chinese']), [True, False, False, False, False])
+        self.assertEqual(list(masks['Desk A']), [True, True, False, False, True])
+        self.assertEqual(list(masks['Region EU']), [False, False, True, False, True])
+
+    def test_each_distinct_group_is_evaluated_once(self):
+        groups = pd.Series(['real\\Chines', 'real\\Retail'] * 1000)
+        self.classifier.classify(groups)
+        self.assertEqual(set(self.classifier._cache), {'real\\Chines', 'real\\Retail'})
+        self.assertEqual(self.classifier.segments_of('real\\Chines'), frozenset({'Chinese', 'Desk A'}))
+
+    def test_unknown_segment_and_empty_column(self):
+        self.assertEqual(list(self.classifier.mask(pd.Series(['real\\X']), 'Nope')), [False])
+        self.assertEqual(len(self.classifier.mask(pd.Series([], dtype=object), 'Chinese')), 0)
+
+    def test_shared_classifier_per_rule_set(self):
+        self.assertIs(get_classifier(), get_classifier(None))
+        self.assertIsNot(get_classifier({'X': {'prefixes': ['x']}}), get_classifier())
+
+
+if __name__ == '__main__':
+    unittest.main()
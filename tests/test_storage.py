@@ -0,0 +1,100 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+
+from app.storage import UploadStore
+from tests.base import AppTestCase
+
+DEALS_CSV = (
+    "Deal,Login,Group,Processing rule,Notional volume in USD,Trader profit,Swaps,Commission,"
+    "TP broker profit,Total broker profit,Date & Time (UTC),Profit\n"
+    "101,1001,real\\Retail,Pipwise,10000,100,10,5,50,50,01.01.2024 10:00:00,105.00 USD\n"
+    "102,1002,real\\Chines,Pipwise,20000,-50,5,10,60,60,01.01.2024 10:00:00,-55.00 USC\n"
+    "104,1003,BBOOK\\Retail,Retail B-book,15000,-30,-5,8,0,90,01.01.2024 10:00:00,-35.00 USD\n"
+)
+
+
+class TestUploadStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = UploadStore(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.store.save(io.BytesIO(b'1005\n'))
+        second = self.store.save(io.BytesIO(b'1005\n'))
+        other = self.store.save(io.BytesIO(b'1002\n'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(len(list(self.store._blobs())), 2)
+        with open(self.store.open(first), 'rb') as fh:
+            self.assertEqual(fh.read(), b'1005\n')
+
+    def test_cleanup_evicts_least_recently_used(self):
+        digests = [self.store.save(io.BytesIO(bytes([i]) * 100)) for i in range(3)]
+        for age, digest in enumerate(reversed(digests)):
+            stamp = time.time() - 100 * (age + 1)
+            os.utime(self.store.path_for(digest), (stamp, stamp))
+        # Touching the oldest blob makes it the most recently used.
+        self.store.open(digests[0])
+
+        removed = self.store.cleanup(max_bytes=200, keep={digests[1]})
+        self.assertEqual(removed, 1)
+        self.assertTrue(os.path.exists(self.store.path_for(digests[0])))
+        self.assertTrue(os.path.exists(self.store.path_for(digests[1])))
+        self.assertFalse(os.path.exists(self.store.path_for(digests[2])))
+
+    def test_cleanup_spares_recently_used_blobs(self):
+        old, recent = (self.store.save(io.BytesIO(bytes([i]) * 100)) for i in range(2))
+        stamp = time.time() - 3600
+        os.utime(self.store.path_for(old), (stamp, stamp))
+
+        # Another session read `recent` moments ago, so it stays even over the cap.
+        removed = self.store.cleanup(max_bytes=0, grace_seconds=600)
+        self.assertEqual(removed, 1)
+        self.assertFalse(os.path.exists(self.store.path_for(old)))
+        self.assertTrue(os.path.exists(self.store.path_for(recent)))
+
+
+class TestUploadWorkspaces(AppTestCase):
+
+    def upload(self, client, deals, excluded=b'1005\n', vip=b'1002\n'):
+        return client.post('/upload', data={
+            'deals_csv': (io.BytesIO(deals), 'deals.csv'),
+            'ex_csv': (io.BytesIO(excluded), 'excluded.csv'),
+            'vip_csv': (io.BytesIO(vip), 'vip.csv'),
+        }, content_type='multipart/form-data')
+
+    def test_sessions_keep_their_own_upload_sets(self):
+        from app import db
+        from app.models import User, Role
+        with self.app.app_context():
+            other = User(username='second', email='second@example.com',
+                         role=Role.query.filter_by(name='Viewer').first())
+            other.set_password('Secret123!')
+            db.session.add(other)
+            db.session.commit()
+
+        first, second = self.app.test_client(), self.app.test_client()
+        self.login(first)
+        self.login(second, 'second')
+        self.upload(first, DEALS_CSV.encode())
+        # The second analyst uploads a deals file with only the B Book deal.
+        b_only = DEALS_CSV.splitlines()[0] + "\n" + DEALS_CSV.splitlines()[3] + "\n"
+        self.upload(second, b_only.encode())
+
+        first_report = first.get('/report/generate')
+        second_report = second.get('/report/generate')
+        self.assertEqual(first_report.status_code, 200)
+        self.assertEqual(second_report.status_code, 200)
+        self.assertIn(b'1001', first_report.data)
+        self.assertNotIn(b'1001', second_report.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
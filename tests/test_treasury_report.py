@@ -0,0 +1,92 @@
+import unittest
+from datetime import date, datetime
+
+from app import db
+from app.models import Role, User, Payment, TreasuryDaily
+from app.crm import import_crm_deposits, import_crm_withdrawals
+from app.payments import import_payments
+from app.rebates import import_rebates
+from app.reference_lists import import_reference_list
+from app.treasury_report import FINAL_REPORT_LINES, final_report
+from tests.base import AppTestCase
+from tests.test_payments import M2P_CSV, m2p_export
+from tests.test_rebates import FIRST, export
+from tests.test_reconciliation import crm_export
+
+CRM_WITHDRAWAL_CSV = (
+    "Request ID,Client ID,Name,Client Type,Email,Phone Number,Referrer,Request Type,Trading Account,"
+    "Withdrawal Method,Withdrawal Amount,Net Withdrawal Amount,Review Time,Status\n"
+    "w1,abc,Sara,trader,a@example.com,,,Withdrawal,mt5 - Promo - 30148,USDT,USC 5000,USDT TRC20 50,2025-08-02 10:00:00,Approved\n"
+    "w2,def,Ali,trader,d@example.com,,,Withdrawal,Wallet,USDT,USD 100,USDT TRC20 100,2025-08-03 10:00:00,Approved\n"
+)
+
+
+class TestFinalReport(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.app.app_context():
+            import_payments(m2p_export())
+            import_rebates(export(FIRST))
+            import_crm_deposits(crm_export())
+            import_crm_withdrawals(crm_export(CRM_WITHDRAWAL_CSV))
+            import_reference_list('welcome_bonus', [30148, 4])
+
+    def test_totals(self):
+        with self.app.app_context():
+            lines, period = final_report()
+        self.assertEqual(list(lines), FINAL_REPORT_LINES)
+        expected = {
+            'Total Rebate': 1.85, 'M2p Deposit': 800.0, 'Settlement Deposit': 1200.0, 'M2p Withdrawal': 100.0,
+            'Settlement Withdrawal': 0.0, 'CRM Deposit Total': 2310.0, 'Tier Fee Deposit': 5.6,
+            'Tier Fee Withdraw': 2.5, 'Welcome Bonus Withdrawals': 50.0, 'CRM TopChange Total': 1500.0,
+            'CRM Withdraw Total': 150.0,
+        }
+        for line, value in expected.items():
+            self.assertAlmostEqual(lines[line], value, msg=line)
+        self.assertEqual(period, (datetime(2025, 8, 1, 7, 0), datetime(2025, 8, 4, 13, 0)))
+
+    def test_date_range_and_current_welcome_list(self):
+        with self.app.app_context():
+            lines, period = final_report(date(2025, 8, 1), date(2025, 8, 1))
+            self.assertAlmostEqual(lines['Total Rebate'], 1.8)
+            self.assertEqual((lines['M2p Deposit'], lines['Settlement Deposit']), (800.0, 1200.0))
+            self.assertEqual((lines['CRM Deposit Total'], lines['CRM Withdraw Total']), (800.0, 0.0))
+            self.assertEqual(period, (datetime(2025, 8, 1, 7, 0), datetime(2025, 8, 1, 15, 0)))
+
+            # Only the current version of the welcome bonus list counts
+            import_reference_list('welcome_bonus', [4])
+            self.assertEqual(final_report()[0]['Welcome Bonus Withdrawals'], 0.0)
+            self.assertEqual(final_report(date(2026, 1, 1))[1], (None, None))
+
+    def test_daily_totals_follow_imports(self):
+        later = M2P_CSV.replace('tx1,USDT BEP20', 'tx7,USDT BEP20').replace('2025-08-01T08:55:52Z', '2025-08-01T23:10:00Z')
+        with self.app.app_context():
+            import_payments(m2p_export(later))
+            import_payments(m2p_export(later))
+            day = db.session.get(TreasuryDaily, (date(2025, 8, 1), 'M2p Deposit'))
+            self.assertEqual((day.amount, day.record_count), (1600.0, 2))
+            self.assertEqual((day.first_time, day.last_time),
+                             (datetime(2025, 8, 1, 8, 55, 52), datetime(2025, 8, 1, 23, 10)))
+
+            lines, _ = final_report()
+            stored = db.session.query(db.func.sum(Payment.amount)).filter_by(type='DEPOSIT', channel='M2p').scalar()
+            self.assertEqual(lines['M2p Deposit'], stored)
+
+    def test_treasury_page(self):
+        with self.app.app_context():
+            admin_role = Role(name='Admin')
+            admin = User(username='admin', email='admin@example.com', role=admin_role)
+            admin.set_password('Secret123!')
+            db.session.add_all([admin_role, admin])
+            db.session.commit()
+        client = self.app.test_client()
+        self.login(client, 'admin')
+        response = client.get('/treasury?start=2025-08-01&end=2025-08-01')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'From 2025-08-01 07:00:00 to 2025-08-01 15:00:00', response.data)
+        self.assertIn(b'CRM TopChange Total', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
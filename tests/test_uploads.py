@@ -0,0 +1,134 @@
+import gzip
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+from app.processing import DEALS_REQUIRED_COLUMNS
+from app.storage import UploadStore
+from app.uploads import IncomingFile, UploadValidationError, UploadTooLargeError, read_csv_upload, zstandard
+from tests.base import AppTestCase
+from tests.test_storage import DEALS_CSV
+
+
+def zipped(name, payload):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(name, payload)
+    return buffer.getvalue()
+
+
+class TestIncomingFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = UploadStore(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def receive(self, payload, chunk_size=7, **kwargs):
+        incoming = IncomingFile(self.store, 'deals.csv', **kwargs)
+        for i in range(0, len(payload), chunk_size):
+            incoming.write(payload[i:i + chunk_size])
+        return incoming.finish()
+
+    def test_plain_gzip_and_zip_are_inspected_the_same(self):
+        payload = DEALS_CSV.encode()
+        for data, compression in [(payload, None),
+                                  (gzip.compress(payload), 'gzip'),
+                                  (zipped('deals.csv', payload), 'zip')]:
+            incoming = self.receive(data, required_columns=DEALS_REQUIRED_COLUMNS)
+            self.assertEqual(incoming.compression, compression)
+            self.assertEqual(incoming.rows, 3)
+            self.assertTrue(os.path.exists(self.store.path_for(incoming.digest)))
+
+    @unittest.skipIf(zstandard is None, 'zstandard not installed')
+    def test_zstd_upload_round_trips(self):
+        payload = DEALS_CSV.encode()
+        incoming = self.receive(zstandard.ZstdCompressor().compress(payload),
+                                required_columns=DEALS_REQUIRED_COLUMNS)
+        self.assertEqual(incoming.compression, 'zstd')
+        self.assertEqual(incoming.rows, 3)
+        df = read_csv_upload(self.store, {'digest': incoming.digest, 'compression': 'zstd'})
+        self.assertEqual(list(df['Login']), [1001, 1002, 1003])
+
+    def test_zip_upload_reads_back(self):
+        incoming = self.receive(zipped('vip.csv', b'1002\n1003\n'), has_header=False)
+        df = read_csv_upload(self.store, {'digest': incoming.digest, 'compression': 'zip'}, header=None)
+        self.assertEqual(list(df[0]), [1002, 1003])
+
+    def test_headerless_rows_without_trailing_newline(self):
+        incoming = self.receive(b'1001\n1002\n1003', has_header=False)
+        self.assertEqual(incoming.rows, 3)
+
+    def test_decompressed_size_is_capped(self):
+        bomb = gzip.compress(b'1001\n' * 1_000_000)
+        for data in [bomb, zipped('vip.csv', b'1001\n' * 1_000_000)]:
+            incoming = IncomingFile(self.store, 'vip.csv', has_header=False, max_bytes=1024 ** 2)
+            with self.assertRaises(UploadTooLargeError):
+                incoming.write(data)
+            incoming.discard()
+
+        # Every gzip member counts, not just the first
+        incoming = self.receive(gzip.compress(b'1001\n') + gzip.compress(b'1002\n'), has_header=False)
+        self.assertEqual((incoming.rows, incoming.decompressed_size), (2, 10))
+
+    @unittest.skipIf(zstandard is None, 'zstandard not installed')
+    def test_zstd_decompressed_size_is_capped(self):
+        incoming = IncomingFile(self.store, 'vip.csv', has_header=False, max_bytes=1024 ** 2)
+        with self.assertRaises(UploadTooLargeError):
+            incoming.write(zstandard.ZstdCompressor().compress(b'1001\n' * 1_000_000))
+        incoming.discard()
+
+    def test_bad_header_is_rejected_before_the_file_is_complete(self):
+        incoming = IncomingFile(self.store, 'deals.csv', required_columns=DEALS_REQUIRED_COLUMNS)
+        with self.assertRaises(UploadValidationError):
+            incoming.write(b'Deal,Login,Profit\n')
+        incoming.discard()
+        self.assertEqual(os.listdir(self.store.tmp_dir), [])
+
+
+class TestUploadRoute(AppTestCase):
+
+    def post(self, client, deals, deals_name='deals.csv'):
+        return client.post('/upload', data={
+            'deals_csv': (io.BytesIO(deals), deals_name),
+            'ex_csv': (io.BytesIO(b'1005\n'), 'excluded.csv'),
+            'vip_csv': (io.BytesIO(b'1002\n'), 'vip.csv'),
+        }, content_type='multipart/form-data')
+
+    def test_compressed_deals_upload_generates_report(self):
+        client = self.app.test_client()
+        self.login(client)
+        self.post(client, gzip.compress(DEALS_CSV.encode()), 'deals.csv.gz')
+        with client.session_transaction() as sess:
+            self.assertEqual(sess['uploads']['deals']['compression'], 'gzip')
+            self.assertEqual(sess['uploads']['deals']['rows'], 3)
+        response = client.get('/report/generate')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'1001', response.data)
+
+    def test_wrong_columns_are_rejected(self):
+        client = self.app.test_client()
+        self.login(client)
+        response = self.post(client, b'Deal,Login\n1,1001\n')
+        self.assertEqual(response.status_code, 302)
+        with client.session_transaction() as sess:
+            self.assertNotIn('uploads', sess)
+            self.assertIn('Processing rule', sess['_flashes'][-1][1])
+
+    def test_oversized_upload_is_rejected(self):
+        self.app.config['UPLOAD_MAX_DECOMPRESSED_BYTES'] = 100
+        client = self.app.test_client()
+        self.login(client)
+        response = self.post(client, gzip.compress(DEALS_CSV.encode()), 'deals.csv.gz')
+        self.assertEqual(response.status_code, 302)
+        with client.session_transaction() as sess:
+            self.assertNotIn('uploads', sess)
+            self.assertIn('once decompressed', sess['_flashes'][-1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()